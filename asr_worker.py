@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Whisper en un proceso dedicado para no competir por el GIL con la captura.
+
+El audio viaja por memoria compartida (sin copiar por el pipe) y por el pipe
+solo pasan mensajes pequeños: (id, nº de muestras, opciones) hacia el worker
+y (id, texto, tiempo) de vuelta. Un supervisor reinicia el worker si muere o
+se queda colgado.
+"""
+
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _worker_main(shm_name, slot_samples, model_name, device, conn):
+    """Punto de entrada del proceso worker (no importa nada del cliente)."""
+    os.environ["TQDM_DISABLE"] = "1"
+    import warnings
+    warnings.filterwarnings("ignore")
+    import whisper
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    audio_slot = np.ndarray((slot_samples,), dtype=np.float32, buffer=shm.buf)
+    models = {}
+
+    def get_model(name):
+        if name not in models:
+            models[name] = whisper.load_model(name, device=device)
+        return models[name]
+
+    try:
+        start = time.monotonic()
+        model = get_model(model_name)
+        conn.send(('ready', time.monotonic() - start))
+
+        devnull = open(os.devnull, 'w')
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            kind = message[0]
+
+            if kind == 'model':
+                # Cambiar de modelo (degradación); se cachean los ya cargados
+                try:
+                    model = get_model(message[1])
+                    conn.send(('model', message[1]))
+                except Exception as e:
+                    conn.send(('error', message[1], str(e)))
+                continue
+
+            _, job_id, n_samples, options = message
+            audio = audio_slot[:n_samples].copy()
+            start = time.monotonic()
+            try:
+                # Aquí sí podemos redirigir stderr sin afectar a la captura
+                stderr_backup = sys.stderr
+                sys.stderr = devnull
+                try:
+                    result = model.transcribe(audio, **options)
+                finally:
+                    sys.stderr = stderr_backup
+                conn.send(('ok', job_id, result['text'].strip(), time.monotonic() - start))
+            except Exception as e:
+                conn.send(('error', job_id, str(e), time.monotonic() - start))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del audio_slot
+        shm.close()
+
+
+class ASRWorker:
+    """Proceso supervisado que ejecuta Whisper.
+
+    `transcribe` es síncrono (lo llama el thread de procesamiento), pero el
+    trabajo pesado y el GIL de PyTorch/tokenizer quedan en otro proceso.
+    """
+
+    def __init__(self, model_name, device='cpu', max_seconds=30.0, sample_rate=16000,
+                 job_timeout=30.0, max_restarts=5):
+        self.model_name = model_name
+        self.device = device
+        self.slot_samples = int(max_seconds * sample_rate)
+        self.job_timeout = job_timeout
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        self.load_time = None
+        self._ctx = mp.get_context('spawn')
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slot_samples * 4)
+        self._slot = np.ndarray((self.slot_samples,), dtype=np.float32, buffer=self._shm.buf)
+        self._lock = threading.Lock()
+        self._job_id = 0
+        self._process = None
+        self._conn = None
+        self._stopping = False
+        self._supervisor = None
+
+    def start(self, timeout=300.0):
+        """Arrancar el worker y esperar a que el modelo esté cargado."""
+        with self._lock:
+            self._spawn(timeout)
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+        return self
+
+    def _spawn(self, timeout):
+        parent_conn, child_conn = self._ctx.Pipe()
+        self._process = self._ctx.Process(
+            target=_worker_main,
+            args=(self._shm.name, self.slot_samples, self.model_name, self.device, child_conn),
+            daemon=True,
+            name='whisper-asr'
+        )
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        if not self._conn.poll(timeout):
+            raise RuntimeError("El worker ASR no respondió a tiempo")
+        kind, self.load_time = self._conn.recv()
+
+    def _restart(self, reason):
+        """Matar y relanzar el worker (con el lock tomado)."""
+        if self._stopping:
+            return
+        if self.restarts >= self.max_restarts:
+            raise RuntimeError(f"Worker ASR caído demasiadas veces ({reason})")
+        self.restarts += 1
+        print(f"⚠️  Reiniciando worker ASR ({reason})", file=sys.stderr)
+        if self._process is not None and self._process.is_alive():
+            self._process.kill()
+        if self._process is not None:
+            self._process.join(timeout=5)
+        self._spawn(timeout=300.0)
+
+    def _supervise(self):
+        """Vigilar el proceso y relanzarlo si muere entre trabajos."""
+        while not self._stopping:
+            time.sleep(1.0)
+            with self._lock:
+                if not self._stopping and not self._process.is_alive():
+                    try:
+                        self._restart(f"exit code {self._process.exitcode}")
+                    except Exception as e:
+                        print(f"❌ {e}", file=sys.stderr)
+                        return
+
+    def transcribe(self, audio, **options):
+        """Transcribir un array float32 1-D. Devuelve el texto o None."""
+        n_samples = min(len(audio), self.slot_samples)
+        with self._lock:
+            self._job_id += 1
+            job_id = self._job_id
+            self._slot[:n_samples] = audio[:n_samples]
+            try:
+                self._conn.send(('job', job_id, n_samples, options))
+                if not self._conn.poll(self.job_timeout):
+                    self._restart("timeout")
+                    return None
+                kind, reply_id, payload, decode_time = self._conn.recv()
+            except (EOFError, BrokenPipeError, ConnectionResetError, OSError):
+                self._restart("pipe cerrado")
+                return None
+
+        if kind != 'ok' or reply_id != job_id:
+            print(f"⚠️  Error en transcripción (worker): {payload}", file=sys.stderr)
+            return None
+        return payload
+
+    def switch_model(self, model_name):
+        """Pedir al worker que use otro modelo (lo carga si hace falta).
+
+        Ocupa el worker mientras carga: las transcripciones esperan al lock.
+        Devuelve True si el worker ya usa el modelo nuevo.
+        """
+        with self._lock:
+            try:
+                self._conn.send(('model', model_name))
+                if not self._conn.poll(self.job_timeout):
+                    self._restart("timeout cargando el modelo")
+                    return False
+                reply = self._conn.recv()
+            except (EOFError, BrokenPipeError, ConnectionResetError, OSError):
+                self._restart("pipe cerrado")
+                return False
+
+            if reply[0] != 'model':
+                print(f"⚠️  No se pudo cargar el modelo {model_name}: {reply[2]}", file=sys.stderr)
+                return False
+            # Si el worker se reinicia, arranca ya con este modelo
+            self.model_name = model_name
+            return True
+
+    def stop(self):
+        self._stopping = True
+        with self._lock:
+            try:
+                self._conn.send(None)
+            except Exception:
+                pass
+            if self._process is not None:
+                self._process.join(timeout=5)
+                if self._process.is_alive():
+                    self._process.kill()
+        del self._slot
+        self._shm.close()
+        self._shm.unlink()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Relay de audio comprimido para whisper-live.
+
+whisper-live espera PCM float32 a 16 kHz (64 KB/s por orador). Este relay se
+ejecuta junto a run_server.py, acepta tramas int16 (2x menos) u Opus (~20x
+menos) con número de secuencia, las decodifica con numpy y reenvía float32 al
+TranscriptionServer. Las respuestas del servidor vuelven al cliente tal cual.
+
+Protocolo (compatible con el de whisper-live):
+- Primer mensaje: la configuración JSON de siempre, con `audio_codec`
+  ('int16' u 'opus'). Sin `audio_codec` el relay reenvía los bytes sin tocar.
+- Cada trama binaria: cabecera de 8 bytes `<IHBB` (secuencia, muestras,
+  códec, flags) seguida del payload. `END_OF_AUDIO` se reenvía sin cambios.
+
+Uso:
+    python run_server.py --port 9090
+    python audio_relay.py --port 9091 --upstream ws://localhost:9090
+"""
+
+import argparse
+import json
+import struct
+import sys
+import threading
+
+import numpy as np
+
+FRAME_HEADER = struct.Struct('<IHBB')  # secuencia, muestras, códec, flags
+
+CODEC_INT16 = 1
+CODEC_OPUS = 2
+CODEC_FLOAT32 = 3
+CODECS = {'int16': CODEC_INT16, 'opus': CODEC_OPUS, 'float32': CODEC_FLOAT32}
+
+END_OF_AUDIO = b'END_OF_AUDIO'
+INT16_SCALE = np.float32(1.0 / 32768.0)
+
+
+def decode_int16(payload):
+    """PCM int16 little-endian → float32 en [-1, 1) (una sola operación vectorial)."""
+    return np.frombuffer(payload, dtype='<i2').astype(np.float32) * INT16_SCALE
+
+
+def opus_available():
+    """¿Está PyAV instalado? (dependencia opcional, solo para Opus)."""
+    try:
+        import av  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class OpusDecoder:
+    """Decodificador de paquetes Opus sueltos con PyAV (ya lo instala faster-whisper)."""
+
+    def __init__(self, sample_rate=16000):
+        import av
+        self.sample_rate = sample_rate
+        try:
+            # libopus decodifica directamente a 16 kHz
+            self.context = av.CodecContext.create('libopus', 'r')
+        except Exception:
+            self.context = av.CodecContext.create('opus', 'r')
+        self.context.sample_rate = sample_rate
+        self.context.layout = 'mono'
+        self.resampler = av.AudioResampler(format='flt', layout='mono', rate=sample_rate)
+        self._packet = av.Packet
+
+    def decode(self, payload):
+        parts = []
+        for frame in self.context.decode(self._packet(payload)):
+            if frame.sample_rate != self.sample_rate or frame.format.name != 'flt':
+                # El decodificador nativo de FFmpeg siempre entrega 48 kHz planar
+                for resampled in self.resampler.resample(frame):
+                    parts.append(resampled.to_ndarray().reshape(-1))
+            else:
+                parts.append(frame.to_ndarray().reshape(-1))
+        if not parts:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(parts).astype(np.float32, copy=False)
+
+
+class FrameDecoder:
+    """Decodifica tramas con secuencia de un cliente y rellena los huecos.
+
+    Las tramas repetidas o atrasadas se descartan, igual que las mal formadas
+    (payload int16/float32 de longitud impar, Opus corrupto), que luego cuentan
+    como hueco; si faltan tramas se insertan silencios de la misma duración (hasta `max_gap_seconds`) para
+    que los timestamps de whisper-live sigan alineados con el audio real.
+    """
+
+    def __init__(self, sample_rate=16000, max_gap_seconds=1.0):
+        self.sample_rate = sample_rate
+        self.max_gap_samples = int(sample_rate * max_gap_seconds)
+        self.expected_seq = None
+        self.opus = None
+        self.stats = {'frames': 0, 'lost': 0, 'late': 0, 'malformed': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    def decode(self, message):
+        """Trama binaria → float32 (o None si hay que descartarla)."""
+        self.stats['bytes_in'] += len(message)
+        if len(message) < FRAME_HEADER.size:
+            return None
+        seq, n_samples, codec, _flags = FRAME_HEADER.unpack_from(message)
+        payload = memoryview(message)[FRAME_HEADER.size:]
+
+        if self.expected_seq is not None and seq < self.expected_seq:
+            self.stats['late'] += 1
+            return None
+
+        try:
+            if codec == CODEC_INT16:
+                audio = decode_int16(payload)
+            elif codec == CODEC_OPUS:
+                if self.opus is None:
+                    self.opus = OpusDecoder(self.sample_rate)
+                audio = self.opus.decode(bytes(payload))
+            elif codec == CODEC_FLOAT32:
+                audio = np.frombuffer(payload, dtype='<f4')
+            else:
+                return None
+        except ValueError:
+            # Payload truncado o corrupto (PyAV también lanza ValueError): no
+            # debe cerrar la conexión; la siguiente trama lo rellena con silencio
+            self.stats['malformed'] += 1
+            return None
+
+        if self.expected_seq is not None and seq > self.expected_seq:
+            missing = seq - self.expected_seq
+            self.stats['lost'] += missing
+            gap = min(missing * (n_samples or len(audio)), self.max_gap_samples)
+            audio = np.concatenate([np.zeros(gap, dtype=np.float32), audio])
+
+        self.expected_seq = seq + 1
+        self.stats['frames'] += 1
+        self.stats['bytes_out'] += audio.nbytes
+        return audio
+
+
+def _relay_audio(client, upstream, config, codec, decoder):
+    """Reenviar configuración y audio decodificado; devolver las respuestas."""
+    from websockets.exceptions import ConnectionClosed
+
+    def pump_responses():
+        # Servidor → cliente: segmentos, SERVER_READY, WAIT...
+        try:
+            for message in upstream:
+                client.send(message)
+        except ConnectionClosed:
+            pass
+        finally:
+            client.close()
+
+    upstream.send(json.dumps(config))
+    responses = threading.Thread(target=pump_responses, daemon=True)
+    responses.start()
+    try:
+        for message in client:
+            if isinstance(message, str) or codec is None or message == END_OF_AUDIO:
+                upstream.send(message)
+                continue
+            audio = decoder.decode(message)
+            if audio is not None and len(audio):
+                upstream.send(audio.tobytes())
+    except ConnectionClosed:
+        pass
+    finally:
+        upstream.close()
+        responses.join(timeout=1.0)
+
+
+def relay_connection(client, upstream_url, sample_rate=16000):
+    """Atender a un cliente: configuración, audio decodificado y respuestas."""
+    from websockets.sync.client import connect
+    from websockets.exceptions import ConnectionClosed
+
+    try:
+        config = json.loads(client.recv())
+    except (ConnectionClosed, ValueError):
+        return
+    codec = config.pop('audio_codec', None)
+    if codec is not None and codec not in CODECS:
+        client.send(json.dumps({'uid': config.get('uid'), 'status': 'ERROR',
+                                'message': f'Códec no soportado: {codec}'}))
+        return
+    if codec == 'opus' and not opus_available():
+        client.send(json.dumps({'uid': config.get('uid'), 'status': 'ERROR',
+                                'message': 'Opus requiere PyAV en el servidor (pip install av)'}))
+        return
+
+    decoder = FrameDecoder(sample_rate)
+    uid = config.get('uid', '?')
+    try:
+        with connect(upstream_url, max_size=None, compression=None) as upstream:
+            _relay_audio(client, upstream, config, codec, decoder)
+    except OSError as e:
+        print(f"❌ No se pudo conectar a {upstream_url}: {e}", file=sys.stderr)
+        return
+    except Exception as e:
+        print(f"⚠️  Error en relay ({uid}): {e}", file=sys.stderr)
+
+    stats = decoder.stats
+    if codec is not None and stats['bytes_in']:
+        print(f"🔌 {uid} [{codec}]: {stats['frames']} tramas, "
+              f"{stats['bytes_in'] / 1024:.0f} KB → {stats['bytes_out'] / 1024:.0f} KB "
+              f"(x{stats['bytes_out'] / stats['bytes_in']:.1f}), perdidas: {stats['lost']}, "
+              f"mal formadas: {stats['malformed']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Relay de audio int16/Opus → float32 para whisper-live'
+    )
+    parser.add_argument('--port', '-p', type=int, default=9091,
+                        help='Puerto WebSocket del relay (default: 9091)')
+    parser.add_argument('--upstream', '-u', type=str, default='ws://localhost:9090',
+                        help='URL del servidor whisper-live (default: ws://localhost:9090)')
+    parser.add_argument('--sample-rate', type=int, default=16000,
+                        help='Frecuencia de muestreo esperada por el servidor (default: 16000)')
+    args = parser.parse_args()
+
+    from websockets.sync.server import serve
+
+    print(f"🔀 Relay de audio en ws://0.0.0.0:{args.port} → {args.upstream}")
+    print("   Códecs: int16, opus (y float32/sin cabecera en modo directo)")
+    if not opus_available():
+        print("   ⚠️  PyAV no está instalado: las conexiones Opus se rechazan (pip install av)")
+    print("-" * 50)
+
+    # Sin compresión per-message: el audio ya va comprimido y deflate añade latencia
+    with serve(lambda ws: relay_connection(ws, args.upstream, args.sample_rate),
+               '0.0.0.0', args.port, max_size=None, compression=None) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n✅ Detenido")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+Autoajuste de latencia/calidad contra un corpus de referencia.
+
+Recorre (en rejilla o con optimización bayesiana) los parámetros que afectan a
+la latencia — modelo, duración del chunk, send_last_n_segments,
+no_speech_thresh, same_output_threshold e hilos de OpenMP — y mide para cada
+combinación:
+
+- latencia p50/p95/p99 (desde que el audio existe hasta que aparece el texto)
+- realtime factor (RTF)
+- CPU (segundos de CPU por segundo de audio)
+- WER contra la transcripción de referencia
+
+Muestra el frente de Pareto (latencia p95, WER, CPU) y puede guardarlo como
+perfiles con nombre que los clientes cargan con `--profile`.
+
+Corpus: un directorio con pares `nombre.wav` + `nombre.txt`.
+
+Uso:
+    python autotune.py corpus/ --backend local --model tiny base small --chunk-duration 1 1.5 3
+    python autotune.py corpus/ --backend whisper-live --spawn-server --omp-threads 1 2 4
+    python autotune.py corpus/ --search bayes --trials 30 --save-profiles
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import wave
+
+import numpy as np
+
+from profiles import KNOBS, save_profiles
+from text_diff import WordDiffer, normalize_text
+
+SAMPLE_RATE = 16000
+BLOCK_SECONDS = 0.1
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.mp3', '.m4a', '.ogg')
+OBJECTIVES = ('latency_p95', 'wer', 'cpu')
+
+# Parámetros que tiene sentido barrer en cada backend
+BACKEND_KNOBS = {
+    'local': ('model', 'chunk_duration', 'no_speech_thresh', 'omp_num_threads'),
+    'whisper-live': ('model', 'send_last_n_segments', 'no_speech_thresh',
+                     'same_output_threshold', 'omp_num_threads'),
+}
+
+
+# -- Corpus y métricas --------------------------------------------------------
+
+def load_audio(path):
+    """Audio mono float32 a 16 kHz. WAV PCM16 sin dependencias; el resto con ffmpeg."""
+    if path.lower().endswith('.wav'):
+        with wave.open(path, 'rb') as f:
+            if f.getframerate() == SAMPLE_RATE and f.getsampwidth() == 2:
+                data = np.frombuffer(f.readframes(f.getnframes()), dtype='<i2')
+                data = data.reshape(-1, f.getnchannels()).mean(axis=1)
+                return (data / 32768.0).astype(np.float32)
+    from client_local_coreml import import_whisper
+    return import_whisper().load_audio(path)
+
+
+def load_corpus(directory):
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        base, ext = os.path.splitext(name)
+        if ext.lower() not in AUDIO_EXTENSIONS:
+            continue
+        reference_path = os.path.join(directory, base + '.txt')
+        if not os.path.exists(reference_path):
+            print(f"⚠️  {name} sin transcripción de referencia ({base}.txt), se ignora")
+            continue
+        with open(reference_path, encoding='utf-8') as f:
+            reference = f.read()
+        corpus.append({'name': base, 'audio': load_audio(os.path.join(directory, name)),
+                       'reference': reference})
+    return corpus
+
+
+def word_errors(reference, hypothesis):
+    """(errores, palabras de referencia) con distancia de edición por palabras."""
+    ref = normalize_text(reference).split()
+    hyp = normalize_text(hypothesis).split()
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1], len(ref)
+
+
+def percentile(values, q):
+    if not values:
+        return float('inf')
+    return float(np.percentile(values, q))
+
+
+def summarize(latencies, errors, ref_words, audio_seconds, busy_seconds, cpu_seconds):
+    return {
+        'latency_p50': round(percentile(latencies, 50), 3),
+        'latency_p95': round(percentile(latencies, 95), 3),
+        'latency_p99': round(percentile(latencies, 99), 3),
+        'rtf': round(busy_seconds / audio_seconds, 3) if audio_seconds else None,
+        'cpu': round(cpu_seconds / audio_seconds, 3) if audio_seconds and cpu_seconds is not None else None,
+        'wer': round(errors / ref_words, 4) if ref_words else None,
+    }
+
+
+# -- Backends -----------------------------------------------------------------
+
+class LocalEvaluator:
+    """Simula el cliente local: ventanas de chunk_duration en tiempo real con Whisper."""
+
+    def __init__(self, language='en'):
+        self.language = language
+        self.model_name = None
+        self.model = None
+
+    def _load(self, name):
+        if name != self.model_name:
+            from client_local_coreml import import_whisper
+            # Un solo modelo en memoria a la vez
+            self.model = None
+            self.model = import_whisper().load_model(name, device='cpu')
+            self.model_name = name
+        return self.model
+
+    def evaluate(self, setting, corpus):
+        import torch
+        torch.set_num_threads(int(setting['omp_num_threads']))
+        model = self._load(setting['model'])
+        chunk = int(SAMPLE_RATE * setting['chunk_duration'])
+
+        latencies, errors, ref_words = [], 0, 0
+        audio_seconds = busy_seconds = 0.0
+        cpu_start = time.process_time()
+        for clip in corpus:
+            audio = clip['audio']
+            differ = WordDiffer()
+            published = []
+            busy_until = 0.0
+            for offset in range(0, len(audio), chunk):
+                window = audio[offset:offset + chunk]
+                ready_at = (offset + len(window)) / SAMPLE_RATE
+                start = time.perf_counter()
+                result = model.transcribe(
+                    window / np.max(np.abs(window) + 1e-8),
+                    language=self.language,
+                    fp16=False,
+                    verbose=None,
+                    temperature=0.0,
+                    no_speech_threshold=setting['no_speech_thresh']
+                )
+                decode = time.perf_counter() - start
+                busy_seconds += decode
+                # Cola de un solo decodificador: la ventana espera si el anterior no acabó
+                busy_until = max(ready_at, busy_until) + decode
+                # Latencia media de una palabra de la ventana (a mitad del chunk)
+                latencies.append(busy_until - ready_at + len(window) / SAMPLE_RATE / 2)
+                new_text = differ.diff(result['text'].strip())
+                if new_text:
+                    published.append(new_text)
+            clip_errors, clip_words = word_errors(clip['reference'], ' '.join(published))
+            errors += clip_errors
+            ref_words += clip_words
+            audio_seconds += len(audio) / SAMPLE_RATE
+
+        return summarize(latencies, errors, ref_words, audio_seconds, busy_seconds,
+                         time.process_time() - cpu_start)
+
+    def close(self):
+        pass
+
+
+def process_cpu_seconds(pid):
+    """CPU consumida por un proceso (psutil si está; si no /proc en Linux)."""
+    try:
+        import psutil
+        times = psutil.Process(pid).cpu_times()
+        return times.user + times.system
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class WhisperLiveEvaluator:
+    """Envía el corpus en tiempo real a un servidor whisper-live y mide los segmentos.
+
+    Con `spawn_server` arranca run_server.py (uno por valor de omp_num_threads)
+    y puede medir su CPU; si no, usa el servidor de host:port y omp se ignora.
+    """
+
+    def __init__(self, host='localhost', port=9090, language='en', spawn_server=False,
+                 backend='faster_whisper', tail_timeout=5.0):
+        self.host = host
+        self.port = port
+        self.language = language
+        self.spawn_server = spawn_server
+        self.backend = backend
+        self.tail_timeout = tail_timeout
+        self.server = None
+        self.server_omp = None
+
+    def _ensure_server(self, omp):
+        if not self.spawn_server or omp == self.server_omp:
+            return
+        self.close()
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run_server.py')
+        env = dict(os.environ, OMP_NUM_THREADS=str(omp))
+        self.server = subprocess.Popen(
+            [sys.executable, script, '--port', str(self.port), '--backend', self.backend,
+             '--omp_num_threads', str(omp)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.server_omp = omp
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection((self.host, self.port), timeout=1).close()
+                return
+            except OSError:
+                if self.server.poll() is not None:
+                    break
+                time.sleep(0.5)
+        raise RuntimeError(f"run_server.py no arrancó en el puerto {self.port}")
+
+    def _run_clip(self, clip, setting):
+        from websockets.sync.client import connect
+
+        uid = str(uuid.uuid4())
+        config = {
+            'uid': uid,
+            'language': self.language,
+            'task': 'transcribe',
+            'model': setting['model'],
+            'use_vad': False,
+            'send_last_n_segments': int(setting['send_last_n_segments']),
+            'no_speech_thresh': float(setting['no_speech_thresh']),
+            'same_output_threshold': int(setting['same_output_threshold']),
+        }
+        audio = clip['audio']
+        latencies, segments = [], {}
+
+        with connect(f"ws://{self.host}:{self.port}", max_size=None) as ws:
+            ws.send(json.dumps(config))
+            while True:
+                message = json.loads(ws.recv(timeout=600))
+                if message.get('message') == 'SERVER_READY':
+                    break
+                if message.get('status') in ('ERROR', 'WAIT'):
+                    raise RuntimeError(f"whisper-live: {message.get('message')}")
+
+            t0 = time.monotonic()
+            sent = threading.Event()
+
+            def send_audio():
+                # Audio en tiempo real: cada bloque de 100 ms sale cuando termina de "grabarse"
+                block = int(SAMPLE_RATE * BLOCK_SECONDS)
+                try:
+                    for offset in range(0, len(audio), block):
+                        delay = t0 + min(offset + block, len(audio)) / SAMPLE_RATE - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                        ws.send(audio[offset:offset + block].astype(np.float32).tobytes())
+                    ws.send(b'END_OF_AUDIO')
+                finally:
+                    sent.set()
+
+            sender = threading.Thread(target=send_audio, daemon=True)
+            sender.start()
+            last_message = time.monotonic()
+            while not sent.is_set() or time.monotonic() - last_message < self.tail_timeout:
+                try:
+                    message = json.loads(ws.recv(timeout=0.5))
+                except TimeoutError:
+                    continue
+                except Exception:
+                    break
+                now = time.monotonic()
+                last_message = now
+                for seg in message.get('segments', []):
+                    key = round(float(seg['start']), 2)
+                    if key not in segments:
+                        # Primera vez que el texto de este tramo llega a pantalla
+                        latencies.append(now - (t0 + float(seg['end'])))
+                    segments[key] = seg['text']
+            elapsed = last_message - t0
+
+        hypothesis = ' '.join(segments[key] for key in sorted(segments))
+        return latencies, hypothesis, elapsed
+
+    def evaluate(self, setting, corpus):
+        self._ensure_server(setting['omp_num_threads'])
+        pid = self.server.pid if self.server is not None else None
+        cpu_start = process_cpu_seconds(pid) if pid else None
+
+        latencies, errors, ref_words = [], 0, 0
+        audio_seconds = busy_seconds = 0.0
+        for clip in corpus:
+            clip_latencies, hypothesis, elapsed = self._run_clip(clip, setting)
+            latencies.extend(clip_latencies)
+            clip_errors, clip_words = word_errors(clip['reference'], hypothesis)
+            errors += clip_errors
+            ref_words += clip_words
+            clip_seconds = len(clip['audio']) / SAMPLE_RATE
+            audio_seconds += clip_seconds
+            # Tiempo hasta el último segmento (≥ duración del audio al ir en tiempo real)
+            busy_seconds += max(elapsed, clip_seconds)
+
+        cpu_end = process_cpu_seconds(pid) if pid else None
+        cpu = cpu_end - cpu_start if cpu_start is not None and cpu_end is not None else None
+        return summarize(latencies, errors, ref_words, audio_seconds, busy_seconds, cpu)
+
+    def close(self):
+        if self.server is not None:
+            self.server.terminate()
+            try:
+                self.server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.server.kill()
+            self.server = None
+            self.server_omp = None
+
+
+# -- Búsqueda -----------------------------------------------------------------
+
+def grid_settings(space, max_trials=None, seed=0):
+    knobs = sorted(space)
+    settings = [dict(zip(knobs, values)) for values in itertools.product(*(space[k] for k in knobs))]
+    if max_trials and len(settings) > max_trials:
+        settings = random.Random(seed).sample(settings, max_trials)
+    return settings
+
+
+def objective_values(metrics):
+    # Una métrica que no se pudo medir (p. ej. CPU de un servidor externo) no discrimina
+    return tuple(metrics[o] if metrics.get(o) is not None else 0.0 for o in OBJECTIVES)
+
+
+def pareto_front(results):
+    """Resultados no dominados en (latencia p95, WER, CPU)."""
+    front = []
+    for candidate in results:
+        a = objective_values(candidate['metrics'])
+        dominated = False
+        for other in results:
+            b = objective_values(other['metrics'])
+            if all(y <= x for x, y in zip(a, b)) and any(y < x for x, y in zip(a, b)):
+                dominated = True
+                break
+        if not dominated:
+            front.append(candidate)
+    return sorted(front, key=lambda r: r['metrics']['latency_p95'])
+
+
+def run_grid(evaluator, space, corpus, max_trials, seed, on_result):
+    settings = grid_settings(space, max_trials, seed)
+    for index, setting in enumerate(settings, 1):
+        print(f"[{index}/{len(settings)}] {format_setting(setting)}")
+        result = evaluate_setting(evaluator, setting, corpus)
+        if result is not None:
+            on_result(result)
+
+
+def run_bayes(evaluator, space, corpus, trials, seed, on_result):
+    """Optimización bayesiana multiobjetivo (TPE de optuna)."""
+    try:
+        import optuna
+    except ImportError:
+        print("❌ --search bayes requiere optuna: pip install optuna")
+        sys.exit(1)
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+    def objective(trial):
+        setting = {knob: trial.suggest_categorical(knob, values) for knob, values in space.items()}
+        print(f"[{trial.number + 1}/{trials}] {format_setting(setting)}")
+        result = evaluate_setting(evaluator, setting, corpus)
+        if result is None:
+            raise RuntimeError('evaluación fallida')
+        on_result(result)
+        return objective_values(result['metrics'])
+
+    study = optuna.create_study(directions=['minimize'] * len(OBJECTIVES),
+                                sampler=optuna.samplers.TPESampler(seed=seed))
+    study.optimize(objective, n_trials=trials, catch=(RuntimeError,))
+
+
+def evaluate_setting(evaluator, setting, corpus):
+    try:
+        metrics = evaluator.evaluate(setting, corpus)
+    except Exception as e:
+        print(f"   ⚠️  Falló: {e}")
+        return None
+    print(f"   p50 {metrics['latency_p50']:.2f}s | p95 {metrics['latency_p95']:.2f}s | "
+          f"RTF {metrics['rtf']} | CPU {metrics['cpu']} | WER {metrics['wer']}")
+    return {'setting': setting, 'metrics': metrics}
+
+
+def format_setting(setting):
+    return ' '.join(f"{knob}={value}" for knob, value in sorted(setting.items()))
+
+
+def pick_profiles(front, backend, prefix=''):
+    """Perfiles con nombre a partir del frente de Pareto de `backend`.
+
+    Solo se guardan los parámetros que ese backend barre; el resto lo deja el
+    cliente con su valor por defecto.
+    """
+    if not front:
+        return {}
+    values = np.array([objective_values(r['metrics']) for r in front], dtype=float)
+    span = values.max(axis=0) - values.min(axis=0)
+    span[span == 0] = 1.0
+    normalized = (values - values.min(axis=0)) / span
+    picks = {
+        'low-latency': int(np.argmin(values[:, 0])),
+        'accurate': int(np.argmin(values[:, 1])),
+        'efficient': int(np.argmin(values[:, 2])),
+        # El más cercano al punto ideal con los tres objetivos normalizados
+        'balanced': int(np.argmin(np.linalg.norm(normalized, axis=1))),
+    }
+    profiles = {}
+    for name, index in picks.items():
+        result = front[index]
+        profile = {knob: result['setting'].get(knob) for knob in KNOBS
+                   if knob in BACKEND_KNOBS[backend]}
+        profile['backend'] = backend
+        profile['metrics'] = result['metrics']
+        profiles[prefix + name] = profile
+    return profiles
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Barrido de parámetros de latencia/calidad contra un corpus de referencia'
+    )
+    parser.add_argument('corpus', help='Directorio con pares audio (.wav...) + transcripción (.txt)')
+    parser.add_argument('--backend', choices=sorted(BACKEND_KNOBS), default='local',
+                        help='local = Whisper en este proceso (client_local_coreml); '
+                             'whisper-live = servidor de run_server.py (default: local)')
+    parser.add_argument('--search', choices=['grid', 'bayes'], default='grid',
+                        help='Rejilla completa o bayesiana con optuna (default: grid)')
+    parser.add_argument('--trials', type=int, default=None,
+                        help='Máximo de combinaciones a probar (bayes: default 20)')
+    parser.add_argument('--language', default='en')
+    parser.add_argument('--seed', type=int, default=0)
+
+    parser.add_argument('--model', nargs='+', default=['tiny', 'base', 'small'])
+    parser.add_argument('--chunk-duration', nargs='+', type=float, default=[1.0, 1.5, 2.0, 3.0])
+    parser.add_argument('--send-last-n', nargs='+', type=int, default=[1, 2, 5])
+    parser.add_argument('--no-speech-thresh', nargs='+', type=float, default=[0.2, 0.3, 0.45])
+    parser.add_argument('--same-output-threshold', nargs='+', type=int, default=[1, 2, 5])
+    parser.add_argument('--omp-threads', nargs='+', type=int, default=[1, 2, 4])
+
+    parser.add_argument('--host', default='localhost', help='Servidor whisper-live (default: localhost)')
+    parser.add_argument('--port', type=int, default=9090)
+    parser.add_argument('--spawn-server', action='store_true',
+                        help='Arrancar run_server.py para cada valor de --omp-threads (mide su CPU)')
+    parser.add_argument('--server-backend', default='faster_whisper')
+
+    parser.add_argument('--results', default=None, help='Guardar cada prueba en este JSONL')
+    parser.add_argument('--save-profiles', action='store_true',
+                        help='Guardar el frente de Pareto como perfiles (profiles.json)')
+    parser.add_argument('--profile-prefix', default='',
+                        help='Prefijo para los nombres de perfil (p. ej. "auditorio-")')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        print(f"❌ No hay pares audio + .txt en {args.corpus}")
+        sys.exit(1)
+    total = sum(len(clip['audio']) for clip in corpus) / SAMPLE_RATE
+    print(f"📚 Corpus: {len(corpus)} clips, {total:.0f} s de audio")
+
+    all_values = {
+        'model': args.model,
+        'chunk_duration': args.chunk_duration,
+        'send_last_n_segments': args.send_last_n,
+        'no_speech_thresh': args.no_speech_thresh,
+        'same_output_threshold': args.same_output_threshold,
+        'omp_num_threads': args.omp_threads,
+    }
+    space = {knob: all_values[knob] for knob in BACKEND_KNOBS[args.backend]}
+
+    if args.backend == 'local':
+        evaluator = LocalEvaluator(language=args.language)
+    else:
+        evaluator = WhisperLiveEvaluator(args.host, args.port, args.language,
+                                         spawn_server=args.spawn_server,
+                                         backend=args.server_backend)
+        if not args.spawn_server:
+            print("ℹ️  Sin --spawn-server: omp_num_threads lo fija el servidor y no se mide su CPU")
+            space['omp_num_threads'] = space['omp_num_threads'][:1]
+
+    results = []
+
+    def on_result(result):
+        results.append(result)
+        if args.results:
+            with open(args.results, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(dict(result, backend=args.backend)) + '\n')
+
+    try:
+        if args.search == 'bayes':
+            run_bayes(evaluator, space, corpus, args.trials or 20, args.seed, on_result)
+        else:
+            run_grid(evaluator, space, corpus, args.trials, args.seed, on_result)
+    except KeyboardInterrupt:
+        print("\n⏹  Interrumpido: se muestran los resultados hasta ahora")
+    finally:
+        evaluator.close()
+
+    front = pareto_front(results)
+    print("\n" + "=" * 60)
+    print(f"🏁 Frente de Pareto ({len(front)} de {len(results)} combinaciones)")
+    print("=" * 60)
+    for result in front:
+        m = result['metrics']
+        print(f"p95 {m['latency_p95']:.2f}s | WER {m['wer']} | CPU {m['cpu']} | RTF {m['rtf']} "
+              f"← {format_setting(result['setting'])}")
+
+    if args.save_profiles and front:
+        profiles = pick_profiles(front, args.backend, args.profile_prefix)
+        path = save_profiles(profiles, args.backend)
+        print(f"\n💾 Perfiles {args.backend} guardados en {path}: {', '.join(profiles)}")
+        client = 'client_local_coreml.py' if args.backend == 'local' else 'client_deepl.py'
+        print(f"   Uso: python {client} --profile {next(iter(profiles))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Control de backpressure para el cliente local.
+
+- AudioBacklog: buffer de audio acotado (sustituye al queue.Queue sin límite)
+  con una política explícita para el audio atrasado.
+- AdaptiveChunkController: mide el realtime factor (RTF) de las últimas
+  transcripciones y ajusta la duración del chunk y el nivel de degradación
+  para mantener la latencia dentro del objetivo.
+"""
+
+import threading
+from collections import deque
+
+import numpy as np
+
+
+# Políticas para el audio atrasado
+POLICY_DROP = 'drop'    # Descartar el audio viejo y quedarse con lo más reciente
+POLICY_MERGE = 'merge'  # Transcribir todo lo pendiente de una vez (hasta merge_max)
+POLICIES = (POLICY_DROP, POLICY_MERGE)
+
+
+class AudioBacklog:
+    """Buffer de audio acotado y thread-safe.
+
+    `put` se llama desde el callback de sounddevice y nunca bloquea.
+    `take` devuelve la siguiente ventana a transcribir aplicando la política
+    cuando el consumidor va por detrás.
+    """
+
+    def __init__(self, sample_rate=16000, max_seconds=10.0, policy=POLICY_DROP,
+                 merge_max_seconds=25.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Política desconocida: {policy}")
+        self.sample_rate = sample_rate
+        self.max_samples = int(sample_rate * max_seconds)
+        self.merge_max_samples = int(sample_rate * merge_max_seconds)
+        self.policy = policy
+        self._blocks = deque()
+        self._pending = 0
+        self._cond = threading.Condition()
+        self.dropped_samples = 0
+
+    def put(self, block):
+        """Añadir un bloque de audio (1-D float32)."""
+        with self._cond:
+            self._blocks.append(block)
+            self._pending += len(block)
+            self._enforce_limit()
+            self._cond.notify()
+
+    def _enforce_limit(self):
+        """Límite duro de memoria: nunca más de max_seconds pendientes."""
+        while self._blocks and self._pending - len(self._blocks[0]) >= self.max_samples:
+            old = self._blocks.popleft()
+            self._pending -= len(old)
+            self.dropped_samples += len(old)
+
+    def set_max_seconds(self, max_seconds):
+        """Cambiar el límite (p. ej. tras el arranque). Recorta si hace falta."""
+        with self._cond:
+            self.max_samples = int(self.sample_rate * max_seconds)
+            self._enforce_limit()
+
+    def drain(self):
+        """Extraer todo lo pendiente (hasta merge_max_seconds) de una vez."""
+        with self._cond:
+            return self._pop_samples(min(self._pending, self.merge_max_samples))
+
+    def pending_seconds(self):
+        with self._cond:
+            return self._pending / self.sample_rate
+
+    def _pop_samples(self, n_samples):
+        """Extraer exactamente n_samples del principio (con el lock tomado)."""
+        parts = []
+        needed = n_samples
+        while needed > 0 and self._blocks:
+            block = self._blocks[0]
+            if len(block) <= needed:
+                parts.append(self._blocks.popleft())
+                needed -= len(block)
+            else:
+                parts.append(block[:needed])
+                self._blocks[0] = block[needed:]
+                needed = 0
+        taken = n_samples - needed
+        self._pending -= taken
+        return np.concatenate(parts) if parts else np.array([], dtype=np.float32)
+
+    def take(self, n_samples, max_lag_samples=None, timeout=0.1):
+        """Siguiente ventana de al menos n_samples, o None si no hay suficiente.
+
+        Si hay más de `max_lag_samples` pendientes el consumidor va atrasado:
+        con POLICY_DROP se descarta lo viejo y se devuelve la ventana más
+        reciente; con POLICY_MERGE se devuelve todo lo pendiente junto
+        (hasta merge_max_seconds) para amortizar el coste por llamada.
+        """
+        if max_lag_samples is None:
+            max_lag_samples = 2 * n_samples
+        with self._cond:
+            if self._pending < n_samples:
+                self._cond.wait(timeout)
+                if self._pending < n_samples:
+                    return None
+
+            if self._pending > max_lag_samples:
+                if self.policy == POLICY_DROP:
+                    stale = self._pending - n_samples
+                    self._pop_samples(stale)
+                    self.dropped_samples += stale
+                else:
+                    merged = min(self._pending, max(n_samples, self.merge_max_samples))
+                    stale = self._pending - merged
+                    if stale > 0:
+                        self._pop_samples(stale)
+                        self.dropped_samples += stale
+                    return self._pop_samples(merged)
+
+            return self._pop_samples(n_samples)
+
+
+class AdaptiveChunkController:
+    """Ajusta chunk y nivel de degradación según el RTF de las últimas decodificaciones.
+
+    Whisper rellena siempre la entrada hasta 30 s, así que el coste por llamada
+    es casi constante: chunks más largos bajan el RTF y chunks más cortos bajan
+    la latencia. Si ni con el chunk máximo se consigue ir en tiempo real se
+    sube el nivel de degradación (el cliente decide qué significa cada nivel).
+    """
+
+    def __init__(self, sample_rate=16000, latency_target=2.0, initial_chunk=1.5,
+                 min_chunk=1.0, max_chunk=5.0, max_level=2, window=6,
+                 rtf_high=0.8, rtf_low=0.5):
+        self.sample_rate = sample_rate
+        self.latency_target = latency_target
+        self.chunk_duration = initial_chunk
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        self.max_level = max_level
+        self.rtf_high = rtf_high
+        self.rtf_low = rtf_low
+        self.level = 0
+        self._rtfs = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._cooldown = 0
+
+    @property
+    def chunk_samples(self):
+        return int(self.sample_rate * self.chunk_duration)
+
+    @property
+    def max_lag_samples(self):
+        """Audio pendiente a partir del cual se considera que vamos atrasados."""
+        lag = max(self.latency_target - self.chunk_duration, self.chunk_duration)
+        return int(self.sample_rate * (self.chunk_duration + lag))
+
+    @property
+    def rtf(self):
+        return sum(self._rtfs) / len(self._rtfs) if self._rtfs else 0.0
+
+    def record(self, audio_seconds, decode_seconds, backlog_seconds=0.0):
+        """Registrar una decodificación. Devuelve True si cambió la configuración."""
+        if audio_seconds <= 0:
+            return False
+        self._rtfs.append(decode_seconds / audio_seconds)
+        # Latencia aproximada de la última palabra del chunk
+        self._latencies.append(decode_seconds + backlog_seconds)
+
+        if self._cooldown > 0:
+            self._cooldown -= 1
+            return False
+        if len(self._rtfs) < self._rtfs.maxlen // 2:
+            return False
+
+        rtf = self.rtf
+        latency = self.chunk_duration + sum(self._latencies) / len(self._latencies)
+        changed = False
+
+        if rtf > self.rtf_high:
+            # Vamos por detrás del tiempo real
+            if self.chunk_duration < self.max_chunk:
+                self.chunk_duration = min(self.max_chunk, self.chunk_duration * 1.25)
+            elif self.level < self.max_level:
+                self.level += 1
+            else:
+                return False
+            changed = True
+        elif rtf < self.rtf_low:
+            if self.level > 0 and rtf < self.rtf_low / 2:
+                self.level -= 1
+                changed = True
+            elif latency > self.latency_target and self.chunk_duration > self.min_chunk:
+                self.chunk_duration = max(self.min_chunk, self.chunk_duration / 1.25)
+                changed = True
+
+        if changed:
+            # Dejar que las nuevas medidas reflejen el cambio antes de volver a ajustar
+            self._rtfs.clear()
+            self._latencies.clear()
+            self._cooldown = 2
+        return changed
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Benchmark de resistencia (soak) para sesiones largas.
+
+Reproduce muchas horas de audio a velocidad acelerada a través de los
+clientes reales:
+
+- LocalCoreMLClient: el audio sintético entra por `audio_callback` y cada
+  ventana pasa por `handle_window` (backlog acotado, controlador adaptativo,
+  diff de palabras, caché de traducciones, deadline de DeepL y snapshot).
+- UltraFastDeepLClient (whisper-live): se llama a su callback de segmentos
+  con mensajes como los del servidor (últimos N segmentos, el último abierto),
+  con presupuesto de caracteres y snapshot.
+
+DeepL es deepl_stub_server.py arrancado en este proceso (latencia
+configurable). Mide RSS y latencia por segmento en cada hora simulada y falla
+si alguno de los dos crece con el tiempo.
+
+Por defecto usa un decodificador sintético (sin modelo) para que 10 horas se
+simulen en poco tiempo; con --model el cliente local carga Whisper de verdad.
+
+Uso:
+    python bench_soak.py --hours 10
+    python bench_soak.py --hours 1 --model tiny
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+
+from deepl_stub_server import DeepLStubHandler
+
+SAMPLE_RATE = 16000
+BLOCK_SECONDS = 0.1
+
+VOCABULARY = (
+    "the of and to in is that for it as with was on be by this are at from "
+    "latency model speech audio talk conference translation subtitle stream "
+    "performance memory window decoder session speaker question answer data "
+    "system network result example people research future today important"
+).split()
+
+
+def current_rss_mb():
+    """RSS actual del proceso en MB (Linux: /proc; otros: pico de ru_maxrss)."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS lo da en bytes, Linux en KB
+        return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+class SyntheticDecoder:
+    """Imita a Whisper: texto que se solapa con el chunk anterior y coste fijo."""
+
+    def __init__(self, seed=0, decode_cost=0.0):
+        self.rng = random.Random(seed)
+        self.decode_cost = decode_cost
+        self.previous = []
+
+    def words(self, audio):
+        """Palabras nuevas para una ventana (unas 2.5 por segundo)."""
+        n_words = max(1, int(len(audio) / SAMPLE_RATE * 2.5))
+        return [self.rng.choice(VOCABULARY) for _ in range(n_words)]
+
+    def transcribe(self, audio, **options):
+        """Misma interfaz que el modelo de Whisper (`client.model`)."""
+        if self.decode_cost:
+            time.sleep(self.decode_cost)
+        words = self.words(audio)
+        # Repetir parte del final anterior como hace condition_on_previous_text
+        overlap = self.previous[-self.rng.randint(0, 3):] if self.previous else []
+        self.previous = words
+        return {'text': ' '.join(overlap + words)}
+
+
+class WhisperLiveFeed:
+    """Mensajes como los de whisper-live: los últimos N segmentos, el último abierto."""
+
+    def __init__(self, decoder, words_per_segment=12, send_last_n=2):
+        self.decoder = decoder
+        self.words_per_segment = words_per_segment
+        self.send_last_n = send_last_n
+        self.closed = []
+        self.open = []
+
+    def step(self, audio):
+        self.open.extend(self.decoder.words(audio))
+        if len(self.open) >= self.words_per_segment:
+            self.closed = (self.closed + [' '.join(self.open)])[-self.send_last_n:]
+            self.open = []
+        segments = [{'text': text, 'completed': True} for text in self.closed]
+        if self.open:
+            segments.append({'text': ' '.join(self.open), 'completed': False})
+        return segments[-self.send_last_n:]
+
+
+def synthetic_audio(seconds, rng):
+    """Ruido con algo de estructura, generado por bloques para no ocupar memoria."""
+    n_blocks = int(seconds / BLOCK_SECONDS)
+    block = int(SAMPLE_RATE * BLOCK_SECONDS)
+    for _ in range(n_blocks):
+        yield (rng.standard_normal(block) * 0.1).astype(np.float32)
+
+
+def start_deepl_stub(latency_ms):
+    """deepl_stub_server.py en un hilo de este proceso. Devuelve (servidor, URL)."""
+    config = DeepLStubHandler.config
+    config.latency_ms = latency_ms
+    config.jitter_ms = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), DeepLStubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def local_client(workdir, deepl_url, model_name, decoder):
+    """Cliente local listo para recibir audio (modelo sintético o Whisper real)."""
+    from client_local_coreml import LocalCoreMLClient
+    client = LocalCoreMLClient(
+        'soak', model_name=model_name or 'small', deepl_server_url=deepl_url,
+        snapshot_path=os.path.join(workdir, 'local.snapshot'),
+        usage_path=os.path.join(workdir, 'deepl_usage_local.json'),
+        # Sin límite efectivo, como en el cliente whisper-live
+        char_budget=10 ** 12
+    )
+    if model_name:
+        client.load_model()
+        if client.model_error is not None:
+            raise RuntimeError(f"No se pudo cargar Whisper: {client.model_error}")
+    else:
+        client.model = decoder
+        client.model_ready.set()
+    client.is_running = True
+    # Sin audio acumulado: solo fija el límite normal del backlog
+    client.drain_startup_backlog()
+    return client
+
+
+def whisper_live_client(workdir, deepl_url):
+    """Cliente whisper-live (client_m4) sin conexión: solo su callback de segmentos."""
+    try:
+        from client_m4 import UltraFastDeepLClient
+    except ImportError as e:
+        print(f"⚠️  Se omite el cliente whisper-live ({e})")
+        return None
+    return UltraFastDeepLClient(
+        'localhost', 9090, 'soak', deepl_server_url=deepl_url,
+        snapshot_path=os.path.join(workdir, 'm4.snapshot'),
+        usage_path=os.path.join(workdir, 'deepl_usage.json'),
+        # Sin límite efectivo: se mide el pipeline, no la degradación por cuota
+        char_budget=10 ** 12
+    )
+
+
+def run(hours, decoder, bucket_seconds, seed, model_name=None, deepl_latency_ms=0.0):
+    rng = np.random.default_rng(seed)
+    server, deepl_url = start_deepl_stub(deepl_latency_ms)
+    workdir = tempfile.mkdtemp(prefix='soak-')
+    devnull = open(os.devnull, 'w')
+    with redirect_stdout(devnull):
+        local = local_client(workdir, deepl_url, model_name, decoder)
+    live = whisper_live_client(workdir, deepl_url)
+    feed = WhisperLiveFeed(SyntheticDecoder(seed=seed + 1))
+
+    def new_bucket():
+        return {'latencies': [], 'live_latencies': [], 'segments': 0}
+
+    buckets = []
+    bucket = new_bucket()
+    n_blocks = 0
+    blocks_per_bucket = int(round(bucket_seconds / BLOCK_SECONDS))
+    backlog = local.audio_backlog
+    controller = local.controller
+
+    try:
+        for block in synthetic_audio(hours * 3600, rng):
+            # Misma entrada que sounddevice: bloques (frames, canales)
+            local.audio_callback(block.reshape(-1, 1), len(block), None, None)
+            n_blocks += 1
+
+            chunk = backlog.take(controller.chunk_samples, controller.max_lag_samples, timeout=0)
+            if chunk is not None:
+                start = time.perf_counter()
+                with redirect_stdout(devnull):
+                    local.handle_window(chunk)
+                bucket['latencies'].append(time.perf_counter() - start)
+                bucket['segments'] += 1
+
+                if live is not None:
+                    segments = feed.step(chunk)
+                    start = time.perf_counter()
+                    with redirect_stdout(devnull):
+                        live.on_segments(None, segments)
+                    bucket['live_latencies'].append(time.perf_counter() - start)
+
+            if n_blocks % blocks_per_bucket == 0:
+                bucket['rss_mb'] = current_rss_mb()
+                bucket['hour'] = n_blocks * BLOCK_SECONDS / 3600
+                buckets.append(bucket)
+                line = (f"   {bucket['hour']:5.1f} h | RSS {bucket['rss_mb']:7.1f} MB | "
+                        f"p50 {percentile(bucket['latencies'], 50) * 1000:6.2f} ms | "
+                        f"p95 {percentile(bucket['latencies'], 95) * 1000:6.2f} ms")
+                if live is not None:
+                    line += f" | whisper-live p50 {percentile(bucket['live_latencies'], 50) * 1000:6.2f} ms"
+                print(line + f" | segmentos {bucket['segments']}")
+                bucket = new_bucket()
+    finally:
+        with redirect_stdout(devnull):
+            local.stop()
+            if live is not None:
+                live.close()
+        devnull.close()
+        server.shutdown()
+    return buckets
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100.0 * (len(ordered) - 1)))]
+
+
+def check_flat(buckets, rss_tolerance_mb, latency_tolerance):
+    """Comparar la primera hora estable con la última."""
+    if len(buckets) < 3:
+        print("⚠️  Muy pocas horas simuladas para comprobar tendencia")
+        return True
+    # La primera hora incluye el calentamiento (cachés llenándose)
+    first, last = buckets[1], buckets[-1]
+    ok = True
+
+    rss_growth = last['rss_mb'] - first['rss_mb']
+    if rss_growth > rss_tolerance_mb:
+        print(f"❌ RSS crece {rss_growth:.1f} MB (tolerancia {rss_tolerance_mb} MB)")
+        ok = False
+    else:
+        print(f"✅ RSS plano ({rss_growth:+.1f} MB)")
+
+    for key, name in (('latencies', 'cliente local'), ('live_latencies', 'cliente whisper-live')):
+        if not last[key]:
+            continue
+        p50_first = percentile(first[key], 50)
+        p50_last = percentile(last[key], 50)
+        if p50_first > 0 and p50_last > p50_first * (1 + latency_tolerance):
+            print(f"❌ Latencia por segmento crece ({name}): "
+                  f"{p50_first * 1000:.2f} → {p50_last * 1000:.2f} ms")
+            ok = False
+        else:
+            print(f"✅ Latencia plana ({name}: {p50_first * 1000:.2f} → {p50_last * 1000:.2f} ms)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de resistencia para sesiones largas')
+    parser.add_argument('--hours', type=float, default=10.0, help='Horas de audio a simular (default: 10)')
+    parser.add_argument('--model', type=str, default=None,
+                        help='Modelo Whisper real para el cliente local (default: decodificador sintético)')
+    parser.add_argument('--decode-cost-ms', type=float, default=0.0,
+                        help='Coste simulado por decodificación con el decodificador sintético')
+    parser.add_argument('--deepl-latency-ms', type=float, default=0.0,
+                        help='Latencia del stub de DeepL (default: 0)')
+    parser.add_argument('--bucket-minutes', type=float, default=60.0,
+                        help='Minutos de audio por medición (default: 60)')
+    parser.add_argument('--rss-tolerance-mb', type=float, default=20.0)
+    parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                        help='Crecimiento relativo máximo del p50 (default: 0.5 = +50%%)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    decoder = SyntheticDecoder(seed=args.seed, decode_cost=args.decode_cost_ms / 1000.0)
+
+    print("=" * 60)
+    print(f"🧪 SOAK: {args.hours} h de audio ({'whisper ' + args.model if args.model else 'sintético'})")
+    print("=" * 60)
+    start = time.time()
+    buckets = run(args.hours, decoder, args.bucket_minutes * 60, args.seed,
+                  model_name=args.model, deepl_latency_ms=args.deepl_latency_ms)
+    print(f"⏱️  {args.hours} h simuladas en {time.time() - start:.1f} s")
+
+    sys.exit(0 if check_flat(buckets, args.rss_tolerance_mb, args.latency_tolerance) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Estructuras acotadas para sesiones largas (jornadas de 8-10 horas).
+
+Sustituyen a las listas y diccionarios que crecían durante toda la vida del
+proceso (`completed_segments`, `translation_cache`): pertenencia en O(1) y
+memoria constante, expulsando siempre lo más antiguo.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class BoundedSet:
+    """Conjunto con los últimos `maxlen` elementos (pertenencia O(1))."""
+
+    def __init__(self, maxlen=1000, items=()):
+        self.maxlen = maxlen
+        self._items = OrderedDict()
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        if item in self._items:
+            self._items.move_to_end(item)
+            return
+        self._items[item] = None
+        if len(self._items) > self.maxlen:
+            self._items.popitem(last=False)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+
+class LRUCache:
+    """Caché LRU thread-safe con interfaz de diccionario.
+
+    Los callbacks de traducción tardía escriben desde otros threads, por eso
+    todas las operaciones van bajo un lock.
+    """
+
+    def __init__(self, maxsize=2000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._data[key]
+            self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def items(self):
+        with self._lock:
+            return list(self._data.items())
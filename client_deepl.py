@@ -10,23 +10,74 @@ import argparse
 import sys
 import os
 from whisper_live.client import TranscriptionClient
-from deep_translator import DeeplTranslator
+from deepl_http import DeepLHTTPTranslator
+from translation_guard import GuardedTranslator
+from text_diff import WordDiffer
+from session_snapshot import SessionSnapshot
+from bounded_state import BoundedSet
+from profiles import whisper_live_options
+from deepl_budget import create_budget
+from glossary import load_glossary
 
 
 class DeepLTranslatingClient:
     """Cliente con traducción DeepL de alta calidad."""
     
-    def __init__(self, host, port, api_key, source_lang='en', target_lang='es', **whisper_args):
+    def __init__(self, host, port, api_key, source_lang='en', target_lang='es',
+                 deepl_server_url=None, deepl_deadline=0.8, snapshot_path=None,
+                 usage_path=None, char_budget=None, partial_interval=1.0,
+                 glossary_files=(), glossary_ids=(), refresh_glossary=False, **whisper_args):
         self.source_lang = source_lang
         self.target_lang = target_lang
-        self.translator = DeeplTranslator(
-            api_key=api_key,
-            source=source_lang,
-            target=target_lang,
-            use_free_api=True  # Usar API gratuita
+        # Cliente HTTP propio: timeout en cada petición y URL base configurable
+        # (p. ej. deepl_stub_server.py); la API gratuita por defecto
+        self.translator = DeepLHTTPTranslator(
+            api_key, source_lang, target_lang, server_url=deepl_server_url
+        )
+        # Registro de caracteres y política de parciales según la cuota
+        self.budget = create_budget(self.translator, source_lang, target_lang,
+                                    usage_path=usage_path, char_budget=char_budget,
+                                    partial_interval=partial_interval)
+        # Deadline + hedging + circuit breaker: DeepL nunca bloquea el callback
+        self.guard = GuardedTranslator(self.budget.metered(self.translator.translate),
+                                       deadline=deepl_deadline)
+        # Glosario local: términos protegidos con marcadores antes de traducir
+        self.glossary = load_glossary(
+            glossary_files, glossary_ids, client=self.translator,
+            source_lang=source_lang, target_lang=target_lang, refresh=refresh_glossary
         )
+        self.translate = self.glossary.wrap(self.guard.translate) if self.glossary else self.guard.translate
         self.current_text = ""
-        self.completed_segments = []
+        # Últimos segmentos fijados (pertenencia O(1), tamaño acotado)
+        self.completed_segments = BoundedSet(maxlen=500)
+        # Solo se traduce el texto nuevo respecto a los segmentos ya fijados
+        self.differ = WordDiffer()
+        
+        # Snapshot de sesión: no retraducir ni repetir segmentos tras un reinicio
+        # (el contexto del servidor whisper-live no se puede recuperar)
+        self.snapshot = None
+        if snapshot_path:
+            self.snapshot = SessionSnapshot(snapshot_path, limits={'completed_segments': 500})
+            if self.snapshot.load():
+                for seg_text in self.snapshot.get('completed_segments', []):
+                    self.completed_segments.add(seg_text)
+                self.differ.history.extend(self.snapshot.get('differ_history', []))
+                print(f"💾 Sesión recuperada: {len(self.completed_segments)} segmentos")
+            self.snapshot.record_metric(process='client_deepl', restored=len(self.completed_segments))
+            self.snapshot.start()
+        
+        def on_late_completed(source, translated):
+            # La traducción llegó después del deadline: mostrarla debajo del original
+            sys.stdout.write('\r' + ' ' * 150 + '\r')
+            print(f"↻ {translated}")
+            sys.stdout.flush()
+        
+        def on_late_partial(source, translated):
+            # Solo tiene sentido si el parcial sigue siendo el actual
+            if source == self.current_text:
+                sys.stdout.write('\r' + ' ' * 150 + '\r')
+                sys.stdout.write(f"⏳ {translated}")
+                sys.stdout.flush()
         
         def translation_callback(client_instance, segments):
             if not segments:
@@ -43,47 +94,69 @@ class DeepLTranslatingClient:
                 if is_completed:
                     # Segmento completo - traducir y fijar
                     if seg_text not in self.completed_segments:
-                        try:
-                            translated = self.translator.translate(seg_text)
-                            # Limpiar y mostrar traducción final
-                            sys.stdout.write('\r' + ' ' * 150 + '\r')
-                            print(f"{translated}")
-                            sys.stdout.flush()
-                            self.completed_segments.append(seg_text)
-                            self.current_text = ""
-                        except Exception as e:
-                            # Fallback si falla DeepL
-                            print(f"\n{seg_text}")
-                            sys.stdout.flush()
-                            self.completed_segments.append(seg_text)
+                        self.completed_segments.add(seg_text)
+                        # Solo las palabras que no se habían fijado ya
+                        new_text = self.differ.diff(seg_text)
+                        if self.snapshot is not None:
+                            self.snapshot.append('completed_segments', seg_text)
+                            self.snapshot.set('differ_history', list(self.differ.history))
+                        self.current_text = ""
+                        if not new_text:
+                            continue
+                        if self.budget.allow_final():
+                            # Si DeepL falla o tarda, se muestra el original
+                            translated, _ = self.translate(new_text, on_late=on_late_completed)
+                        else:
+                            translated = self.glossary.apply(new_text) if self.glossary else new_text
+                        # Limpiar y mostrar traducción final
+                        sys.stdout.write('\r' + ' ' * 150 + '\r')
+                        print(f"{translated}")
+                        sys.stdout.flush()
                 else:
-                    # Segmento parcial - traducir también
-                    if seg_text != self.current_text:
-                        try:
-                            translated_partial = self.translator.translate(seg_text)
-                            sys.stdout.write('\r' + ' ' * 150 + '\r')
-                            sys.stdout.write(f"⏳ {translated_partial}")
-                            sys.stdout.flush()
-                            self.current_text = seg_text
-                        except:
-                            # Fallback
-                            sys.stdout.write('\r' + ' ' * 150 + '\r')
-                            sys.stdout.write(f"⏳ {seg_text}")
-                            sys.stdout.flush()
-                            self.current_text = seg_text
+                    # Segmento parcial - traducir solo lo que aún no está fijado
+                    pending_text = self.differ.diff(seg_text, commit=False)
+                    if pending_text and not WordDiffer.same(pending_text, self.current_text):
+                        # Solo parciales estables o como mucho uno por intervalo
+                        decision = self.budget.partial_decision(pending_text)
+                        if decision == 'skip':
+                            continue
+                        self.current_text = pending_text
+                        if decision == 'translate':
+                            translated_partial, _ = self.translate(pending_text, on_late=on_late_partial)
+                        else:
+                            translated_partial = self.glossary.apply(pending_text) if self.glossary else pending_text
+                        sys.stdout.write('\r' + ' ' * 150 + '\r')
+                        sys.stdout.write(f"⏳ {translated_partial}")
+                        sys.stdout.flush()
         
-        # Crear cliente con modelo SMALL (buena calidad)
-        self.client = TranscriptionClient(
+        # Callback de segmentos: bench_soak.py lo llama directamente, sin servidor
+        self.on_segments = translation_callback
+        # Cliente con modelo SMALL (buena calidad); se crea al iniciar
+        self.whisper_options = dict(
             host=host,
             port=port,
             lang='en',  # Whisper siempre en inglés
-            transcription_callback=translation_callback,
             **whisper_args
         )
     
     def __call__(self):
-        """Iniciar transcripción."""
-        self.client()
+        """Iniciar transcripción (la conexión con el servidor se abre aquí)."""
+        try:
+            self.client = TranscriptionClient(
+                transcription_callback=self.on_segments,
+                **self.whisper_options
+            )
+            self.client()
+        finally:
+            self.close()
+    
+    def close(self):
+        """Guardar snapshot y registro de uso, y mostrar el consumo de la sesión."""
+        if self.snapshot is not None:
+            self.snapshot.stop()
+        self.budget.ledger.stop()
+        self.guard.shutdown()
+        print(f"\n{self.budget.summary()}")
 
 
 def main():
@@ -125,13 +198,83 @@ def main():
     parser.add_argument(
         '--model',
         type=str,
-        default='small',
+        default=None,
         choices=['tiny', 'base', 'small', 'medium', 'large'],
-        help='Modelo Whisper (default: small - buen balance)'
+        help='Modelo Whisper (default: small - buen balance, o el del perfil)'
+    )
+    parser.add_argument(
+        '--profile',
+        type=str,
+        default=None,
+        help='Perfil de ajuste de profiles.json (generado con autotune.py)'
+    )
+    parser.add_argument(
+        '--deepl-server-url',
+        type=str,
+        default=None,
+        help='URL alternativa de DeepL (p. ej. deepl_stub_server.py en http://localhost:8001)'
+    )
+    parser.add_argument(
+        '--deepl-deadline',
+        type=float,
+        default=0.8,
+        help='Segundos máximos de espera a DeepL antes de mostrar el original (default: 0.8)'
+    )
+    parser.add_argument(
+        '--snapshot',
+        type=str,
+        default=None,
+        help='Fichero de snapshot para retomar la sesión tras un reinicio'
+    )
+    parser.add_argument(
+        '--char-budget',
+        type=int,
+        default=None,
+        help='Caracteres DeepL al mes (default: la cuota de la cuenta, 500k en la API gratuita)'
+    )
+    parser.add_argument(
+        '--partial-interval',
+        type=float,
+        default=1.0,
+        help='Segundos mínimos entre traducciones de parciales no estables (default: 1.0)'
+    )
+    parser.add_argument(
+        '--usage-file',
+        type=str,
+        default=None,
+        help='Registro de consumo de caracteres (default: deepl_usage.json junto a los scripts)'
+    )
+    parser.add_argument(
+        '--glossary',
+        action='append',
+        default=[],
+        help='Fichero CSV/TSV de términos origen,destino (se puede repetir)'
+    )
+    parser.add_argument(
+        '--glossary-id',
+        action='append',
+        default=[],
+        help='ID de un glosario de DeepL (se descarga una vez y se guarda en caché; ver list_glossaries.py)'
+    )
+    parser.add_argument(
+        '--refresh-glossary',
+        action='store_true',
+        help='Volver a descargar los glosarios de DeepL aunque estén en caché'
     )
     
     args = parser.parse_args()
     
+    try:
+        whisper_args = whisper_live_options({
+            'model': 'small',
+            'send_last_n_segments': 2,      # Balance velocidad/contexto
+            'no_speech_thresh': 0.25,       # Bajo para detectar voz fácilmente
+            'same_output_threshold': 2      # Actualiza rápido
+        }, args.profile, model=args.model)
+    except ValueError as e:
+        print(f"❌ ERROR: {e}")
+        sys.exit(1)
+    
     # Obtener API key
     api_key = args.api_key or os.getenv('DEEPL_API_KEY')
     
@@ -148,7 +291,7 @@ def main():
     print(f"⚡ TRANSCRIPCIÓN con DeepL (ALTA CALIDAD)")
     print(f"📡 Servidor: {args.host}:{args.port}")
     print(f"� {args.source_lang.upper()} → {args.target_lang.upper()}")
-    print(f"🤖 Modelo: {args.model}")
+    print(f"🤖 Modelo: {whisper_args['model']}" + (f" (perfil {args.profile})" if args.profile else ""))
     print(f"✨ Traductor: DeepL (mejor calidad)")
     print(f"⏱️  Latencia: 2-4 segundos")
     print("\n" + "="*60)
@@ -164,10 +307,16 @@ def main():
             api_key=api_key,
             source_lang=args.source_lang,
             target_lang=args.target_lang,
-            model=args.model,
-            send_last_n_segments=2,      # Balance velocidad/contexto
-            no_speech_thresh=0.25,       # Bajo para detectar voz fácilmente
-            same_output_threshold=2      # Actualiza rápido
+            deepl_server_url=args.deepl_server_url,
+            deepl_deadline=args.deepl_deadline,
+            snapshot_path=args.snapshot,
+            usage_path=args.usage_file,
+            char_budget=args.char_budget,
+            partial_interval=args.partial_interval,
+            glossary_files=args.glossary,
+            glossary_ids=args.glossary_id,
+            refresh_glossary=args.refresh_glossary,
+            **whisper_args
         )
         
         client()
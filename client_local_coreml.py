@@ -4,28 +4,35 @@ Cliente Whisper LOCAL con CoreML - Optimizado para Apple M4.
 
 Usa el Neural Engine y Metal Performance Shaders del M4 para MÁXIMA velocidad.
 Latencia objetivo: 0.5-1 segundo.
+
+Las dependencias pesadas (whisper/torch, numpy, sounddevice, deepl) se importan
+de forma perezosa: `--help` es instantáneo y la captura de audio empieza antes
+de que el modelo termine de cargar.
 """
 
-import whisper
-import numpy as np
-import sounddevice as sd
-import queue
+import time
+_STARTUP_T0 = time.perf_counter()
+
 import threading
 import sys
 import os
 import argparse
-import deepl
-import time
 import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from urllib import request as urllib_request, error as urllib_error
+from deepl_budget import create_budget
+from glossary import PLACEHOLDER_RE, load_glossary
+from translation_guard import GuardedTranslator
+from text_diff import WordDiffer
+from bounded_state import LRUCache
+from session_snapshot import SessionSnapshot
+from tracing import SubtitleTrace, TraceExporter
+from profiles import load_profile
 
-# Deshabilitar barras de progreso de tqdm (usadas por Whisper)
-import warnings
-warnings.filterwarnings("ignore")
-os.environ["TQDM_DISABLE"] = "1"
 
-# Monkey-patch tqdm para deshabilitarla completamente
 class DummyTqdm:
+    """Sustituto mudo de tqdm (Whisper pinta barras de progreso en stderr)."""
     def __init__(self, *args, **kwargs):
         pass
     def __enter__(self):
@@ -39,51 +46,135 @@ class DummyTqdm:
     def set_description(self, *args, **kwargs):
         pass
 
-import sys
-sys.modules['tqdm'] = type(sys)('tqdm')
-sys.modules['tqdm'].tqdm = DummyTqdm
-sys.modules['tqdm.auto'] = type(sys)('tqdm.auto')
-sys.modules['tqdm.auto'].tqdm = DummyTqdm
+
+def _silence_tqdm():
+    """Deshabilitar barras de progreso de tqdm antes de importar Whisper."""
+    import warnings
+    warnings.filterwarnings("ignore")
+    os.environ["TQDM_DISABLE"] = "1"
+    
+    # Monkey-patch tqdm para deshabilitarla completamente
+    sys.modules['tqdm'] = type(sys)('tqdm')
+    sys.modules['tqdm'].tqdm = DummyTqdm
+    sys.modules['tqdm.auto'] = type(sys)('tqdm.auto')
+    sys.modules['tqdm.auto'].tqdm = DummyTqdm
+
+
+def import_whisper():
+    """Importar whisper (y torch) bajo demanda."""
+    if 'whisper' not in sys.modules:
+        _silence_tqdm()
+    import whisper
+    return whisper
+
+
+# Escalones para degradar el modelo cuando no se llega a tiempo real
+MODEL_LADDER = ['large', 'medium', 'small', 'base', 'tiny']
 
 
 class LocalCoreMLClient:
     """Cliente local optimizado para Apple M4 con CoreML."""
     
-    def __init__(self, api_key, source_lang='en', target_lang='es', model_name='small', web_display=False, glossary_id=None):
+    def __init__(self, api_key, source_lang='en', target_lang='es', model_name='small', web_display=False, glossary_id=None,
+                 deepl_server_url=None, deepl_deadline=0.8, latency_target=2.0,
+                 backlog_policy='drop', max_backlog=10.0, allow_model_downgrade=False,
+                 asr_process=False, startup_buffer=60.0, snapshot_path=None,
+                 trace_file=None, trace_format='jsonl', chunk_duration=1.5,
+                 no_speech_thresh=None, omp_num_threads=None, glossary_files=(), refresh_glossary=False,
+                 usage_path=None, char_budget=None):
         print("🚀 Inicializando Whisper Local con CoreML...")
         
+        # Tiempos de arranque (importaciones, carga del modelo, primer audio...)
+        self.timings = {'init': time.perf_counter() - _STARTUP_T0}
+        t0 = time.perf_counter()
+        from backpressure import AdaptiveChunkController  # importa numpy
+        self.timings['import_numpy'] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        import deepl
+        from deepl_http import DeepLHTTPTranslator  # requests, ya importado por deepl
+        self.timings['import_deepl'] = time.perf_counter() - t0
+        
         # NOTA: openai-whisper tiene problemas con MPS (sparse tensors)
         # Usamos CPU, que en M4 es MUCHO más rápido que en Intel
         # Ver: https://github.com/openai/whisper/issues/1121
         self.device = "cpu"
+        if omp_num_threads:
+            # Antes de importar torch (se importa de forma perezosa al cargar el modelo)
+            os.environ['OMP_NUM_THREADS'] = str(omp_num_threads)
+        self.omp_num_threads = omp_num_threads
+        self.no_speech_thresh = no_speech_thresh
         print(f"   Dispositivo: CPU (optimizado para Apple Silicon)")
         print(f"   ℹ️  M4 CPU > Docker CPU genérico")
         
-        # Cargar modelo Whisper
-        print(f"   Cargando modelo '{model_name}'...")
-        self.model = whisper.load_model(model_name, device=self.device)
-        print("   ✅ Modelo cargado en memoria") 
+        # El modelo Whisper se carga en segundo plano al llamar a start()
+        # (en este proceso o en un worker dedicado)
+        self.model_name = model_name
+        self.allow_model_downgrade = allow_model_downgrade
+        self.asr_process = asr_process
+        self.asr_worker = None
+        self.model = None
+        self.models = {}
+        self.model_ready = threading.Event()
+        self.model_error = None
+        self.active_model_name = model_name
         
         # Configurar traductor DeepL (biblioteca oficial)
-        self.translator = deepl.Translator(api_key)
+        self.translator = deepl.Translator(api_key, server_url=deepl_server_url)
+        # Registro de caracteres: con la cuota agotada se muestra el original
+        # (el consumo de la cuenta y los glosarios se consultan con el cliente
+        # HTTP de deepl_http)
+        deepl_http = DeepLHTTPTranslator(
+            api_key, source_lang, target_lang, server_url=deepl_server_url,
+            use_free_api=deepl.util.auth_key_is_free_account(api_key)
+        )
+        self.budget = create_budget(deepl_http, source_lang, target_lang,
+                                    usage_path=usage_path, char_budget=char_budget)
+        # Deadline + hedging + circuit breaker: DeepL nunca bloquea el pipeline
+        self.guard = GuardedTranslator(self.budget.metered(self._deepl_translate), deadline=deepl_deadline)
+        if deepl_server_url:
+            print(f"   🧪 Servidor DeepL: {deepl_server_url}")
         self.source_lang = source_lang
         self.target_lang = target_lang
         self.glossary_id = glossary_id
         if glossary_id:
             print(f"   📚 Glosario activado: {glossary_id}")
+        # Glosario local (ficheros + el de DeepL en caché): también cubre la caché
+        # de traducciones y el texto original que se muestra si DeepL no responde
+        self.glossary = load_glossary(
+            glossary_files, [glossary_id] if glossary_id else [], client=deepl_http,
+            source_lang=source_lang, target_lang=target_lang, refresh=refresh_glossary
+        )
+        self.translate = self.glossary.wrap(self.guard.translate) if self.glossary else self.guard.translate
         
         # Configuración de audio
         self.sample_rate = 16000
-        self.chunk_duration = 1.5  # Segundos de audio por chunk
-        self.chunk_samples = int(self.sample_rate * self.chunk_duration)
+        # Duración del chunk adaptativa (empieza en 1.5 s o la del perfil) según el RTF medido
+        self.controller = AdaptiveChunkController(
+            sample_rate=self.sample_rate,
+            latency_target=latency_target,
+            initial_chunk=chunk_duration,
+            max_level=2 if allow_model_downgrade else 1
+        )
+        self.decode_level = 0
         
-        # Buffer de audio
-        self.audio_queue = queue.Queue()
+        # Buffer de audio acotado (max_backlog segundos como máximo). Mientras
+        # carga el modelo se permite acumular hasta startup_buffer segundos.
+        self.max_backlog = max_backlog
+        self.backlog_seconds = max(max_backlog, startup_buffer)
+        self.backlog_policy = backlog_policy
+        self.audio_backlog = self.create_backlog()
         self.is_running = False
         
-        # Caché de traducciones
-        self.translation_cache = {}
+        # Caché de traducciones (LRU acotada: memoria constante en sesiones largas)
+        self.translation_cache = LRUCache(maxsize=2000)
         self.last_transcription = ""
+        # Solo se traduce/publica el texto nuevo respecto a lo ya emitido
+        self.differ = WordDiffer()
+        
+        # Snapshot de sesión: retomar caché y contexto tras un reinicio
+        self.snapshot = None
+        if snapshot_path:
+            self.restore_snapshot(snapshot_path)
         
         # Configuración web display
         self.web_display = web_display
@@ -91,16 +182,76 @@ class LocalCoreMLClient:
         if web_display:
             print(f"🌐 Web Display: Activado (→ {self.web_server_url})")
         
+        # Trazas por subtítulo: viajan al servidor web y opcionalmente se exportan aquí
+        self.tracer = TraceExporter(trace_file, trace_format) if trace_file else None
+        if self.tracer:
+            print(f"🔎 Trazas: {trace_file} ({trace_format})")
+        
         print("✅ Inicialización completa\n")
     
+    def create_backlog(self):
+        """Buffer de la entrada de audio (None si cada entrada tiene el suyo)."""
+        from backpressure import AudioBacklog
+        return AudioBacklog(
+            sample_rate=self.sample_rate,
+            max_seconds=self.backlog_seconds,
+            policy=self.backlog_policy
+        )
+    
     def audio_callback(self, indata, frames, time_info, status):
         """Callback para captura de audio."""
         if status:
             print(f"⚠️  Audio status: {status}", file=sys.stderr)
-        self.audio_queue.put(indata.copy())
+        if 'first_audio' not in self.timings:
+            self.timings['first_audio'] = time.perf_counter() - _STARTUP_T0
+        self.audio_backlog.put(indata[:, 0].copy())
+    
+    def load_model(self):
+        """Cargar Whisper (thread en segundo plano) mientras ya se captura audio."""
+        t0 = time.perf_counter()
+        try:
+            if self.asr_process:
+                # Whisper en otro proceso: la captura no compite por el GIL
+                from asr_worker import ASRWorker
+                self.asr_worker = ASRWorker(self.model_name, device=self.device).start()
+            else:
+                whisper = import_whisper()
+                self.timings['import_whisper'] = time.perf_counter() - t0
+                if self.omp_num_threads:
+                    import torch
+                    torch.set_num_threads(self.omp_num_threads)
+                self.model = whisper.load_model(self.model_name, device=self.device)
+                self.models[self.model_name] = self.model
+            self.timings['load_model'] = time.perf_counter() - t0
+            self.timings['model_ready'] = time.perf_counter() - _STARTUP_T0
+        except Exception as e:
+            self.model_error = e
+            self.is_running = False
+            print(f"❌ Error cargando el modelo: {e}", file=sys.stderr)
+        finally:
+            self.model_ready.set()
+    
+    def report_timings(self):
+        """Mostrar los tiempos de arranque (para detectar regresiones)."""
+        labels = [
+            ('init', 'Importación del cliente'),
+            ('import_numpy', 'Importación numpy'),
+            ('import_deepl', 'Importación deepl'),
+            ('first_audio', 'Primer audio capturado'),
+            ('import_whisper', 'Importación whisper/torch'),
+            ('load_model', 'Carga del modelo'),
+            ('model_ready', 'Modelo listo'),
+            ('recovered', 'Snapshot recuperado'),
+            ('backlog_drained', 'Audio acumulado transcrito'),
+        ]
+        parts = [f"{label}: {self.timings[key]:.2f}s" for key, label in labels if key in self.timings]
+        print("⏱️  Arranque | " + " | ".join(parts), file=sys.stderr)
     
     def process_audio_chunk(self, audio_data):
         """Procesar un chunk de audio con Whisper."""
+        import numpy as np
+        # Antes del try: el except lo necesita también en la rama del worker
+        stderr_backup = sys.stderr
         try:
             # Convertir a formato que Whisper espera
             audio_float = audio_data.flatten().astype(np.float32)
@@ -108,10 +259,18 @@ class LocalCoreMLClient:
             # Normalizar audio
             audio_float = audio_float / np.max(np.abs(audio_float) + 1e-8)
             
-            # Suprimir COMPLETAMENTE stderr (donde tqdm escribe)
-            # Guardar stderr original
-            stderr_backup = sys.stderr
+            if self.asr_worker is not None:
+                # El worker redirige su propio stderr; aquí solo esperamos el resultado
+                return self.asr_worker.transcribe(
+                    audio_float,
+                    language='en',
+                    fp16=False,
+                    verbose=False,
+                    temperature=0.0,
+                    **self.decode_options()
+                )
             
+            # Suprimir COMPLETAMENTE stderr (donde tqdm escribe)
             try:
                 # Redirigir stderr a /dev/null
                 sys.stderr = open(os.devnull, 'w')
@@ -122,8 +281,8 @@ class LocalCoreMLClient:
                     language='en',
                     fp16=False,  # M4 funciona mejor con FP32
                     verbose=False,
-                    condition_on_previous_text=True,
-                    temperature=0.0
+                    temperature=0.0,
+                    **self.decode_options()
                 )
             finally:
                 # Restaurar stderr
@@ -140,98 +299,322 @@ class LocalCoreMLClient:
             print(f"⚠️  Error en transcripción: {e}", file=sys.stderr)
             return None
     
-    def translate_text(self, text):
-        """Traducir texto usando caché y glosario (si está configurado)."""
+    def _deepl_translate(self, text):
+        """Llamada directa a DeepL (sin caché ni deadline).
+        
+        Un solo glosario por petición: si el glosario local ya ha cambiado
+        términos por marcadores, el de DeepL no se envía (podría volver a
+        traducir lo que rodea a los marcadores); si no, se envía (cubre los
+        términos que el glosario local no tiene, p. ej. si no se pudo descargar).
+        """
+        protected = self.glossary is not None and PLACEHOLDER_RE.search(text) is not None
+        # Traducir con la biblioteca oficial de DeepL
+        result = self.translator.translate_text(
+            text,
+            source_lang=self.source_lang,
+            target_lang=self.target_lang,
+            glossary=None if protected else self.glossary_id
+        )
+        return result.text
+    
+    def translate_text(self, text, on_late=None):
+        """Traducir texto usando caché y glosario (si está configurado).
+        
+        Devuelve (texto, definitivo). Si DeepL no responde antes del deadline
+        se devuelve el texto original y `on_late(text, traducido)` recibirá
+        la traducción cuando llegue.
+        """
         if not text:
-            return None
+            return None, True
         
         # Usar caché si existe
-        if text in self.translation_cache:
-            return self.translation_cache[text]
+        cached = self.translation_cache.get(text)
+        if cached is not None:
+            return cached, True
+        if not self.budget.allow_final():
+            # Cuota agotada: el original (con los términos del glosario), sin caché
+            return (self.glossary.apply(text) if self.glossary else text), True
         
-        try:
-            # Traducir con la biblioteca oficial de DeepL
-            result = self.translator.translate_text(
-                text,
-                source_lang=self.source_lang,
-                target_lang=self.target_lang,
-                glossary=self.glossary_id  # Usar glosario si está configurado
-            )
-            translated = result.text
-            self.translation_cache[text] = translated
-            return translated
-        except Exception as e:
-            print(f"⚠️  Error en traducción: {e}", file=sys.stderr)
-            return text
-    
-    def send_to_web(self, text):
-        """Enviar subtítulo al servidor web."""
-        if not self.web_display or not text:
-            return
+        def _late(source, translated):
+            self.cache_translation(source, translated)
+            if on_late is not None:
+                on_late(source, translated)
         
+        translated, final = self.translate(text, on_late=_late)
+        if final and translated != text:
+            self.cache_translation(text, translated)
+        return translated, final
+    
+    def cache_translation(self, text, translated):
+        """Guardar una traducción en la caché (y en el snapshot si está activo)."""
+        self.translation_cache[text] = translated
+        if self.snapshot is not None:
+            self.snapshot.put('translation_cache', text, translated)
+    
+    def restore_snapshot(self, path):
+        """Recuperar caché de traducciones y contexto de un snapshot anterior."""
+        self.snapshot = SessionSnapshot(path, limits={'translation_cache': self.translation_cache.maxsize})
+        glossary_fingerprint = self.glossary.fingerprint if self.glossary else None
+        if self.snapshot.load():
+            # Las traducciones guardadas con otro glosario ya no valen
+            if self.snapshot.get('glossary') == glossary_fingerprint:
+                for text, translated in self.snapshot.get('translation_cache', {}).items():
+                    self.translation_cache[text] = translated
+            self.restore_context()
+            print(f"   💾 Sesión recuperada: {len(self.translation_cache)} traducciones en caché")
+        self.snapshot.set('glossary', glossary_fingerprint)
+        self.timings['recovered'] = time.perf_counter() - _STARTUP_T0
+        self.snapshot.start()
+    
+    def restore_context(self):
+        """Recuperar del snapshot el último texto publicado y el contexto del diff."""
+        self.differ.history.extend(self.snapshot.get('differ_history', []))
+        self.last_transcription = self.snapshot.get('last_transcription', "")
+    
+    def save_context(self, text, differ, label=None):
+        """Registrar en el snapshot el último texto publicado y el contexto del diff."""
+        self.last_transcription = text
+        if self.snapshot is not None:
+            self.snapshot.set('last_transcription', self.last_transcription)
+            self.snapshot.set('differ_history', list(differ.history))
+    
+    def _post_json(self, url, payload):
+        """POST JSON al servidor web. Devuelve la respuesta o None."""
         try:
-            data = json.dumps({'text': text}).encode('utf-8')
+            data = json.dumps(payload).encode('utf-8')
             req = urllib_request.Request(
-                self.web_server_url,
+                url,
                 data=data,
                 headers={'Content-Type': 'application/json'}
             )
-            urllib_request.urlopen(req, timeout=1)
+            with urllib_request.urlopen(req, timeout=1) as response:
+                return json.loads(response.read().decode('utf-8') or '{}')
         except (urllib_error.URLError, urllib_error.HTTPError) as e:
             # Silencioso: no mostrar error si el servidor no está disponible
-            pass
+            return None
         except Exception as e:
-            pass
+            return None
+    
+    def send_to_web(self, text, trace=None, label=None):
+        """Enviar subtítulo al servidor web. Devuelve su id (o None)."""
+        if not self.web_display or not text:
+            return None
+        
+        payload = {'text': text}
+        if label:
+            payload['stream'] = label
+        if trace is not None:
+            payload['trace'] = trace.to_dict()
+        response = self._post_json(self.web_server_url, payload)
+        return response.get('id') if response else None
+    
+    def update_web(self, subtitle_id, text):
+        """Sustituir el texto de un subtítulo ya publicado."""
+        if not self.web_display or subtitle_id is None or not text:
+            return
+        
+        self._post_json(f"{self.web_server_url}/{subtitle_id}", {'text': text})
+    
+    def show_subtitle(self, text):
+        """Limpiar línea y mostrar solo traducción."""
+        sys.stdout.write('\r' + ' ' * 150 + '\r')
+        print(f"{text}")
+        sys.stdout.flush()
+    
+    def decode_options(self):
+        """Opciones de Whisper según el nivel de degradación actual."""
+        options = {}
+        if self.no_speech_thresh is not None:
+            options['no_speech_threshold'] = self.no_speech_thresh
+        if self.decode_level == 0:
+            return dict(options, condition_on_previous_text=True)
+        # Nivel 1+: sin contexto previo ni timestamps (decodificación más corta)
+        return dict(options, condition_on_previous_text=False, without_timestamps=True)
+    
+    def apply_decode_level(self, level):
+        """Aplicar un nivel de degradación pedido por el controlador."""
+        if level == self.decode_level:
+            return
+        self.decode_level = level
+        print(f"⚙️  Nivel de degradación: {level} "
+              f"(chunk {self.controller.chunk_duration:.1f}s, RTF {self.controller.rtf:.2f})",
+              file=sys.stderr)
+        
+        # Nivel 2: bajar un escalón de modelo (se carga en segundo plano)
+        target = self.model_name
+        if level >= 2 and self.allow_model_downgrade:
+            ladder = MODEL_LADDER
+            if self.model_name in ladder and ladder.index(self.model_name) + 1 < len(ladder):
+                target = ladder[ladder.index(self.model_name) + 1]
+        
+        if target == self.active_model_name:
+            return
+        
+        if self.asr_worker is not None:
+            # El worker carga y cachea el modelo. Mientras carga tiene el lock, así
+            # que el siguiente transcribe() espera a que termine (hasta job_timeout);
+            # el thread solo evita que el controlador se quede esperando aquí
+            self.active_model_name = target
+
+            def _switch():
+                if not self.asr_worker.switch_model(target):
+                    # Seguir con el modelo que tenga el worker
+                    self.active_model_name = self.asr_worker.model_name
+
+            threading.Thread(target=_switch, daemon=True).start()
+            return
+        
+        if target in self.models:
+            self.active_model_name = target
+            self.model = self.models[target]
+            return
+        
+        def _load():
+            whisper = import_whisper()
+            model = whisper.load_model(target, device=self.device)
+            self.models[target] = model
+            if self.decode_level >= 2:
+                self.active_model_name = target
+                self.model = model
+                print(f"⚙️  Modelo degradado a '{target}'", file=sys.stderr)
+        
+        threading.Thread(target=_load, daemon=True).start()
+    
+    def start_trace(self, audio_chunk, backlog, label=None):
+        """Traza de una ventana: la captura terminó hace tanto como audio queda pendiente."""
+        trace = SubtitleTrace(attributes={'model': self.active_model_name,
+                                          'audio_s': round(len(audio_chunk) / self.sample_rate, 3)})
+        if label:
+            trace.attributes['stream'] = label
+        capture_end = time.monotonic_ns() - int(backlog.pending_seconds() * 1e9)
+        trace.mark('capture_end', capture_end)
+        trace.mark('capture_start', capture_end - int(len(audio_chunk) / self.sample_rate * 1e9))
+        return trace
+    
+    def handle_window(self, audio_chunk):
+        """Transcribir, traducir y publicar una ventana de audio."""
+        # Medir tiempo de procesamiento
+        start_time = time.time()
+        trace = self.start_trace(audio_chunk, self.audio_backlog)
+        
+        # Transcribir
+        trace.mark('asr_start')
+        text = self.process_audio_chunk(audio_chunk.reshape(-1, 1))
+        trace.mark('asr_end')
+        
+        # Realimentar el controlador con el RTF de esta decodificación
+        decode_time = time.time() - start_time
+        if self.controller.record(len(audio_chunk) / self.sample_rate, decode_time,
+                                  self.audio_backlog.pending_seconds()):
+            self.apply_decode_level(self.controller.level)
+        
+        self.publish(text, trace)
+    
+    def publish(self, text, trace, differ=None, label=None):
+        """Traducir y publicar el texto nuevo de una ventana ya transcrita."""
+        differ = differ or self.differ
+        
+        # Quedarse solo con las palabras nuevas (solapes y re-decodificaciones)
+        new_text = differ.diff(text) if text else ""
+        if not new_text:
+            return
+        text = new_text
+        
+        # Traducir (con deadline: si tarda, se muestra el original)
+        pending = {'posted': threading.Event()}
+        prefix = f"[{label}] " if label else ""
+        
+        def on_late(source, late_translation):
+            # Sustituir el texto original por la traducción tardía
+            pending['posted'].wait(timeout=2.0)
+            self.update_web(pending.get('id'), late_translation)
+            self.show_subtitle(f"↻ {prefix}{late_translation}")
+        
+        trace.mark('translate_start')
+        translated, final = self.translate_text(text, on_late=on_late)
+        trace.mark('translate_end')
+        trace.attributes['translation_final'] = final
+        
+        if translated:
+            # Enviar a web display si está habilitado
+            pending['id'] = self.send_to_web(translated, trace, label)
+            pending['posted'].set()
+            self.show_subtitle(prefix + translated)
+            if self.tracer is not None:
+                self.tracer.export(trace)
+            
+            self.save_context(text, differ, label)
+            
+            if 'first_subtitle' not in self.timings:
+                self.timings['first_subtitle'] = time.perf_counter() - _STARTUP_T0
+                if self.snapshot is not None:
+                    # Time-to-recover: del arranque al primer subtítulo visible
+                    self.snapshot.record_metric(
+                        process='client_local_coreml',
+                        restored=len(self.translation_cache),
+                        recovered_ms=round(self.timings['recovered'] * 1000, 2),
+                        time_to_recover_ms=round(self.timings['first_subtitle'] * 1000, 2)
+                    )
+    
+    def drain_startup_backlog(self):
+        """Transcribir el audio acumulado mientras cargaba el modelo."""
+        while self.is_running and self.audio_backlog.pending_seconds() >= self.controller.chunk_duration:
+            # Ventanas largas (hasta ~25 s): se amortiza el coste por llamada
+            self.handle_window(self.audio_backlog.drain())
+        # A partir de aquí rige el límite normal de backlog
+        self.audio_backlog.set_max_seconds(self.max_backlog)
+        self.timings['backlog_drained'] = time.perf_counter() - _STARTUP_T0
+        self.report_timings()
     
     def processing_loop(self):
         """Loop principal de procesamiento."""
-        audio_buffer = np.array([], dtype=np.float32)
+        # Esperar al modelo; mientras tanto el audio se acumula en el backlog
+        while self.is_running and not self.model_ready.wait(timeout=0.1):
+            pass
+        if not self.is_running or self.model_error is not None:
+            return
+        
+        try:
+            self.drain_startup_backlog()
+        except Exception as e:
+            print(f"❌ Error en loop: {e}", file=sys.stderr)
         
         while self.is_running:
             try:
-                # Obtener audio del queue (timeout 0.1s)
-                chunk = self.audio_queue.get(timeout=0.1)
-                audio_buffer = np.append(audio_buffer, chunk)
+                # Siguiente ventana (aplica la política si vamos atrasados)
+                audio_chunk = self.audio_backlog.take(
+                    self.controller.chunk_samples,
+                    max_lag_samples=self.controller.max_lag_samples,
+                    timeout=0.1
+                )
+                if audio_chunk is None:
+                    continue
                 
-                # Procesar cuando tengamos suficiente audio
-                if len(audio_buffer) >= self.chunk_samples:
-                    # Tomar chunk y procesar
-                    audio_chunk = audio_buffer[:self.chunk_samples]
-                    audio_buffer = audio_buffer[self.chunk_samples:]
-                    
-                    # Medir tiempo de procesamiento
-                    start_time = time.time()
-                    
-                    # Transcribir
-                    text = self.process_audio_chunk(audio_chunk.reshape(-1, 1))
-                    
-                    if text and text != self.last_transcription:
-                        # Traducir
-                        translated = self.translate_text(text)
-                        
-                        # Calcular latencia
-                        latency = time.time() - start_time
-                        
-                        if translated:
-                            # Enviar a web display si está habilitado
-                            self.send_to_web(translated)
-                            
-                            # Limpiar línea y mostrar solo traducción
-                            sys.stdout.write('\r' + ' ' * 150 + '\r')
-                            print(f"{translated}")
-                            sys.stdout.flush()
-                            
-                            self.last_transcription = text
+                self.handle_window(audio_chunk)
                 
-            except queue.Empty:
-                continue
             except Exception as e:
                 print(f"❌ Error en loop: {e}", file=sys.stderr)
     
+    def audio_inputs(self, sd):
+        """Streams de captura de sounddevice (uno: el micrófono por defecto)."""
+        return [sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype='float32',
+            blocksize=int(self.sample_rate * 0.1),  # 100ms blocks
+            callback=self.audio_callback
+        )]
+    
     def start(self):
         """Iniciar captura y procesamiento."""
+        import sounddevice as sd
         self.is_running = True
         
+        # Cargar el modelo en segundo plano: la captura empieza ya
+        print(f"   Cargando modelo '{self.model_name}' en segundo plano...")
+        self.loader_thread = threading.Thread(target=self.load_model, daemon=True)
+        self.loader_thread.start()
+        
         # Iniciar thread de procesamiento
         self.processing_thread = threading.Thread(target=self.processing_loop)
         self.processing_thread.start()
@@ -239,17 +622,14 @@ class LocalCoreMLClient:
         # Iniciar captura de audio
         print("🎙️  Capturando audio del micrófono...")
         print("   Habla para ver las transcripciones")
+        print("   (el audio se guarda mientras carga el modelo)")
         print("   Presiona Ctrl+C para detener\n")
         print("="*60 + "\n")
         
         try:
-            with sd.InputStream(
-                samplerate=self.sample_rate,
-                channels=1,
-                dtype=np.float32,
-                blocksize=int(self.sample_rate * 0.1),  # 100ms blocks
-                callback=self.audio_callback
-            ):
+            with ExitStack() as stack:
+                for input_stream in self.audio_inputs(sd):
+                    stack.enter_context(input_stream)
                 while self.is_running:
                     sd.sleep(100)
         except KeyboardInterrupt:
@@ -262,9 +642,179 @@ class LocalCoreMLClient:
         self.is_running = False
         if hasattr(self, 'processing_thread'):
             self.processing_thread.join(timeout=2.0)
+        self.guard.shutdown()
+        if self.asr_worker is not None:
+            self.asr_worker.stop()
+        if self.snapshot is not None:
+            self.snapshot.stop()
+        self.budget.ledger.stop()
+        print(self.budget.summary())
         print("✅ Detenido")
 
 
+class MultiStreamLocalClient(LocalCoreMLClient):
+    """Varias entradas (canales o dispositivos) con un único modelo compartido.
+    
+    Las ventanas que están listas a la vez se transcriben en una sola
+    decodificación por lotes; cada entrada se publica con su etiqueta en el
+    servidor de subtítulos.
+    """
+    
+    def __init__(self, api_key, stream_specs, **kwargs):
+        if kwargs.pop('asr_process', False):
+            print("   ⚠️  --asr-process se ignora con varias entradas (el modelo se comparte aquí)")
+        # El snapshot guarda el contexto de cada entrada: se recupera cuando ya existen
+        snapshot_path = kwargs.pop('snapshot_path', None)
+        super().__init__(api_key, asr_process=False, **kwargs)
+        from multistream import AudioStream, parse_stream_spec
+        
+        # Mismo límite de backlog que el modo de una entrada (incluido el de arranque)
+        self.streams = []
+        for index, spec in enumerate(stream_specs):
+            label, device, channel = parse_stream_spec(spec, index)
+            self.streams.append(AudioStream(label, device, channel, sample_rate=self.sample_rate,
+                                            max_seconds=self.backlog_seconds,
+                                            policy=self.backlog_policy))
+            print(f"   🎙️  {label}: canal {channel + 1}"
+                  + (f" de '{device}'" if device is not None else ""))
+        if snapshot_path:
+            self.restore_snapshot(snapshot_path)
+        
+        # Traducción/publicación en paralelo: una entrada lenta no retrasa a las demás
+        self.publish_pool = ThreadPoolExecutor(max_workers=len(self.streams),
+                                               thread_name_prefix='stream')
+    
+    def create_backlog(self):
+        # Cada entrada tiene su propio backlog (AudioStream)
+        return None
+    
+    def restore_context(self):
+        """Contexto del diff de cada entrada (por etiqueta)."""
+        for stream in self.streams:
+            stream.differ.history.extend(self.snapshot.get(f'differ_history/{stream.label}', []))
+    
+    def save_context(self, text, differ, label=None):
+        """Las entradas se publican en paralelo: solo el contexto del diff de cada una."""
+        if self.snapshot is not None:
+            self.snapshot.set(f'differ_history/{label}', list(differ.history))
+    
+    def audio_inputs(self, sd):
+        """Un InputStream por dispositivo con los canales que usan sus entradas."""
+        by_device = {}
+        for stream in self.streams:
+            by_device.setdefault(stream.device, []).append(stream)
+        
+        inputs = []
+        for device, streams in by_device.items():
+            inputs.append(sd.InputStream(
+                device=device,
+                samplerate=self.sample_rate,
+                channels=max(stream.channel for stream in streams) + 1,
+                dtype='float32',
+                blocksize=int(self.sample_rate * 0.1),  # 100ms blocks
+                callback=self.make_audio_callback(streams)
+            ))
+        return inputs
+    
+    def make_audio_callback(self, streams):
+        """Callback que reparte los canales de un dispositivo entre sus entradas."""
+        def callback(indata, frames, time_info, status):
+            if status:
+                print(f"⚠️  Audio status: {status}", file=sys.stderr)
+            if 'first_audio' not in self.timings:
+                self.timings['first_audio'] = time.perf_counter() - _STARTUP_T0
+            for stream in streams:
+                stream.backlog.put(indata[:, stream.channel].copy())
+        return callback
+    
+    def transcribe_batch(self, windows):
+        """Transcribir todas las ventanas con una sola pasada del modelo."""
+        from multistream import batch_transcribe
+        try:
+            # Mismos niveles de degradación que con una entrada. El contexto previo
+            # es de cada entrada y un lote comparte un solo prompt: no se usa aquí
+            options = self.decode_options()
+            options.pop('condition_on_previous_text', None)
+            options.setdefault('without_timestamps', False)
+            return batch_transcribe(self.model, windows, language='en', fp16=False, **options)
+        except Exception as e:
+            print(f"⚠️  Error en transcripción: {e}", file=sys.stderr)
+            return [None] * len(windows)
+    
+    def handle_batch(self, ready):
+        """Transcribir juntas las ventanas listas [(stream, audio)] y publicarlas."""
+        start_time = time.time()
+        traces = [self.start_trace(audio, stream.backlog, stream.label) for stream, audio in ready]
+        asr_start = time.monotonic_ns()
+        texts = self.transcribe_batch([audio for _, audio in ready])
+        asr_end = time.monotonic_ns()
+        for trace in traces:
+            trace.mark('asr_start', asr_start).mark('asr_end', asr_end)
+        
+        # Tiempo real = el lote completo cabe en la duración de una ventana
+        decode_time = time.time() - start_time
+        longest = max(len(audio) for _, audio in ready) / self.sample_rate
+        backlog = max(stream.backlog.pending_seconds() for stream in self.streams)
+        if self.controller.record(longest, decode_time, backlog):
+            self.apply_decode_level(self.controller.level)
+        
+        futures = [
+            self.publish_pool.submit(self.publish, text, trace, stream.differ, stream.label)
+            for (stream, _), text, trace in zip(ready, texts, traces)
+        ]
+        for future in futures:
+            future.result()
+    
+    def drain_startup_backlog(self):
+        """Transcribir (por lotes) el audio acumulado mientras cargaba el modelo."""
+        while self.is_running:
+            ready = [(stream, stream.backlog.drain()) for stream in self.streams
+                     if stream.backlog.pending_seconds() >= self.controller.chunk_duration]
+            if not ready:
+                break
+            self.handle_batch(ready)
+        for stream in self.streams:
+            stream.backlog.set_max_seconds(self.max_backlog)
+        self.timings['backlog_drained'] = time.perf_counter() - _STARTUP_T0
+        self.report_timings()
+    
+    def processing_loop(self):
+        """Loop principal: agrupar las ventanas listas de todas las entradas."""
+        while self.is_running and not self.model_ready.wait(timeout=0.1):
+            pass
+        if not self.is_running or self.model_error is not None:
+            return
+        
+        try:
+            self.drain_startup_backlog()
+        except Exception as e:
+            print(f"❌ Error en loop: {e}", file=sys.stderr)
+        
+        while self.is_running:
+            try:
+                ready = []
+                for stream in self.streams:
+                    audio_chunk = stream.backlog.take(
+                        self.controller.chunk_samples,
+                        max_lag_samples=self.controller.max_lag_samples,
+                        timeout=0
+                    )
+                    if audio_chunk is not None:
+                        ready.append((stream, audio_chunk))
+                if not ready:
+                    time.sleep(0.02)
+                    continue
+                
+                self.handle_batch(ready)
+                
+            except Exception as e:
+                print(f"❌ Error en loop: {e}", file=sys.stderr)
+    
+    def stop(self):
+        super().stop()
+        self.publish_pool.shutdown(wait=False)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Cliente Whisper LOCAL con CoreML para Apple M4'
@@ -290,9 +840,9 @@ def main():
     parser.add_argument(
         '--model',
         type=str,
-        default='small',
+        default=None,
         choices=['tiny', 'base', 'small', 'medium', 'large'],
-        help='Modelo Whisper (default: small)'
+        help='Modelo Whisper (default: small, o el del perfil)'
     )
     parser.add_argument(
         '--web-display',
@@ -303,11 +853,124 @@ def main():
         '--glossary-id',
         type=str,
         default=None,
-        help='ID del glosario de DeepL (opcional)'
+        help='ID del glosario de DeepL (opcional; también se aplica en local a caché y respaldo)'
+    )
+    parser.add_argument(
+        '--glossary',
+        action='append',
+        default=[],
+        help='Fichero CSV/TSV de términos origen,destino (se puede repetir)'
+    )
+    parser.add_argument(
+        '--refresh-glossary',
+        action='store_true',
+        help='Volver a descargar el glosario de DeepL aunque esté en caché'
+    )
+    parser.add_argument(
+        '--deepl-server-url',
+        type=str,
+        default=None,
+        help='URL alternativa de DeepL (p. ej. deepl_stub_server.py en http://localhost:8001)'
+    )
+    parser.add_argument(
+        '--deepl-deadline',
+        type=float,
+        default=0.8,
+        help='Segundos máximos de espera a DeepL antes de mostrar el original (default: 0.8)'
+    )
+    parser.add_argument(
+        '--char-budget',
+        type=int,
+        default=None,
+        help='Caracteres DeepL al mes (default: la cuota de la cuenta, 500k gratis)'
+    )
+    parser.add_argument(
+        '--usage-file',
+        type=str,
+        default=None,
+        help='Registro de consumo de caracteres (default: deepl_usage.json)'
+    )
+    parser.add_argument(
+        '--latency-target',
+        type=float,
+        default=2.0,
+        help='Latencia objetivo en segundos; el chunk se adapta para cumplirla (default: 2.0)'
+    )
+    parser.add_argument(
+        '--backlog-policy',
+        type=str,
+        default='drop',
+        choices=['drop', 'merge'],
+        help='Qué hacer con el audio atrasado: drop = descartarlo, merge = transcribirlo junto (default: drop)'
+    )
+    parser.add_argument(
+        '--max-backlog',
+        type=float,
+        default=10.0,
+        help='Segundos máximos de audio pendiente en memoria (default: 10)'
+    )
+    parser.add_argument(
+        '--allow-model-downgrade',
+        action='store_true',
+        help='Permitir bajar a un modelo más pequeño si no se llega a tiempo real'
+    )
+    parser.add_argument(
+        '--startup-buffer',
+        type=float,
+        default=60.0,
+        help='Segundos de audio que se guardan mientras carga el modelo (default: 60)'
+    )
+    parser.add_argument(
+        '--snapshot',
+        type=str,
+        default=None,
+        help='Fichero de snapshot para retomar la sesión tras un reinicio'
+    )
+    parser.add_argument(
+        '--asr-process',
+        action='store_true',
+        help='Ejecutar Whisper en un proceso dedicado (evita glitches de captura por el GIL)'
+    )
+    parser.add_argument(
+        '--trace-file',
+        type=str,
+        default=None,
+        help='Exportar la traza de cada subtítulo (captura, ASR, traducción) a este fichero'
+    )
+    parser.add_argument(
+        '--trace-format',
+        type=str,
+        default='jsonl',
+        choices=['jsonl', 'otlp'],
+        help='Formato de las trazas: jsonl = un span por línea, otlp = OpenTelemetry JSON (default: jsonl)'
+    )
+    parser.add_argument(
+        '--profile',
+        type=str,
+        default=None,
+        help='Perfil de ajuste de profiles.json (modelo, chunk, umbral de no-voz, hilos; generado con autotune.py)'
+    )
+    parser.add_argument(
+        '--stream',
+        type=str,
+        action='append',
+        default=None,
+        metavar='[ETIQUETA=][DISPOSITIVO:]CANAL',
+        help='Entrada de audio adicional (repetible), p. ej. --stream Ana=1 --stream Luis=2; '
+             'todas comparten el modelo y se decodifican por lotes'
     )
     
     args = parser.parse_args()
     
+    profile = {}
+    if args.profile:
+        try:
+            profile = load_profile(args.profile, 'local')
+        except ValueError as e:
+            print(f"❌ ERROR: {e}")
+            sys.exit(1)
+    model_name = args.model or profile.get('model', 'small')
+    
     # Obtener API key
     api_key = args.api_key or os.getenv('DEEPL_API_KEY')
     if not api_key:
@@ -319,7 +982,7 @@ def main():
     print("⚡ WHISPER LOCAL con CPU Optimizado - Apple M4")
     print("="*60)
     print(f"🌍 {args.source_lang.upper()} → {args.target_lang.upper()}")
-    print(f"🤖 Modelo: {args.model}")
+    print(f"🤖 Modelo: {model_name}" + (f" (perfil {args.profile})" if args.profile else ""))
     print(f"💾 Caché: Activado")
     print(f"⏱️  Latencia esperada: 1-2 segundos")
     print(f"ℹ️  CPU M4 >> Docker CPU genérico")
@@ -328,14 +991,35 @@ def main():
     print("="*60 + "\n")
     
     try:
-        client = LocalCoreMLClient(
-            api_key=api_key,
+        options = dict(
             source_lang=args.source_lang,
             target_lang=args.target_lang,
-            model_name=args.model,
+            model_name=model_name,
             web_display=args.web_display,
-            glossary_id=args.glossary_id
+            glossary_id=args.glossary_id,
+            deepl_server_url=args.deepl_server_url,
+            deepl_deadline=args.deepl_deadline,
+            latency_target=args.latency_target,
+            backlog_policy=args.backlog_policy,
+            max_backlog=args.max_backlog,
+            allow_model_downgrade=args.allow_model_downgrade,
+            asr_process=args.asr_process,
+            startup_buffer=args.startup_buffer,
+            snapshot_path=args.snapshot,
+            trace_file=args.trace_file,
+            trace_format=args.trace_format,
+            chunk_duration=profile.get('chunk_duration', 1.5),
+            no_speech_thresh=profile.get('no_speech_thresh'),
+            omp_num_threads=profile.get('omp_num_threads'),
+            glossary_files=args.glossary,
+            refresh_glossary=args.refresh_glossary,
+            usage_path=args.usage_file,
+            char_budget=args.char_budget
         )
+        if args.stream:
+            client = MultiStreamLocalClient(api_key, stream_specs=args.stream, **options)
+        else:
+            client = LocalCoreMLClient(api_key, **options)
         
         client.start()
         
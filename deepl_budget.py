@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Presupuesto de caracteres de DeepL.
+
+- UsageLedger: cuenta los caracteres enviados a DeepL por sesión y por par de
+  idiomas, los guarda en disco por mes (compartido entre clientes) y proyecta
+  el consumo mensual al ritmo actual. El consumo que informa la cuenta
+  (`/v2/usage`) se guarda aparte, como valor absoluto: el del mes es el
+  mayor de los dos, así lo que ya contó otro cliente no se suma dos veces.
+- BudgetPolicy: decide cuándo traducir los parciales (estables o como mucho
+  cada `partial_interval` segundos) y degrada al acercarse a la cuota:
+
+    normal → ahorro (solo parciales estables y como mucho cada 3 intervalos)
+           → solo finales (los parciales se muestran sin traducir)
+           → agotado (todo se muestra sin traducir)
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from calendar import monthrange
+from datetime import datetime
+
+from text_diff import normalize_text
+
+USAGE_PATH = os.environ.get(
+    'DEEPL_USAGE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'deepl_usage.json')
+)
+FREE_MONTHLY_LIMIT = 500_000
+MAX_SESSIONS_PER_MONTH = 100
+# Los primeros días del mes la proyección lineal se dispara con muy poco uso
+MIN_PROJECTION_FRACTION = 0.1
+
+LEVEL_NORMAL = 'normal'
+LEVEL_SAVING = 'saving'
+LEVEL_FINALS_ONLY = 'finals_only'
+LEVEL_EXHAUSTED = 'exhausted'
+
+LEVEL_MESSAGES = {
+    LEVEL_NORMAL: 'traducción completa',
+    LEVEL_SAVING: 'modo ahorro: solo parciales estables',
+    LEVEL_FINALS_ONLY: 'solo se traducen los segmentos finales',
+    LEVEL_EXHAUSTED: 'cuota agotada: se muestra el texto original',
+}
+
+
+def month_key(now=None):
+    return (now or datetime.now()).strftime('%Y-%m')
+
+
+def month_fraction(now=None):
+    """Fracción del mes natural transcurrida (0-1]."""
+    now = now or datetime.now()
+    days = monthrange(now.year, now.month)[1]
+    elapsed = (now.day - 1) + (now.hour * 3600 + now.minute * 60 + now.second) / 86400
+    return max(elapsed / days, 1.0 / (days * 24))
+
+
+def account_usage(client):
+    """Consumo real de la cuenta (`client.usage()` de deepl_http) o None si falla."""
+    try:
+        return client.usage()
+    except Exception:
+        return None
+
+
+class UsageLedger:
+    """Caracteres facturados por mes, sesión e idioma, persistidos en JSON.
+
+    Varios clientes pueden compartir el fichero: cada proceso solo suma sus
+    incrementos pendientes al guardar (lectura + escritura atómica).
+    """
+
+    def __init__(self, path=USAGE_PATH, monthly_limit=FREE_MONTHLY_LIMIT, session_id=None,
+                 flush_interval=5.0, remote=None, remote_interval=60.0):
+        self.path = path
+        self.monthly_limit = monthly_limit
+        self.session_id = session_id or datetime.now().strftime('%Y%m%d-%H%M%S') + f'-{os.getpid()}'
+        self.session_started = time.time()
+        self.flush_interval = flush_interval
+        # Consulta opcional del consumo real de la cuenta: () -> (usados, límite) o None
+        self.remote = remote
+        self.remote_interval = remote_interval
+        self.month = month_key()
+        self.month_total = self._month_used(self._load().get(self.month, {}))
+        # Último consumo informado por la cuenta (absoluto, no un incremento)
+        self.account_count = 0
+        self.session_chars = 0
+        self.session_languages = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f).get('months', {})
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Registro de uso ilegible, se empieza de cero: {e}", file=sys.stderr)
+            return {}
+
+    @staticmethod
+    def _month_used(entry):
+        """Consumo del mes: lo contado por los clientes o lo que diga la cuenta."""
+        return max(entry.get('total', 0), entry.get('account', 0))
+
+    def record(self, chars, languages):
+        """Sumar caracteres enviados a DeepL (p. ej. 'EN-ES')."""
+        with self._lock:
+            if month_key() != self.month:
+                # Cambio de mes: la cuota se reinicia
+                self.month = month_key()
+                self.month_total = 0
+                self.account_count = 0
+            self.month_total += chars
+            self.session_chars += chars
+            self.session_languages[languages] = self.session_languages.get(languages, 0) + chars
+            self._pending[languages] = self._pending.get(languages, 0) + chars
+
+    def reconcile(self, account_count):
+        """Ajustar al consumo real de la cuenta (incluye otros usos de la API key).
+
+        Se guarda como valor absoluto en el campo `account` del mes, nunca
+        como incremento de `total`: otros clientes que compartan el fichero ya
+        han sumado sus caracteres ahí.
+        """
+        with self._lock:
+            self.account_count = max(self.account_count, account_count)
+            self.month_total = max(self.month_total, account_count)
+
+    @property
+    def used_fraction(self):
+        return self.month_total / self.monthly_limit if self.monthly_limit else 0.0
+
+    def projection(self, now=None):
+        """Consumo mensual proyectado al ritmo del mes (y de esta sesión)."""
+        now = now or datetime.now()
+        fraction = max(month_fraction(now), MIN_PROJECTION_FRACTION)
+        projected = self.month_total / fraction
+        hours = max((time.time() - self.session_started) / 3600, 1e-6)
+        return {
+            'month': self.month,
+            'used': self.month_total,
+            'limit': self.monthly_limit,
+            'projected': int(projected),
+            'session_chars': self.session_chars,
+            'session_chars_per_hour': int(self.session_chars / hours),
+        }
+
+    def flush(self):
+        """Guardar los incrementos pendientes y leer lo que han guardado otros procesos.
+
+        El fichero se relee siempre (aunque no haya nada pendiente): así el
+        consumo de otros clientes se ve aquí sin confundirse con el de la cuenta.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            month = self.month
+            account_count = self.account_count
+            session = {'chars': self.session_chars, 'languages': dict(self.session_languages),
+                       'started': datetime.fromtimestamp(self.session_started).isoformat(timespec='seconds')}
+        months = self._load()
+        entry = months.setdefault(month, {'total': 0, 'languages': {}, 'sessions': {}})
+        changed = bool(pending) or account_count > entry.get('account', 0)
+        if changed:
+            for languages, chars in pending.items():
+                entry['total'] += chars
+                entry['languages'][languages] = entry['languages'].get(languages, 0) + chars
+            if pending:
+                entry['sessions'][self.session_id] = session
+                while len(entry['sessions']) > MAX_SESSIONS_PER_MONTH:
+                    entry['sessions'].pop(next(iter(entry['sessions'])))
+            if account_count > entry.get('account', 0):
+                entry['account'] = account_count
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'months': months}, f, indent=2)
+            os.replace(tmp_path, self.path)
+        with self._lock:
+            if self.month == month:
+                # Incluir lo que hayan gastado otros clientes desde que arrancamos
+                # (más lo que este proceso haya sumado mientras se escribía)
+                self.month_total = max(self._month_used(entry) + sum(self._pending.values()),
+                                       self.account_count)
+
+    def sync_remote(self):
+        if self.remote is None:
+            return None
+        account = self.remote()
+        if account is not None:
+            self.reconcile(account[0])
+        return account
+
+    def _run(self):
+        last_sync = time.monotonic()
+        while not self._stop.wait(self.flush_interval):
+            if time.monotonic() - last_sync >= self.remote_interval:
+                last_sync = time.monotonic()
+                self.sync_remote()
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"⚠️  Error guardando el registro de uso: {e}", file=sys.stderr)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name='deepl-usage')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self.flush()
+
+
+class BudgetPolicy:
+    """Cuándo merece la pena gastar caracteres en un parcial.
+
+    - Un parcial es estable si llega igual `stable_updates` veces seguidas.
+    - En modo normal se traduce si es estable o si ha pasado `partial_interval`
+      desde el último; en modo ahorro tiene que ser estable y haber pasado el
+      triple del intervalo.
+    - El nivel de degradación sube con el consumo real (`soft_limit`,
+      `hard_limit`) o si la proyección del mes supera la cuota.
+    """
+
+    def __init__(self, ledger, languages, partial_interval=1.0, stable_updates=2,
+                 soft_limit=0.8, hard_limit=0.95):
+        self.ledger = ledger
+        self.languages = languages
+        self.partial_interval = partial_interval
+        self.stable_updates = stable_updates
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.level = None
+        self._last_seen = None
+        self._seen_count = 0
+        self._last_partial_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {'partials_skipped': 0, 'partials_translated': 0}
+
+    def metered(self, translate_fn):
+        """Envolver la función de traducción para contar cada llamada real (hedges incluidos).
+
+        Solo se cuentan las respuestas correctas: DeepL no factura las
+        peticiones que fallan o no llegan a responder.
+        """
+        def _translate(text):
+            translated = translate_fn(text)
+            self.ledger.record(len(text), self.languages)
+            return translated
+        return _translate
+
+    def current_level(self):
+        used = self.ledger.used_fraction
+        if used >= 1.0:
+            level = LEVEL_EXHAUSTED
+        elif used >= self.hard_limit:
+            level = LEVEL_FINALS_ONLY
+        elif used >= self.soft_limit or self.ledger.projection()['projected'] > self.ledger.monthly_limit:
+            level = LEVEL_SAVING
+        else:
+            level = LEVEL_NORMAL
+        if level != self.level:
+            if self.level is not None or level != LEVEL_NORMAL:
+                p = self.ledger.projection()
+                print(f"\n💸 DeepL {p['used']:,}/{p['limit']:,} caracteres "
+                      f"(proyección {p['projected']:,}): {LEVEL_MESSAGES[level]}", file=sys.stderr)
+            self.level = level
+        return level
+
+    def allow_final(self):
+        return self.current_level() != LEVEL_EXHAUSTED
+
+    def partial_decision(self, text):
+        """'translate', 'original' (mostrar sin traducir) o 'skip' (no actualizar)."""
+        level = self.current_level()
+        if level in (LEVEL_FINALS_ONLY, LEVEL_EXHAUSTED):
+            return 'original'
+
+        with self._lock:
+            key = normalize_text(text)
+            if key == self._last_seen:
+                self._seen_count += 1
+            else:
+                self._last_seen = key
+                self._seen_count = 1
+            stable = self._seen_count >= self.stable_updates
+            interval = self.partial_interval * (3 if level == LEVEL_SAVING else 1)
+            due = time.monotonic() - self._last_partial_at >= interval
+
+            if (stable and due) if level == LEVEL_SAVING else (stable or due):
+                self._last_partial_at = time.monotonic()
+                self.stats['partials_translated'] += 1
+                return 'translate'
+            self.stats['partials_skipped'] += 1
+            return 'skip'
+
+    def summary(self):
+        p = self.ledger.projection()
+        return (f"💸 DeepL | sesión: {p['session_chars']:,} caracteres | "
+                f"mes {p['month']}: {p['used']:,}/{p['limit']:,} | proyección: {p['projected']:,} | "
+                f"parciales traducidos/omitidos: {self.stats['partials_translated']}/"
+                f"{self.stats['partials_skipped']}")
+
+
+def create_budget(usage_client, source_lang, target_lang, usage_path=None,
+                  char_budget=None, partial_interval=1.0):
+    """Registro + política para un cliente DeepL (arranca el guardado periódico).
+
+    `usage_client` es el DeepLHTTPTranslator del cliente (su sesión HTTP
+    también consulta /v2/usage). Sin `char_budget` se usa la cuota que
+    informe la cuenta (o 500k de la API gratuita si /v2/usage no responde).
+    """
+    ledger = UsageLedger(
+        usage_path or USAGE_PATH,
+        monthly_limit=char_budget or FREE_MONTHLY_LIMIT,
+        remote=lambda: account_usage(usage_client)
+    )
+    account = ledger.sync_remote()
+    if account is not None and char_budget is None:
+        ledger.monthly_limit = account[1]
+    policy = BudgetPolicy(ledger, f"{source_lang.upper()}-{target_lang.upper()}",
+                          partial_interval=partial_interval)
+    p = ledger.projection()
+    print(f"💸 DeepL: {p['used']:,}/{p['limit']:,} caracteres este mes"
+          + (" (según la cuenta)" if account is not None else ""))
+    policy.current_level()
+    ledger.start()
+    return policy
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Cliente HTTP mínimo para `/v2/translate` de DeepL.
+
+deep_translator hace `requests.get` sin timeout: una petición atascada ocupa
+un hilo del GuardedTranslator para siempre y unas pocas bastan para llenar el
+pool. Aquí cada petición lleva timeout de conexión y de lectura, la URL base
+es un parámetro público (para deepl_stub_server.py) y la sesión HTTP se
+reutiliza entre llamadas (sin handshake TLS por subtítulo).
+"""
+
+import requests
+
+FREE_API_URL = 'https://api-free.deepl.com/v2/'
+PRO_API_URL = 'https://api.deepl.com/v2/'
+# (conexión, lectura): la traducción tardía se sigue esperando tras el deadline,
+# pero no indefinidamente
+REQUEST_TIMEOUT = (3.05, 5.0)
+
+
+def api_base_url(server_url=None, use_free_api=True):
+    """URL base de la API (`.../v2/`): la oficial o un servidor alternativo."""
+    if server_url:
+        return f"{server_url.rstrip('/')}/v2/"
+    return FREE_API_URL if use_free_api else PRO_API_URL
+
+
+class DeepLHTTPTranslator:
+    """Traductor DeepL (texto -> texto) con timeout en cada petición."""
+
+    def __init__(self, api_key, source, target, server_url=None, use_free_api=True,
+                 timeout=REQUEST_TIMEOUT):
+        self.api_key = api_key
+        self.source = source.upper()
+        self.target = target.upper()
+        self.base_url = api_base_url(server_url, use_free_api)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'DeepL-Auth-Key {api_key}'
+
+    def translate(self, text):
+        """Traducir un texto. Lanza excepción si DeepL falla o no responde a tiempo."""
+        response = self.session.post(
+            self.base_url + 'translate',
+            data={'text': text, 'source_lang': self.source, 'target_lang': self.target},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()['translations'][0]['text']
+
+    def usage(self):
+        """(caracteres usados, límite) de la cuenta según `/v2/usage`."""
+        response = self.session.get(self.base_url + 'usage', timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        return int(data['character_count']), int(data['character_limit'])
+
+    def glossary_entries(self, glossary_id):
+        """Entradas de un glosario (TSV `origen<TAB>destino`) según `/v2/glossaries/{id}/entries`."""
+        response = self.session.get(
+            self.base_url + f'glossaries/{glossary_id}/entries',
+            headers={'Accept': 'text/tab-separated-values'}, timeout=self.timeout
+        )
+        response.raise_for_status()
+        # Sin charset en la cabecera requests asumiría latin-1: DeepL responde en UTF-8
+        return response.content.decode('utf-8')
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Servidor DeepL de pruebas (stub) con latencia y errores inyectados.
+
+Imita el endpoint `/v2/translate` de DeepL (POST con JSON o formulario, y GET
+con query string como hace deep_translator) para probar deadlines, hedging y
+el circuit breaker sin gastar cuota. `/v2/usage` devuelve los caracteres
+facturados desde el arranque (para probar el presupuesto de caracteres) y
+`/v2/glossaries/{id}/entries` las entradas en TSV de `config.glossaries`.
+
+Uso:
+    python deepl_stub_server.py --latency-ms 200 --tail-prob 0.1 --tail-ms 3000 --error-rate 0.05
+    python client_local_coreml.py --api-key stub --deepl-server-url http://localhost:8001
+"""
+
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class StubConfig:
+    latency_ms = 150
+    jitter_ms = 50
+    tail_prob = 0.0
+    tail_ms = 3000
+    error_rate = 0.0
+    error_status = 503
+    prefix = '[ES] '
+    character_limit = 500_000
+    character_count = 0
+    glossaries = {}
+
+
+class DeepLStubHandler(BaseHTTPRequestHandler):
+    config = StubConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _texts(self):
+        query = parse_qs(urlparse(self.path).query)
+        if self.command == 'POST':
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length).decode('utf-8')
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                texts = json.loads(body or '{}').get('text', [])
+                return texts if isinstance(texts, list) else [texts]
+            query.update(parse_qs(body))
+        return query.get('text', [])
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        if urlparse(self.path).path.rstrip('/').endswith('/usage'):
+            # Consumo acumulado, como /v2/usage de DeepL
+            self._reply(200, {'character_count': self.config.character_count,
+                              'character_limit': self.config.character_limit})
+            return
+        parts = urlparse(self.path).path.strip('/').split('/')
+        if len(parts) >= 3 and parts[-3] == 'glossaries' and parts[-1] == 'entries':
+            # Entradas de un glosario en TSV, como /v2/glossaries/{id}/entries
+            entries = self.config.glossaries.get(parts[-2])
+            if entries is None:
+                self._reply(404, {'message': 'Glossary not found'})
+                return
+            data = ''.join(f'{source}\t{target}\n' for source, target in entries.items()).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/tab-separated-values')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if not urlparse(self.path).path.rstrip('/').endswith('/translate'):
+            self._reply(404, {'message': 'Not found'})
+            return
+
+        cfg = self.config
+        delay = cfg.latency_ms + random.uniform(-cfg.jitter_ms, cfg.jitter_ms)
+        if random.random() < cfg.tail_prob:
+            delay = cfg.tail_ms
+        time.sleep(max(0.0, delay) / 1000.0)
+
+        if random.random() < cfg.error_rate:
+            self._reply(cfg.error_status, {'message': 'Injected error'})
+            return
+
+        translations = [
+            {'detected_source_language': 'EN', 'text': cfg.prefix + text,
+             'billed_characters': len(text)}
+            for text in self._texts()
+        ]
+        cfg.character_count += sum(t['billed_characters'] for t in translations)
+        self._reply(200, {'translations': translations})
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Servidor DeepL de pruebas con latencia y errores inyectados'
+    )
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency-ms', type=float, default=150, help='Latencia base (ms)')
+    parser.add_argument('--jitter-ms', type=float, default=50, help='Variación aleatoria (ms)')
+    parser.add_argument('--tail-prob', type=float, default=0.0,
+                        help='Probabilidad de una respuesta muy lenta (0-1)')
+    parser.add_argument('--tail-ms', type=float, default=3000, help='Latencia de cola (ms)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Probabilidad de devolver un error (0-1)')
+    parser.add_argument('--error-status', type=int, default=503, help='Código HTTP del error')
+    parser.add_argument('--character-limit', type=int, default=500_000,
+                        help='Cuota mensual que informa /v2/usage')
+    parser.add_argument('--character-count', type=int, default=0,
+                        help='Consumo inicial que informa /v2/usage (para simular el fin de la cuota)')
+    args = parser.parse_args()
+
+    cfg = DeepLStubHandler.config
+    cfg.latency_ms = args.latency_ms
+    cfg.jitter_ms = args.jitter_ms
+    cfg.tail_prob = args.tail_prob
+    cfg.tail_ms = args.tail_ms
+    cfg.error_rate = args.error_rate
+    cfg.error_status = args.error_status
+    cfg.character_limit = args.character_limit
+    cfg.character_count = args.character_count
+
+    print(f"🧪 Stub DeepL en http://localhost:{args.port}/v2/translate")
+    print(f"   Latencia: {args.latency_ms}±{args.jitter_ms} ms | "
+          f"cola: {args.tail_prob:.0%} a {args.tail_ms} ms | errores: {args.error_rate:.0%}")
+
+    server = ThreadingHTTPServer(('0.0.0.0', args.port), DeepLStubHandler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n✅ Detenido")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Glosario local para cualquier traductor (DeepL, deep_translator, caché...).
+
+Los términos se cargan de ficheros CSV/TSV (`origen,destino`, el formato de
+exportación de DeepL) o de glosarios de DeepL descargados una sola vez y
+guardados en disco. Se compilan en un autómata Aho-Corasick, así que buscar
+miles de términos en un subtítulo cuesta lo mismo que recorrerlo una vez.
+
+Antes de traducir, cada término se sustituye por un marcador (`{{G0}}`) que el
+traductor deja intacto; después se cambia el marcador por la traducción del
+glosario. Si no hay traducción (deadline, circuit breaker), el original se
+muestra ya con los términos del glosario.
+"""
+
+import csv
+import hashlib
+import os
+import re
+import sys
+from collections import deque
+
+GLOSSARY_CACHE_DIR = os.environ.get(
+    'WHISPER_GLOSSARY_CACHE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.glossary_cache')
+)
+
+PLACEHOLDER = '{{{{G{}}}}}'
+# Los traductores a veces meten espacios dentro del marcador
+PLACEHOLDER_RE = re.compile(r'\{\{\s*G\s*(\d+)\s*\}\}')
+
+
+def _fold(text):
+    """Minúsculas sin cambiar la longitud (las posiciones deben coincidir)."""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class Glossary:
+    """Términos origen → destino compilados en un autómata Aho-Corasick."""
+
+    def __init__(self, entries=None, case_sensitive=False):
+        self.case_sensitive = case_sensitive
+        self.entries = {}
+        self.stats = {'protected': 0, 'lost': 0}
+        self._goto = None
+        if entries:
+            self.update(entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _key(self, text):
+        return text if self.case_sensitive else _fold(text)
+
+    def update(self, entries):
+        """Añadir términos ({origen: destino}); los últimos tienen prioridad."""
+        for source, target in dict(entries).items():
+            source, target = source.strip(), target.strip()
+            if source and target:
+                self.entries[self._key(source)] = (source, target)
+        self._goto = None
+
+    @property
+    def fingerprint(self):
+        """Identificador del contenido (para invalidar cachés de traducciones)."""
+        digest = hashlib.sha1()
+        for key in sorted(self.entries):
+            digest.update(f"{key}\t{self.entries[key][1]}\n".encode('utf-8'))
+        return digest.hexdigest()[:12]
+
+    def compile(self):
+        """Construir el trie con enlaces de fallo y de salida (BFS)."""
+        goto, fail, output, link = [{}], [0], [-1], [0]
+        self._terms = []
+        for key, (source, target) in self.entries.items():
+            node = 0
+            for char in key:
+                nxt = goto[node].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][char] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    output.append(-1)
+                    link.append(0)
+                node = nxt
+            output[node] = len(self._terms)
+            # Los límites de palabra solo se exigen si el término empieza/acaba en letra o número
+            self._terms.append((len(key), target, key[0].isalnum(), key[-1].isalnum()))
+
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0) if goto[state].get(char) != child else 0
+                # Término más cercano en la cadena de fallos
+                link[child] = fail[child] if output[fail[child]] >= 0 else link[fail[child]]
+
+        self._goto, self._fail, self._output, self._link = goto, fail, output, link
+        return self
+
+    def find(self, text):
+        """Coincidencias (inicio, fin, término) sin solapes, la más larga primero."""
+        if not self.entries:
+            return []
+        if self._goto is None:
+            self.compile()
+        goto, fail, output, link, terms = self._goto, self._fail, self._output, self._link, self._terms
+        key = self._key(text)
+        n = len(key)
+
+        candidates = []
+        node = 0
+        for end, char in enumerate(key, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            match = node if output[node] >= 0 else link[node]
+            while match:
+                term = output[match]
+                length, _, start_word, end_word = terms[term]
+                start = end - length
+                if ((not start_word or start == 0 or not key[start - 1].isalnum())
+                        and (not end_word or end == n or not key[end].isalnum())):
+                    candidates.append((start, -length, term))
+                match = link[match]
+
+        matches = []
+        covered = 0
+        for start, neg_length, term in sorted(candidates):
+            if start >= covered:
+                matches.append((start, start - neg_length, term))
+                covered = start - neg_length
+        return matches
+
+    def protect(self, text):
+        """Sustituir los términos por marcadores → (texto protegido, traducciones)."""
+        matches = self.find(text)
+        if not matches:
+            return text, []
+        parts, targets, pos = [], [], 0
+        for start, end, term in matches:
+            parts.append(text[pos:start])
+            parts.append(PLACEHOLDER.format(len(targets)))
+            targets.append(self._terms[term][1])
+            pos = end
+        parts.append(text[pos:])
+        self.stats['protected'] += len(targets)
+        return ''.join(parts), targets
+
+    def restore(self, text, targets):
+        """Cambiar los marcadores por las traducciones del glosario."""
+        if not targets:
+            return text
+        seen = set()
+
+        def _replace(match):
+            index = int(match.group(1))
+            if index >= len(targets):
+                return match.group(0)
+            seen.add(index)
+            return targets[index]
+
+        restored = PLACEHOLDER_RE.sub(_replace, text)
+        # Marcadores que el traductor se comió
+        self.stats['lost'] += len(targets) - len(seen)
+        return restored
+
+    def apply(self, text):
+        """El texto con los términos ya sustituidos (sin traductor)."""
+        return self.restore(*self.protect(text))
+
+    def wrap(self, guarded_translate):
+        """Envolver `translate(text, on_late=None) -> (traducido, definitivo)`.
+
+        Si el texto es solo términos del glosario no se llama al traductor.
+        """
+        def _translate(text, on_late=None):
+            protected, targets = self.protect(text)
+            if not targets:
+                return guarded_translate(text, on_late=on_late)
+            if not PLACEHOLDER_RE.sub('', protected).strip(' \t.,;:!?¡¿-'):
+                return self.restore(protected, targets), True
+
+            def restore_late(source, translated):
+                on_late(text, self.restore(translated, targets))
+
+            translated, final = guarded_translate(
+                protected, on_late=restore_late if on_late is not None else None
+            )
+            return self.restore(translated, targets), final
+        return _translate
+
+
+def read_term_file(path, source_lang=None, target_lang=None):
+    """Términos de un CSV/TSV: `origen,destino[,idioma_origen,idioma_destino]`.
+
+    Se ignoran las líneas vacías, los comentarios (#), una cabecera
+    source/target y las filas de otros pares de idiomas.
+    """
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        delimiter = '\t' if path.lower().endswith('.tsv') or '\t' in sample else ','
+        entries = {}
+        for row in csv.reader(f, delimiter=delimiter):
+            if len(row) < 2 or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            if row[0].strip().lower() in ('source', 'origen') and row[1].strip().lower() in ('target', 'destino'):
+                continue
+            if len(row) >= 4 and source_lang and target_lang:
+                if (row[2].strip().lower()[:2] != source_lang.lower()[:2]
+                        or row[3].strip().lower()[:2] != target_lang.lower()[:2]):
+                    continue
+            entries[row[0]] = row[1]
+    return entries
+
+
+def fetch_deepl_glossary(client, glossary_id, refresh=False, cache_dir=GLOSSARY_CACHE_DIR):
+    """Entradas de un glosario de DeepL (se descarga una vez y queda en caché).
+
+    `client` es un DeepLHTTPTranslator (`/v2/glossaries/{id}/entries` en TSV).
+    """
+    path = os.path.join(cache_dir, f"{glossary_id}.tsv")
+    if os.path.exists(path) and not refresh:
+        return read_term_file(path)
+
+    entries = {}
+    for line in client.glossary_entries(glossary_id).splitlines():
+        source, sep, target = line.partition('\t')
+        if sep and source:
+            entries[source] = target
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter='\t')
+        for source, target in entries.items():
+            writer.writerow([source, target])
+    os.replace(tmp_path, path)
+    print(f"📚 Glosario {glossary_id} descargado ({len(entries)} términos) → {path}")
+    return entries
+
+
+def load_glossary(files=(), deepl_ids=(), client=None, source_lang=None, target_lang=None,
+                  refresh=False):
+    """Glosario combinado de ficheros y glosarios de DeepL, o None si no hay ninguno.
+
+    `client` (DeepLHTTPTranslator) descarga los glosarios de `deepl_ids`.
+    """
+    if not files and not deepl_ids:
+        return None
+    glossary = Glossary()
+    for glossary_id in deepl_ids:
+        try:
+            glossary.update(fetch_deepl_glossary(client, glossary_id, refresh))
+        except Exception as e:
+            print(f"⚠️  No se pudo cargar el glosario de DeepL {glossary_id}: {e}", file=sys.stderr)
+    for path in files:
+        # Los ficheros locales tienen prioridad sobre los glosarios de DeepL
+        glossary.update(read_term_file(path, source_lang, target_lang))
+    glossary.compile()
+    print(f"📚 Glosario local: {len(glossary)} términos")
+    return glossary
@@ -43,6 +43,7 @@ def list_glossaries():
             print()
             print("  Para usar este glosario, ejecuta:")
             print(f"  python client_local_coreml.py --glossary-id {glossary.glossary_id}")
+            print(f"  python client_deepl.py --glossary-id {glossary.glossary_id}  # glosario local en caché")
             print("-" * 60)
             print()
     
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Varias entradas de audio (canales o dispositivos) con un solo modelo Whisper.
+
+- `parse_stream_spec`: convierte `--stream "Ana=USB Mic:2"` en etiqueta,
+  dispositivo y canal.
+- `AudioStream`: estado por entrada (backlog acotado y diff de palabras).
+- `batch_transcribe`: decodifica de una vez las ventanas listas de todas las
+  entradas (un solo paso del encoder con batch N en lugar de N llamadas).
+"""
+
+from backpressure import AudioBacklog
+from text_diff import WordDiffer
+
+# Mismos umbrales que whisper.transcribe para descartar silencios
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+
+def parse_stream_spec(spec, index):
+    """`[etiqueta=][dispositivo:]canal` → (etiqueta, dispositivo, canal 0-based).
+
+    El canal se escribe empezando en 1; el dispositivo puede ser un índice o
+    parte del nombre (como en sounddevice). Sin etiqueta se usa "Canal N".
+    """
+    label = None
+    if '=' in spec:
+        label, spec = spec.split('=', 1)
+    device = None
+    if ':' in spec:
+        device, spec = spec.rsplit(':', 1)
+        device = int(device) if device.isdigit() else device
+    try:
+        channel = int(spec) - 1
+    except ValueError:
+        raise ValueError(f"Canal no válido en --stream: {spec!r}")
+    if channel < 0:
+        raise ValueError(f"Los canales empiezan en 1: {spec!r}")
+    return (label or f"Canal {index + 1}").strip(), device, channel
+
+
+class AudioStream:
+    """Una entrada de audio: su propio backlog y su propio contexto de diff."""
+
+    def __init__(self, label, device, channel, sample_rate=16000, max_seconds=10.0, policy='drop'):
+        self.label = label
+        self.device = device
+        self.channel = channel
+        self.backlog = AudioBacklog(sample_rate=sample_rate, max_seconds=max_seconds, policy=policy)
+        self.differ = WordDiffer()
+
+
+def batch_transcribe(model, windows, language='en', fp16=False, without_timestamps=True,
+                     no_speech_threshold=NO_SPEECH_THRESHOLD):
+    """Transcribir varias ventanas (≤ 30 s cada una) en una sola decodificación.
+
+    Devuelve un texto por ventana ('' si Whisper la considera silencio).
+    """
+    import numpy as np
+    import torch
+    import whisper
+
+    mels = []
+    for window in windows:
+        audio = window.astype(np.float32)
+        # Misma normalización que el modo de una sola entrada
+        audio = audio / np.max(np.abs(audio) + 1e-8)
+        mels.append(whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=model.dims.n_mels))
+    mel = torch.stack(mels).to(model.device)
+
+    options = whisper.DecodingOptions(
+        language=language,
+        fp16=fp16,
+        temperature=0.0,
+        without_timestamps=without_timestamps
+    )
+    results = whisper.decode(model, mel, options)
+
+    texts = []
+    for result in results:
+        silent = (result.no_speech_prob > no_speech_threshold
+                  and result.avg_logprob < LOGPROB_THRESHOLD)
+        texts.append("" if silent else result.text.strip())
+    return texts
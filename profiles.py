@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Perfiles de ajuste con nombre (los genera autotune.py).
+
+Un perfil fija los parámetros de latencia/calidad que antes estaban repartidos
+por los clientes: modelo, duración del chunk, segmentos enviados, umbrales de
+whisper-live e hilos de OpenMP. Los clientes lo cargan con `--profile NOMBRE`;
+las opciones pasadas explícitamente por línea de comandos tienen prioridad.
+
+Los perfiles se guardan en `profiles.json` junto a los scripts (o en la ruta
+de la variable WHISPER_PROFILES), separados por backend: los umbrales medidos
+con Whisper en el proceso (`local`) no valen para whisper-live y al revés, así
+que `balanced` de uno no sustituye ni se carga como `balanced` del otro.
+"""
+
+import json
+import os
+import time
+
+PROFILES_PATH = os.environ.get(
+    'WHISPER_PROFILES',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles.json')
+)
+
+KNOBS = (
+    'model',
+    'chunk_duration',
+    'send_last_n_segments',
+    'no_speech_thresh',
+    'same_output_threshold',
+    'omp_num_threads',
+)
+
+# Parámetros de TranscriptionClient (whisper-live) que puede fijar un perfil
+WHISPER_LIVE_KNOBS = ('model', 'send_last_n_segments', 'no_speech_thresh', 'same_output_threshold')
+
+
+# Backends que generan perfiles (autotune.py --backend)
+BACKENDS = ('local', 'whisper-live')
+
+
+def _read_all(path):
+    """{backend: {nombre: perfil}} tal como está en el fichero."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('profiles', {})
+
+
+def _check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {backend}. Válidos: {', '.join(BACKENDS)}")
+
+
+def load_profiles(backend, path=None):
+    """Perfiles guardados de un backend ({nombre: perfil})."""
+    _check_backend(backend)
+    return _read_all(path or PROFILES_PATH).get(backend, {})
+
+
+def load_profile(name, backend, path=None):
+    """Parámetros del perfil `name` de `backend` (solo los conocidos).
+
+    ValueError si no existe para ese backend, también cuando solo existe para
+    el otro (sus umbrales no son intercambiables).
+    """
+    path = path or PROFILES_PATH
+    profiles = load_profiles(backend, path)
+    if name not in profiles:
+        others = [other for other in BACKENDS
+                  if other != backend and name in load_profiles(other, path)]
+        if others:
+            raise ValueError(
+                f"El perfil {name} se generó para el backend {others[0]}, no para {backend}. "
+                f"Ejecuta autotune.py --backend {backend} --save-profiles"
+            )
+        available = ', '.join(sorted(profiles)) or 'ninguno (ejecuta autotune.py)'
+        raise ValueError(f"Perfil desconocido para {backend}: {name}. Disponibles: {available}")
+    profile = profiles[name]
+    if profile.get('backend', backend) != backend:
+        raise ValueError(f"El perfil {name} es del backend {profile['backend']}, no de {backend}")
+    return {knob: profile[knob] for knob in KNOBS if profile.get(knob) is not None}
+
+
+def save_profiles(new_profiles, backend, path=None):
+    """Añadir o sustituir perfiles de un backend (escritura atómica)."""
+    _check_backend(backend)
+    path = path or PROFILES_PATH
+    all_profiles = _read_all(path)
+    profiles = all_profiles.setdefault(backend, {})
+    for name, profile in new_profiles.items():
+        if profile.get('backend', backend) != backend:
+            raise ValueError(f"El perfil {name} es del backend {profile['backend']}, no de {backend}")
+        profiles[name] = dict(profile, backend=backend, created=time.strftime('%Y-%m-%d %H:%M:%S'))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'profiles': all_profiles}, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def whisper_live_options(defaults, profile_name=None, **overrides):
+    """Opciones de TranscriptionClient: valores por defecto < perfil < opciones explícitas.
+
+    Las opciones de `overrides` con valor None (no pasadas por CLI) se ignoran.
+    """
+    options = dict(defaults)
+    if profile_name:
+        profile = load_profile(profile_name, 'whisper-live')
+        options.update({knob: profile[knob] for knob in WHISPER_LIVE_KNOBS if knob in profile})
+    options.update({knob: value for knob, value in overrides.items() if value is not None})
+    return options
@@ -26,8 +26,12 @@ if __name__ == "__main__":
                         help='Boolean only for TensorRT model. Use python session or cpp session, By default uses Cpp.')
     parser.add_argument('--omp_num_threads', '-omp',
                         type=int,
-                        default=1,
-                        help="Number of threads to use for OpenMP")
+                        default=None,
+                        help="Number of threads to use for OpenMP (default: 1, or the profile's)")
+    parser.add_argument('--profile',
+                        type=str,
+                        default=None,
+                        help='Tuning profile from profiles.json (see autotune.py)')
     parser.add_argument('--single_model', '-sm',
                         action='store_true',
                         help='Use a single model instance for all clients.')
@@ -37,6 +41,13 @@ if __name__ == "__main__":
         if args.trt_model_path is None:
             raise ValueError("Please Provide a valid tensorrt model path")
 
+    if args.omp_num_threads is None:
+        omp_num_threads = 1
+        if args.profile:
+            from profiles import load_profile
+            omp_num_threads = load_profile(args.profile, 'whisper-live').get('omp_num_threads', 1)
+        args.omp_num_threads = omp_num_threads
+
     if "OMP_NUM_THREADS" not in os.environ:
         os.environ["OMP_NUM_THREADS"] = str(args.omp_num_threads)
 
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+Multiplexor de sesiones de whisper-live.
+
+Cada TranscriptionClient (transcriptions.py, client_deepl.py, client_m4.py, la
+página de web/) abre su propia sesión en el servidor y ocupa un hueco de
+modelo, aunque todos escuchen la misma sala. Este multiplexor se pone delante
+de run_server.py y mantiene UNA sesión upstream por fuente de audio; los
+segmentos se reparten a todos los clientes conectados a esa fuente. La carga
+del servidor crece con las fuentes de audio, no con los consumidores.
+
+- Fuente = ruta de la URL (ws://host:9092/sala1; sin ruta, "default") +
+  idioma, tarea, modelo, VAD y prompt inicial de la configuración. El resto
+  de opciones (`send_last_n_segments`, umbrales...) las fija el primer
+  cliente de la sesión; si otro pide valores distintos se avisa y se ignoran.
+- El primer cliente que envía audio es el emisor; el audio del resto se
+  descarta. Si el emisor se va, el siguiente que envíe audio toma el relevo.
+- Los clientes con `"role": "subscriber"` en la configuración solo reciben:
+  se unen a la primera fuente de su ruta que coincida con los campos que
+  indiquen (y esperan a que exista).
+- Quien llega tarde recibe SERVER_READY y los últimos segmentos al momento.
+- Un consumidor lento no frena a los demás: sus mensajes se encolan con
+  tamaño acotado y se descartan los más antiguos (cada mensaje de segmentos
+  ya trae el estado completo de los últimos N).
+- Acepta las mismas tramas int16/Opus que audio_relay.py (`audio_codec`).
+- Mientras el upstream conecta (o reconecta) el audio del emisor se guarda
+  en un buffer acotado y se envía al conectar; si se llena se descarta lo
+  más antiguo y se avisa. Recibir audio nunca espera al servidor.
+
+Uso:
+    python run_server.py --port 9090
+    python session_mux.py --port 9092 --upstream ws://localhost:9090
+    python client_deepl.py --port 9092          # traductor (emisor)
+    python transcriptions.py --port 9092        # otro consumidor del mismo audio
+    python session_mux.py --tail default        # registro de segmentos
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+
+from audio_relay import CODECS, END_OF_AUDIO, FrameDecoder
+
+# Campos de la configuración que cambian la transcripción (definen la fuente)
+SOURCE_FIELDS = ('language', 'task', 'model', 'use_vad', 'initial_prompt')
+# Campos solo del multiplexor/relay que whisper-live no conoce
+LOCAL_FIELDS = ('role', 'audio_codec')
+
+MAX_QUEUED_MESSAGES = 32
+UPSTREAM_RETRIES = 5
+# Audio guardado mientras no hay upstream: 10 s de float32 a 16 kHz
+MAX_PENDING_AUDIO_BYTES = 10 * 16000 * 4
+
+
+def encode_for(uid, body):
+    """Mensaje JSON con el uid de cada consumidor sin volver a serializarlo."""
+    prefix = '{"uid": ' + json.dumps(uid)
+    return prefix + '}' if body == '{}' else prefix + ', ' + body[1:]
+
+
+class Subscriber:
+    """Un cliente conectado: cola de salida acotada y un hilo que la envía."""
+
+    def __init__(self, ws, uid):
+        self.ws = ws
+        self.uid = uid
+        self.queue = deque(maxlen=MAX_QUEUED_MESSAGES)
+        self.ready = threading.Event()
+        self.closed = False
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f'mux-{uid}')
+        self.thread.start()
+
+    def push(self, body):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(body)
+        self.ready.set()
+
+    def _run(self):
+        from websockets.exceptions import ConnectionClosed
+        while not self.closed:
+            self.ready.wait()
+            self.ready.clear()
+            while self.queue:
+                try:
+                    self.ws.send(encode_for(self.uid, self.queue.popleft()))
+                except ConnectionClosed:
+                    self.closed = True
+                    return
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+
+class SharedSession:
+    """Una sesión upstream de whisper-live compartida por varios consumidores."""
+
+    def __init__(self, key, upstream_url, config, on_empty):
+        self.key = key
+        self.upstream_url = upstream_url
+        self.config = {k: v for k, v in config.items() if k not in LOCAL_FIELDS}
+        self.config['uid'] = str(uuid.uuid4())
+        self.on_empty = on_empty
+        self.subscribers = {}
+        self.publisher = None
+        self.upstream = None
+        self.ready_body = None
+        self.last_segments = None
+        self.language_body = None
+        self.lock = threading.Lock()
+        self.closing = False
+        self.stats = {'audio_bytes': 0, 'dropped_audio_bytes': 0, 'lost_audio_bytes': 0,
+                      'messages': 0, 'reconnects': 0}
+        self._connected = threading.Event()
+        self._started = False
+        # Audio del emisor pendiente de enviar (protegido por audio_lock)
+        self.audio_lock = threading.Lock()
+        self.pending_audio = deque()
+        self.pending_bytes = 0
+        self._warned_lost = False
+
+    def matches(self, path, config):
+        """¿Sirve esta fuente a un suscriptor con esta ruta y configuración?"""
+        return self.key[0] == path and all(
+            config.get(field) is None or str(config[field]) == self.key[i + 1]
+            for i, field in enumerate(SOURCE_FIELDS)
+        )
+
+    def start(self):
+        """Abrir el upstream (solo cuando hay un cliente que puede enviar audio)."""
+        with self.lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run_upstream, daemon=True, name=f'upstream-{self.key[0]}').start()
+
+    def attach(self, ws, uid):
+        subscriber = Subscriber(ws, uid)
+        with self.lock:
+            self.subscribers[ws] = subscriber
+            # Quien llega tarde no espera al siguiente mensaje del servidor
+            for body in (self.ready_body, self.language_body, self.last_segments):
+                if body is not None:
+                    subscriber.push(body)
+        return subscriber
+
+    def ignored_options(self, config):
+        """Opciones de un cliente que no coinciden con las de la sesión compartida."""
+        skip = ('uid',) + SOURCE_FIELDS + LOCAL_FIELDS
+        return sorted(k for k, v in config.items() if k not in skip and self.config.get(k) != v)
+
+    def detach(self, ws):
+        with self.lock:
+            subscriber = self.subscribers.pop(ws, None)
+            if self.publisher is ws:
+                self.publisher = None
+            empty = not self.subscribers
+            if empty:
+                self.closing = True
+            # Junto con `closing`: si el upstream aún está conectando, lo cierra _run_upstream
+            upstream = self.upstream
+        if subscriber is not None:
+            subscriber.close()
+        if empty:
+            self.on_empty(self)
+            if upstream is not None:
+                upstream.close()
+
+    def send_audio(self, ws, data):
+        """Reenviar audio solo si `ws` es el emisor (o puede serlo)."""
+        with self.lock:
+            if self.publisher is None:
+                self.publisher = ws
+                print(f"🎙️  [{self.key[0]}] emisor: {self.subscribers[ws].uid}")
+            if self.publisher is not ws:
+                self.stats['dropped_audio_bytes'] += len(data)
+                return
+        from websockets.exceptions import ConnectionClosed
+        with self.audio_lock:
+            if not self._connected.is_set():
+                # Sin upstream todavía (o reconectando): se envía al conectar
+                self._buffer_audio(data)
+                return
+            try:
+                self.upstream.send(data)
+                self.stats['audio_bytes'] += len(data)
+            except ConnectionClosed:
+                self._buffer_audio(data)
+
+    def _buffer_audio(self, data):
+        """Guardar audio hasta que haya upstream (descartando lo más antiguo)."""
+        self.pending_audio.append(data)
+        self.pending_bytes += len(data)
+        while self.pending_bytes > MAX_PENDING_AUDIO_BYTES:
+            lost = self.pending_audio.popleft()
+            self.pending_bytes -= len(lost)
+            self.stats['lost_audio_bytes'] += len(lost)
+            if not self._warned_lost:
+                self._warned_lost = True
+                print(f"⚠️  [{self.key[0]}] sin upstream: se descarta el audio más antiguo "
+                      f"(buffer de {MAX_PENDING_AUDIO_BYTES // 1024} KB lleno)", file=sys.stderr)
+
+    def _flush_audio(self, upstream):
+        """Enviar el audio guardado mientras no había upstream (con audio_lock)."""
+        while self.pending_audio:
+            data = self.pending_audio[0]
+            upstream.send(data)
+            self.pending_audio.popleft()
+            self.pending_bytes -= len(data)
+            self.stats['audio_bytes'] += len(data)
+        if self._warned_lost:
+            self._warned_lost = False
+            print(f"🔁 [{self.key[0]}] upstream conectado: "
+                  f"{self.stats['lost_audio_bytes'] / 1024:.0f} KB de audio perdidos en total", file=sys.stderr)
+
+    def broadcast(self, body):
+        with self.lock:
+            subscribers = list(self.subscribers.values())
+        self.stats['messages'] += len(subscribers)
+        for subscriber in subscribers:
+            subscriber.push(body)
+
+    def _handle(self, message):
+        """Un mensaje del servidor → cachear y repartir. False para reconectar."""
+        try:
+            data = json.loads(message)
+        except ValueError:
+            return True
+        data.pop('uid', None)
+        # DISCONNECT cerraría a todos los consumidores: mejor reconectar
+        if data.get('message') == 'DISCONNECT':
+            return False
+        body = json.dumps(data)
+        if data.get('message') == 'SERVER_READY':
+            self.ready_body = body
+        elif 'segments' in data:
+            self.last_segments = body
+        elif 'language' in data:
+            self.language_body = body
+        self.broadcast(body)
+        return True
+
+    def _run_upstream(self):
+        from websockets.sync.client import connect
+        from websockets.exceptions import ConnectionClosed, WebSocketException
+
+        failures = 0
+        short_sessions = 0
+        while not self.closing:
+            started = time.monotonic()
+            try:
+                with connect(self.upstream_url, max_size=None, compression=None) as upstream:
+                    with self.lock:
+                        self.upstream = upstream
+                        closing = self.closing
+                    if closing:
+                        # El último cliente se fue mientras se conectaba: no ocupar el modelo
+                        break
+                    upstream.send(json.dumps(self.config))
+                    with self.audio_lock:
+                        self._flush_audio(upstream)
+                        self._connected.set()
+                    failures = 0
+                    for message in upstream:
+                        if not self._handle(message):
+                            break
+            except ConnectionClosed:
+                pass
+            except (OSError, WebSocketException) as e:
+                # Sin servidor, o no es whisper-live (handshake rechazado, URI inválida...)
+                failures += 1
+                print(f"⚠️  [{self.key[0]}] upstream no disponible ({failures}/{UPSTREAM_RETRIES}): {e}",
+                      file=sys.stderr)
+                if failures >= UPSTREAM_RETRIES:
+                    break
+            finally:
+                self._connected.clear()
+            if not self.closing:
+                # El servidor cortó la sesión (p. ej. tiempo máximo o WAIT por estar
+                # lleno): los consumidores siguen conectados mientras se reintenta
+                self.stats['reconnects'] += 1
+                short_sessions = short_sessions + 1 if time.monotonic() - started < 10 else 0
+                time.sleep(min(0.5 * 2 ** max(failures, short_sessions), 10.0))
+
+        if not self.closing:
+            # Sin servidor: avisar a todos como lo haría whisper-live
+            self.broadcast(json.dumps({'message': 'DISCONNECT'}))
+            time.sleep(0.5)
+            with self.lock:
+                clients = list(self.subscribers)
+            for ws in clients:
+                ws.close()
+
+
+class SessionMux:
+    """Sesiones compartidas por fuente de audio."""
+
+    def __init__(self, upstream_url, sample_rate=16000):
+        self.upstream_url = upstream_url
+        self.sample_rate = sample_rate
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def _session(self, key, config):
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None or session.closing:
+                session = SharedSession(key, self.upstream_url, config, self._forget)
+                self.sessions[key] = session
+                print(f"🔗 [{key[0]}] nueva sesión upstream ({len(self.sessions)} activas)")
+            return session
+
+    def _find(self, path, config, ws):
+        """Fuente para un suscriptor; espera a que un emisor la cree."""
+        from websockets.exceptions import ConnectionClosed
+        while True:
+            with self.lock:
+                for session in self.sessions.values():
+                    if not session.closing and session.matches(path, config):
+                        return session
+            try:
+                ws.recv(timeout=0.5)
+            except TimeoutError:
+                continue
+            except ConnectionClosed:
+                return None
+
+    def _forget(self, session):
+        with self.lock:
+            if self.sessions.get(session.key) is session:
+                del self.sessions[session.key]
+        stats = session.stats
+        print(f"🔌 [{session.key[0]}] sesión cerrada: {stats['audio_bytes'] / 1024:.0f} KB de audio, "
+              f"{stats['messages']} mensajes repartidos, "
+              f"{stats['dropped_audio_bytes'] / 1024:.0f} KB de audio duplicado descartado, "
+              f"{stats['lost_audio_bytes'] / 1024:.0f} KB perdidos sin upstream, "
+              f"{stats['reconnects']} reconexiones")
+
+    def handle(self, ws):
+        """Atender a un consumidor durante toda su conexión."""
+        from websockets.exceptions import ConnectionClosed
+
+        try:
+            config = json.loads(ws.recv())
+        except (ConnectionClosed, ValueError):
+            return
+        uid = config.get('uid') or str(uuid.uuid4())
+        codec = config.get('audio_codec')
+        if codec is not None and codec not in CODECS:
+            ws.send(json.dumps({'uid': uid, 'status': 'ERROR', 'message': f'Códec no soportado: {codec}'}))
+            return
+
+        path = ws.request.path.split('?', 1)[0].strip('/') or 'default'
+        listen_only = config.get('role') == 'subscriber'
+        if listen_only:
+            session = self._find(path, config, ws)
+            if session is None:
+                return
+        else:
+            key = (path,) + tuple(str(config.get(field)) for field in SOURCE_FIELDS)
+            session = self._session(key, config)
+            ignored = session.ignored_options(config)
+            if ignored:
+                print(f"⚠️  [{path}] {uid}: la sesión compartida ya fija {', '.join(ignored)}; "
+                      f"se usan los valores del primer cliente", file=sys.stderr)
+            session.start()
+        subscriber = session.attach(ws, uid)
+        print(f"👥 [{path}] {uid} conectado ({len(session.subscribers)} en la sesión)")
+
+        decoder = FrameDecoder(self.sample_rate)
+        try:
+            for message in ws:
+                if isinstance(message, str) or listen_only:
+                    continue
+                if message == END_OF_AUDIO:
+                    # El upstream sigue abierto para el resto de consumidores
+                    continue
+                if codec is not None:
+                    audio = decoder.decode(message)
+                    if audio is None or not len(audio):
+                        continue
+                    message = audio.tobytes()
+                session.send_audio(ws, message)
+        except ConnectionClosed:
+            pass
+        finally:
+            session.detach(ws)
+            print(f"👋 [{path}] {uid} desconectado"
+                  + (f" ({subscriber.dropped} mensajes descartados por lento)" if subscriber.dropped else ""))
+
+
+def tail(url, session='default', **source):
+    """Consumidor de solo lectura: imprime los segmentos completados."""
+    from websockets.sync.client import connect
+
+    uid = str(uuid.uuid4())
+    seen = deque(maxlen=200)
+    config = {'uid': uid, 'role': 'subscriber'}
+    config.update({field: value for field, value in source.items() if value is not None})
+    with connect(f"{url.rstrip('/')}/{session}", max_size=None) as ws:
+        ws.send(json.dumps(config))
+        for message in ws:
+            data = json.loads(message)
+            if data.get('message') == 'DISCONNECT':
+                break
+            for segment in data.get('segments', []):
+                ident = (segment.get('start'), segment.get('text'))
+                if segment.get('completed') and ident not in seen:
+                    seen.append(ident)
+                    print(f"[{time.strftime('%H:%M:%S')}] {segment.get('text', '').strip()}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Multiplexor: una sesión de whisper-live por fuente de audio, muchos consumidores'
+    )
+    parser.add_argument('--port', '-p', type=int, default=9092,
+                        help='Puerto WebSocket del multiplexor (default: 9092)')
+    parser.add_argument('--upstream', '-u', type=str, default='ws://localhost:9090',
+                        help='URL del servidor whisper-live (default: ws://localhost:9090)')
+    parser.add_argument('--sample-rate', type=int, default=16000,
+                        help='Frecuencia de muestreo esperada por el servidor (default: 16000)')
+    parser.add_argument('--tail', type=str, default=None, metavar='SESION',
+                        help='No arrancar el multiplexor: imprimir los segmentos de una sesión')
+    parser.add_argument('--url', type=str, default='ws://localhost:9092',
+                        help='Multiplexor al que conectarse con --tail (default: ws://localhost:9092)')
+    parser.add_argument('--lang', type=str, default=None,
+                        help='Con --tail: seguir solo la fuente con este idioma (default: cualquiera)')
+    parser.add_argument('--model', type=str, default=None,
+                        help='Con --tail: seguir solo la fuente con este modelo (default: cualquiera)')
+    args = parser.parse_args()
+
+    if args.tail:
+        try:
+            tail(args.url, args.tail, language=args.lang, model=args.model)
+        except OSError as e:
+            print(f"❌ No se pudo conectar a {args.url}: {e}")
+        except KeyboardInterrupt:
+            print("\n✅ Detenido")
+        return
+
+    from websockets.sync.server import serve
+
+    mux = SessionMux(args.upstream, args.sample_rate)
+    print(f"🔀 Multiplexor de sesiones en ws://0.0.0.0:{args.port} → {args.upstream}")
+    print(f"   Sesión por ruta (ws://host:{args.port}/sala) + idioma, tarea y modelo")
+    print("-" * 50)
+
+    with serve(mux.handle, '0.0.0.0', args.port, max_size=None, compression=None) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n✅ Detenido")
+
+
+if __name__ == '__main__':
+    main()
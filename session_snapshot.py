@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Snapshots de sesión a disco, incrementales y a prueba de caídas.
+
+El estado se guarda en dos ficheros:
+- `<ruta>`: estado completo en JSON (se reescribe de forma atómica al compactar).
+- `<ruta>.journal`: operaciones añadidas desde la última compactación (JSONL).
+
+Cada operación lleva un número de secuencia y el estado guarda el último que
+incluye: si el proceso cae entre reescribir el estado y vaciar el journal, al
+cargar se saltan las operaciones que ya están en el estado (un `append`
+reproducido dos veces duplicaría elementos).
+
+Los cambios se acumulan en memoria y un thread los escribe al journal cada
+`interval` segundos, así que el coste en el camino crítico es un append a una
+lista. Al arrancar se carga el estado y se reproduce el journal; una última
+línea cortada por una caída simplemente se ignora.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class SessionSnapshot:
+    """Estado de sesión persistente: valores, diccionarios y listas acotadas.
+
+    - `set(key, value)`: valor simple (último texto, contador...).
+    - `put(key, subkey, value)`: entrada de un diccionario (caché de traducciones).
+    - `append(key, item)`: elemento de una lista (historial, segmentos).
+
+    `limits` acota el tamaño de diccionarios y listas ({clave: máximo}).
+    """
+
+    def __init__(self, path, interval=2.0, compact_every=1000, limits=None):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.metrics_path = path + '.metrics'
+        self.interval = interval
+        self.compact_every = compact_every
+        self.limits = limits or {}
+        self.state = {}
+        self._pending = []
+        self._journal_ops = 0
+        # Número de secuencia de la última operación registrada
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.recovery = None
+
+    # -- Estado en memoria -------------------------------------------------
+
+    def _apply(self, op):
+        kind, key = op[0], op[1]
+        if kind == 'set':
+            self.state[key] = op[2]
+        elif kind == 'put':
+            table = self.state.setdefault(key, OrderedDict())
+            table[op[2]] = op[3]
+            table.move_to_end(op[2])
+            limit = self.limits.get(key)
+            while limit and len(table) > limit:
+                table.popitem(last=False)
+        elif kind == 'append':
+            items = self.state.setdefault(key, [])
+            items.append(op[2])
+            limit = self.limits.get(key)
+            if limit and len(items) > limit:
+                del items[:len(items) - limit]
+
+    def _record(self, op):
+        with self._lock:
+            self._apply(op)
+            self._seq += 1
+            self._pending.append((self._seq, op))
+
+    def set(self, key, value):
+        self._record(('set', key, value))
+
+    def put(self, key, subkey, value):
+        self._record(('put', key, subkey, value))
+
+    def append(self, key, item):
+        self._record(('append', key, item))
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self.state.get(key, default)
+            if isinstance(value, OrderedDict):
+                return dict(value)
+            if isinstance(value, list):
+                return list(value)
+            return value
+
+    # -- Disco ---------------------------------------------------------------
+
+    def load(self):
+        """Cargar estado + journal. Devuelve True si había algo que recuperar."""
+        start = time.perf_counter()
+        found = False
+        truncated = False
+        with self._lock:
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, encoding='utf-8') as f:
+                        data = json.load(f)
+                    for key, value in data['state'].items():
+                        self.state[key] = OrderedDict(value) if isinstance(value, dict) else value
+                    self._seq = data['seq']
+                    found = True
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"⚠️  Snapshot ilegible, se ignora: {e}", file=sys.stderr)
+
+            replayed = 0
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                            seq, op = entry['seq'], entry['op']
+                        except (ValueError, KeyError, TypeError):
+                            # Última línea a medio escribir cuando se cayó el proceso
+                            truncated = True
+                            break
+                        if seq <= self._seq:
+                            # Ya incluida en el estado (caída durante la compactación)
+                            continue
+                        self._apply(op)
+                        self._seq = seq
+                        replayed += 1
+                found = found or replayed > 0
+            self._journal_ops = replayed
+
+        if truncated:
+            # Reescribir para que los siguientes appends no queden tras la línea rota
+            self.compact()
+
+        self.recovery = {
+            'event': 'recover',
+            'time': time.time(),
+            'found': found,
+            'load_ms': round((time.perf_counter() - start) * 1000, 2),
+            'journal_ops': replayed,
+        }
+        return found
+
+    def record_metric(self, **fields):
+        """Añadir una línea de métricas (p. ej. time-to-recover) junto al snapshot."""
+        metric = dict(self.recovery or {}, **fields)
+        self.recovery = metric
+        try:
+            with open(self.metrics_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(metric) + '\n')
+        except OSError:
+            pass
+
+    def flush(self):
+        """Escribir al journal los cambios pendientes (append + fsync)."""
+        with self._lock:
+            ops, self._pending = self._pending, []
+        if not ops:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            for seq, op in ops:
+                f.write(json.dumps({'seq': seq, 'op': op}, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_ops += len(ops)
+        if self._journal_ops >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """Reescribir el estado completo de forma atómica y vaciar el journal.
+
+        El estado se guarda con su número de secuencia: las operaciones del
+        journal que ya incluye se ignoran al cargar aunque no se llegue a vaciar.
+        """
+        with self._lock:
+            data = json.dumps({'seq': self._seq, 'state': self.state}, ensure_ascii=False)
+            # El estado ya incluye los cambios pendientes: no hace falta escribirlos
+            self._pending = []
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            with open(self.journal_path, 'w', encoding='utf-8'):
+                pass
+            self._journal_ops = 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"⚠️  Error guardando snapshot: {e}", file=sys.stderr)
+
+    def start(self):
+        """Guardar periódicamente en segundo plano."""
+        self._thread = threading.Thread(target=self._run, daemon=True, name='snapshot')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self.flush()
@@ -0,0 +1,124 @@
+// Cliente Socket.IO mínimo (Engine.IO v4, solo WebSocket) para la página de
+// proyección: sustituye a socket.io.min.js del CDN (~45 KB) en equipos lentos
+// o sin Internet. Implementa lo que usa la página: on(), emit(), eventos
+// connect/disconnect/connect_error, heartbeat y reconexión con backoff.
+//
+// Solo usa WebSocket (sin long-polling): el servidor necesita
+// simple-websocket. Si la conexión no llega a abrirse se emite
+// connect_error en cada intento, igual que el cliente oficial.
+(function (global) {
+    'use strict';
+
+    const MIN_RETRY_MS = 500;
+    const MAX_RETRY_MS = 5000;
+
+    class LiteSocket {
+        constructor(options) {
+            this.path = options.path || '/socket.io/';
+            this.handlers = {};
+            this.connected = false;
+            this.retryDelay = MIN_RETRY_MS;
+            this.heartbeat = null;
+            this.lastError = null;
+            this.open();
+        }
+
+        on(event, handler) {
+            (this.handlers[event] = this.handlers[event] || []).push(handler);
+            return this;
+        }
+
+        emit(event, data) {
+            if (this.connected) {
+                this.ws.send('42' + JSON.stringify([event, data]));
+            }
+            return this;
+        }
+
+        fire(event, args) {
+            (this.handlers[event] || []).forEach(handler => handler(...args));
+        }
+
+        open() {
+            const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+            const ws = new WebSocket(`${scheme}://${location.host}${this.path}?EIO=4&transport=websocket`);
+            this.ws = ws;
+            ws.onmessage = (message) => this.onPacket(message.data);
+            ws.onerror = () => ws.close();
+            ws.onclose = () => this.onClose(ws);
+        }
+
+        // Sin ping del servidor en pingInterval + pingTimeout: conexión muerta
+        armHeartbeat() {
+            clearTimeout(this.heartbeat);
+            this.heartbeat = setTimeout(() => this.ws.close(), this.pingTimeout);
+        }
+
+        // Paquetes de Engine.IO: 0 open, 1 close, 2 ping, 3 pong, 4 message
+        onPacket(packet) {
+            switch (packet[0]) {
+                case '0': {
+                    const handshake = JSON.parse(packet.slice(1));
+                    this.pingTimeout = handshake.pingInterval + handshake.pingTimeout;
+                    this.armHeartbeat();
+                    this.ws.send('40');  // conectar al namespace "/"
+                    break;
+                }
+                case '2':
+                    this.ws.send('3');
+                    this.armHeartbeat();
+                    break;
+                case '4':
+                    this.onMessage(packet.slice(1));
+                    break;
+                case '1':
+                    this.ws.close();
+                    break;
+            }
+        }
+
+        // Paquetes de Socket.IO: 0 connect, 1 disconnect, 2 event, 4 connect_error
+        onMessage(message) {
+            switch (message[0]) {
+                case '0':
+                    this.connected = true;
+                    this.retryDelay = MIN_RETRY_MS;
+                    this.fire('connect', []);
+                    break;
+                case '2': {
+                    // Puede llevar id de ack antes del array: 2<id>["evento", ...]
+                    const [event, ...args] = JSON.parse(message.slice(message.indexOf('[')));
+                    this.fire(event, args);
+                    break;
+                }
+                case '4':
+                    // El servidor rechaza la conexión al namespace
+                    this.lastError = JSON.parse(message.slice(1) || '{}').message || 'conexión rechazada';
+                    this.ws.close();
+                    break;
+                case '1':
+                    this.ws.close();
+                    break;
+            }
+        }
+
+        onClose(ws) {
+            if (ws !== this.ws) {
+                return;
+            }
+            clearTimeout(this.heartbeat);
+            if (this.connected) {
+                this.connected = false;
+                this.fire('disconnect', []);
+            } else {
+                // No se llegó a conectar (servidor caído o sin soporte de WebSocket)
+                this.fire('connect_error', [new Error(this.lastError || 'no se pudo abrir el WebSocket')]);
+            }
+            this.lastError = null;
+            setTimeout(() => this.open(), this.retryDelay);
+            this.retryDelay = Math.min(this.retryDelay * 2, MAX_RETRY_MS);
+        }
+    }
+
+    global.io = (options) => new LiteSocket(options || {});
+})(window);
@@ -0,0 +1,301 @@
+// Render de la página de proyección.
+//
+// - Los eventos de Socket.IO solo encolan; se aplican todos juntos en el
+//   siguiente requestAnimationFrame (un render por frame, no por evento).
+// - Los nodos del DOM se crean una vez y solo se parchea el texto de los que
+//   cambian (sin innerHTML: ni nodos huérfanos ni HTML inyectado).
+// - El historial es un buffer circular: añadir y recortar es O(1).
+// - Overlay de FPS/latencia con la tecla D (o ?debug en la URL).
+(function () {
+    'use strict';
+
+    const MAX_HISTORY = 2; // Mostrar 2 subtítulos antiguos
+    const SLIDE_UP = [
+        { opacity: 0, transform: 'translateY(30px)' },
+        { opacity: 1, transform: 'translateY(0)' }
+    ];
+    const FADE_IN = [{ opacity: 0 }, { opacity: 1 }];
+
+    const socket = io();
+
+    // --- Estado: buffer circular con los últimos MAX_HISTORY + 1 subtítulos ---
+    const ring = new Array(MAX_HISTORY + 1);
+    let head = 0;
+    let size = 0;
+
+    function pushSubtitle(sub) {
+        ring[head] = sub;
+        head = (head + 1) % ring.length;
+        size = Math.min(size + 1, ring.length);
+    }
+
+    // 0 = el más antiguo que se conserva
+    function subtitleAt(index) {
+        return ring[(head - size + index + ring.length) % ring.length];
+    }
+
+    function findSubtitle(id) {
+        for (let i = 0; i < size; i++) {
+            const sub = subtitleAt(i);
+            if (sub.id === id) {
+                return sub;
+            }
+        }
+        return null;
+    }
+
+    // --- Vista: nodos fijos que se parchean ---
+    const historyContainer = document.getElementById('subtitle-history');
+    const currentContainer = document.getElementById('current-subtitle');
+    const metaContainer = document.getElementById('subtitle-meta');
+    const placeholder = currentContainer.querySelector('.placeholder');
+
+    function createSlot(className, parent) {
+        const el = document.createElement('div');
+        el.className = className;
+        el.hidden = true;
+        const stream = document.createElement('span');
+        stream.className = 'subtitle-stream';
+        const text = document.createElement('span');
+        el.append(stream, text);
+        parent.appendChild(el);
+        return { el, stream, text, id: null, key: null };
+    }
+
+    const historySlots = [];
+    for (let i = 0; i < MAX_HISTORY; i++) {
+        historySlots.push(createSlot('subtitle-old', historyContainer));
+    }
+    const currentSlot = createSlot('subtitle-current', currentContainer);
+
+    // Devuelve true si el nodo ha cambiado
+    function patchSlot(slot, sub, keyframes, duration) {
+        if (!sub) {
+            if (!slot.el.hidden) {
+                slot.el.hidden = true;
+                slot.id = slot.key = null;
+                return true;
+            }
+            return false;
+        }
+        const key = `${sub.id}\u0000${sub.stream || ''}\u0000${sub.text}`;
+        if (key === slot.key) {
+            return false;
+        }
+        slot.el.hidden = false;
+        // Etiqueta de la entrada de audio (si hay varias)
+        slot.stream.textContent = sub.stream ? `${sub.stream}:` : '';
+        slot.text.textContent = sub.text;
+        if (slot.id !== sub.id && slot.el.animate) {
+            slot.el.animate(keyframes, { duration, easing: 'ease-out' });
+        }
+        slot.id = sub.id;
+        slot.key = key;
+        return true;
+    }
+
+    function render() {
+        let patched = 0;
+        const historyCount = Math.max(size - 1, 0);
+        // El historial se alinea al final: con uno solo ocupa el último hueco
+        for (let i = 0; i < MAX_HISTORY; i++) {
+            const index = i - (MAX_HISTORY - historyCount);
+            patched += patchSlot(historySlots[i], index >= 0 ? subtitleAt(index) : null, FADE_IN, 300);
+        }
+        const current = size ? subtitleAt(size - 1) : null;
+        patched += patchSlot(currentSlot, current, SLIDE_UP, 500);
+
+        placeholder.hidden = size > 0;
+        const meta = current ? current.timestamp : '';
+        if (metaContainer.textContent !== meta) {
+            metaContainer.textContent = meta;
+        }
+        return patched;
+    }
+
+    // --- Cola de eventos aplicada una vez por frame ---
+    let queue = [];
+    let frameRequested = false;
+
+    function enqueue(op) {
+        queue.push(op);
+        if (!frameRequested) {
+            frameRequested = true;
+            requestAnimationFrame(flush);
+        }
+    }
+
+    function flush() {
+        frameRequested = false;
+        const ops = queue;
+        queue = [];
+        const painted = [];
+
+        for (const op of ops) {
+            if (op.type === 'history') {
+                head = size = 0;
+                op.data.slice(-ring.length).forEach(pushSubtitle);
+            } else if (op.type === 'new') {
+                pushSubtitle(op.data);
+                painted.push(op);
+            } else if (op.type === 'update') {
+                const sub = findSubtitle(op.data.id);
+                if (sub) {
+                    sub.text = op.data.text;
+                }
+            }
+        }
+
+        const patched = render();
+        overlay.recordFlush(ops.length, patched);
+
+        if (painted.length) {
+            // El segundo frame empieza cuando el primero ya se ha pintado
+            requestAnimationFrame(() => {
+                const now = performance.now();
+                for (const op of painted) {
+                    const renderMs = now - op.receivedAt;
+                    overlay.recordLatency(renderMs);
+                    // Confirmar el render (solo si el servidor está trazando)
+                    if (op.data.trace_id) {
+                        socket.emit('render_ack', {
+                            trace_id: op.data.trace_id,
+                            id: op.data.id,
+                            render_ms: renderMs
+                        });
+                    }
+                }
+            });
+        }
+    }
+
+    // --- Overlay de rendimiento (para comprobar el hardware del recinto) ---
+    const overlay = (() => {
+        const el = document.getElementById('perf-overlay');
+        const latencies = new Array(100);
+        let latencyCount = 0;
+        let latencyHead = 0;
+        let frames = 0;
+        let worstFrame = 0;
+        let lastFrame = 0;
+        let events = 0;
+        let flushes = 0;
+        let patches = 0;
+        let windowStart = performance.now();
+        let visible = false;
+
+        function tick(now) {
+            if (!visible) {
+                return;
+            }
+            if (lastFrame) {
+                worstFrame = Math.max(worstFrame, now - lastFrame);
+            }
+            lastFrame = now;
+            frames++;
+            const elapsed = now - windowStart;
+            if (elapsed >= 1000) {
+                const recent = latencies.slice(0, latencyCount).sort((a, b) => a - b);
+                const p50 = recent.length ? recent[Math.floor(recent.length * 0.5)] : 0;
+                const p95 = recent.length ? recent[Math.min(recent.length - 1, Math.floor(recent.length * 0.95))] : 0;
+                el.textContent =
+                    `FPS ${(frames * 1000 / elapsed).toFixed(0)} | peor frame ${worstFrame.toFixed(0)} ms\n` +
+                    `evento→pintado p50 ${p50.toFixed(0)} ms | p95 ${p95.toFixed(0)} ms\n` +
+                    `eventos/s ${(events * 1000 / elapsed).toFixed(1)} | renders/s ${(flushes * 1000 / elapsed).toFixed(1)}` +
+                    ` | nodos parcheados/s ${(patches * 1000 / elapsed).toFixed(1)}\n` +
+                    `nodos DOM ${document.getElementsByTagName('*').length}` +
+                    ` | ${socket.connected ? 'conectado' : 'desconectado'}`;
+                frames = events = flushes = patches = 0;
+                worstFrame = 0;
+                windowStart = now;
+            }
+            requestAnimationFrame(tick);
+        }
+
+        return {
+            toggle() {
+                visible = !visible;
+                el.hidden = !visible;
+                if (visible) {
+                    el.textContent = 'midiendo…';
+                    lastFrame = frames = 0;
+                    windowStart = performance.now();
+                    requestAnimationFrame(tick);
+                }
+            },
+            recordFlush(eventCount, patchedCount) {
+                events += eventCount;
+                flushes++;
+                patches += patchedCount;
+            },
+            recordLatency(ms) {
+                latencies[latencyHead] = ms;
+                latencyHead = (latencyHead + 1) % latencies.length;
+                latencyCount = Math.min(latencyCount + 1, latencies.length);
+            }
+        };
+    })();
+
+    // --- Socket.IO ---
+    const connectionStatus = document.getElementById('connection-status');
+    const statusIndicator = connectionStatus.parentElement;
+    let failedAttempts = 0;
+
+    function showStatus(text, error) {
+        connectionStatus.textContent = text;
+        statusIndicator.classList.toggle('error', error);
+    }
+
+    socket.on('connect', () => {
+        console.log('✅ Conectado al servidor');
+        failedAttempts = 0;
+        showStatus('Conectado', false);
+    });
+
+    socket.on('disconnect', () => {
+        console.log('❌ Desconectado del servidor');
+        showStatus('Desconectado, reconectando…', true);
+    });
+
+    // Cada intento fallido (servidor caído o sin WebSocket): visible en la pantalla
+    socket.on('connect_error', (err) => {
+        failedAttempts++;
+        console.error(`❌ Error de conexión (intento ${failedAttempts}): ${err.message}`);
+        showStatus(`Sin conexión con el servidor (${failedAttempts} intentos)`, true);
+    });
+
+    // Historial inicial (también tras reconectar)
+    socket.on('history', (history) => {
+        enqueue({ type: 'history', data: history });
+    });
+
+    socket.on('new_subtitle', (data) => {
+        enqueue({ type: 'new', data, receivedAt: performance.now() });
+    });
+
+    // Sustituir un subtítulo ya mostrado (traducción que llegó tarde)
+    socket.on('update_subtitle', (data) => {
+        enqueue({ type: 'update', data });
+    });
+
+    document.addEventListener('keydown', (e) => {
+        // Tecla F11 para pantalla completa
+        if (e.key === 'F11') {
+            e.preventDefault();
+            if (!document.fullscreenElement) {
+                document.documentElement.requestFullscreen();
+            } else {
+                document.exitFullscreen();
+            }
+        } else if (e.key === 'd' || e.key === 'D') {
+            overlay.toggle();
+        }
+    });
+
+    if (new URLSearchParams(location.search).has('debug')) {
+        overlay.toggle();
+    }
+
+    console.log('🎬 Interfaz de subtítulos iniciada');
+    console.log('💡 Presiona F11 para pantalla completa, D para el overlay de rendimiento');
+})();
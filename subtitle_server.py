@@ -4,11 +4,22 @@ Servidor de Subtítulos en Tiempo Real.
 Muestra traducciones del cliente Whisper en una página web optimizada para proyección.
 """
 
-from flask import Flask, render_template, request, jsonify
+import time
+_STARTUP_T0 = time.perf_counter()
+
+from flask import Flask, Response, render_template, request, jsonify
 from flask_socketio import SocketIO, emit
 from flask_cors import CORS
 from datetime import datetime
+import argparse
+import atexit
+import gzip
+import hashlib
 import os
+import threading
+from collections import OrderedDict
+from session_snapshot import SessionSnapshot
+from tracing import SubtitleTrace, TraceExporter
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'whisper-subtitle-secret-key'
@@ -19,17 +30,155 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 subtitle_history = []
 subtitle_counter = 0
 
+# Snapshot de sesión (opcional, --snapshot): sobrevive a reinicios
+snapshot = None
+
+# Trazas (opcional, --trace-file): se exportan al recibir el render_ack del
+# navegador, o sin etapa de render si ningún navegador lo confirma en
+# PENDING_TRACE_TTL segundos (o al salir del servidor)
+tracer = None
+pending_traces = OrderedDict()  # trace_id -> (instante de llegada, traza)
+# La ruta de ingesta y el handler de render_ack corren en hilos distintos
+pending_traces_lock = threading.Lock()
+MAX_PENDING_TRACES = 100
+PENDING_TRACE_TTL = 5.0
+
+# Bundle de la página (cliente Socket.IO propio + render): sin CDN, comprimido
+# una sola vez y cacheado por el navegador con ETag
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+BUNDLE_FILES = ('socketio_lite.js', 'subtitles.js')
+
+
+class CachedAsset:
+    """Respuesta precomprimida (gzip) con ETag: 304 si el navegador ya la tiene."""
+
+    def __init__(self, body, mimetype, cache_control):
+        self.body = body.encode('utf-8')
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.etag = hashlib.sha1(self.body).hexdigest()[:16]
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+
+    def response(self):
+        if request.if_none_match.contains(self.etag):
+            response = Response(status=304)
+        elif 'gzip' in request.accept_encodings:
+            response = Response(self.gzipped, mimetype=self.mimetype)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(self.body, mimetype=self.mimetype)
+        response.set_etag(self.etag)
+        response.headers['Cache-Control'] = self.cache_control
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+_assets = {}
+
+
+def bundle_asset():
+    """El bundle de JS (se reconstruye solo si cambian los ficheros)."""
+    paths = [os.path.join(STATIC_DIR, name) for name in BUNDLE_FILES]
+    mtimes = tuple(os.path.getmtime(path) for path in paths)
+    cached = _assets.get('bundle')
+    if cached is None or cached[0] != mtimes:
+        parts = []
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                parts.append(f.read())
+        # La URL lleva el hash: el navegador puede guardarlo sin revalidar
+        asset = CachedAsset('\n;\n'.join(parts), 'application/javascript',
+                            'public, max-age=31536000, immutable')
+        cached = _assets['bundle'] = (mtimes, asset)
+    return cached[1]
+
+
+def page_asset():
+    """La página de subtítulos renderizada una vez por versión del bundle."""
+    bundle = bundle_asset()
+    cached = _assets.get('page')
+    if cached is None or cached[0] != bundle.etag:
+        html = render_template('subtitles.html', bundle_url=f'/bundle.js?v={bundle.etag}')
+        # Siempre se revalida (304 sin cuerpo si no ha cambiado)
+        cached = _assets['page'] = (bundle.etag, CachedAsset(html, 'text/html', 'no-cache'))
+    return cached[1]
+
+
+def save_state():
+    """Registrar el estado actual en el snapshot (se escribe en segundo plano)."""
+    if snapshot is not None:
+        snapshot.set('subtitle_history', [dict(sub) for sub in subtitle_history])
+        snapshot.set('subtitle_counter', subtitle_counter)
+
+
+def restore_state(path):
+    """Recuperar historial y contador de un snapshot anterior."""
+    global snapshot, subtitle_history, subtitle_counter
+    snapshot = SessionSnapshot(path)
+    if snapshot.load():
+        subtitle_history = snapshot.get('subtitle_history', [])
+        subtitle_counter = snapshot.get('subtitle_counter', 0)
+    snapshot.record_metric(
+        process='subtitle_server',
+        restored=len(subtitle_history),
+        time_to_recover_ms=round((time.perf_counter() - _STARTUP_T0) * 1000, 2)
+    )
+    snapshot.start()
+    return snapshot.recovery
+
+
+def expire_traces(now=None, flush=False):
+    """Exportar sin render las trazas sin confirmar (caducadas, de más o todas)."""
+    now = time.monotonic() if now is None else now
+    expired = []
+    with pending_traces_lock:
+        while pending_traces:
+            added = next(iter(pending_traces.values()))[0]
+            if not (flush or len(pending_traces) > MAX_PENDING_TRACES
+                    or now - added >= PENDING_TRACE_TTL):
+                break
+            expired.append(pending_traces.popitem(last=False)[1][1])
+    # Exportar fuera del lock (escribe en disco)
+    for trace in expired:
+        tracer.export(trace)
+    return len(expired)
+
+
+def track_trace(trace):
+    """Guardar una traza a la espera del render_ack (acotado y con caducidad)."""
+    with pending_traces_lock:
+        pending_traces[trace.trace_id] = (time.monotonic(), trace)
+    expire_traces()
+
+
+def start_trace_expiry():
+    """Caducar trazas aunque no lleguen más subtítulos, y exportar el resto al salir."""
+    def _run():
+        while True:
+            time.sleep(PENDING_TRACE_TTL / 2)
+            expire_traces()
+
+    threading.Thread(target=_run, daemon=True, name='trace-expiry').start()
+    atexit.register(expire_traces, flush=True)
+
 
 @app.route('/')
 def index():
     """Página principal de subtítulos."""
-    return render_template('subtitles.html')
+    return page_asset().response()
+
+
+@app.route('/bundle.js')
+def bundle():
+    """Cliente Socket.IO + render de la página (gzip + ETag)."""
+    return bundle_asset().response()
 
 
 @app.route('/subtitle', methods=['POST'])
 def receive_subtitle():
     """Recibe subtítulos del cliente Whisper."""
     global subtitle_counter
+    ingest_ns = time.monotonic_ns()
     
     data = request.get_json()
     text = data.get('text', '')
@@ -44,24 +193,61 @@ def receive_subtitle():
         'timestamp': datetime.now().strftime('%H:%M:%S'),
         'id': subtitle_counter
     }
+    if data.get('stream'):
+        # Entrada de audio de origen (cliente local con varias entradas)
+        subtitle_data['stream'] = str(data['stream'])
     
     # Agregar al historial (máximo 3)
     subtitle_history.append(subtitle_data)
     if len(subtitle_history) > 3:
         subtitle_history.pop(0)
+    save_state()
     
     # Transmitir a todos los clientes conectados
-    socketio.emit('new_subtitle', subtitle_data)
+    if tracer is not None:
+        trace = SubtitleTrace.from_dict(data.get('trace'))
+        trace.mark('ingest', ingest_ns).mark('emit')
+        track_trace(trace)
+        socketio.emit('new_subtitle', dict(subtitle_data, trace_id=trace.trace_id))
+    else:
+        socketio.emit('new_subtitle', subtitle_data)
     
     return jsonify({'status': 'ok', 'id': subtitle_counter})
 
 
+@app.route('/subtitle/<int:subtitle_id>', methods=['POST'])
+def update_subtitle(subtitle_id):
+    """Sustituye el texto de un subtítulo ya emitido (p. ej. traducción tardía)."""
+    data = request.get_json()
+    text = data.get('text', '')
+    
+    if not text:
+        return jsonify({'error': 'No text provided'}), 400
+    
+    for subtitle_data in subtitle_history:
+        if subtitle_data['id'] == subtitle_id:
+            subtitle_data['text'] = text
+            save_state()
+            break
+    
+    # Se emite aunque ya no esté en el historial: los clientes lo ignoran
+    socketio.emit('update_subtitle', {'id': subtitle_id, 'text': text})
+    
+    return jsonify({'status': 'ok', 'id': subtitle_id})
+
+
 @app.route('/history', methods=['GET'])
 def get_history():
     """Obtener historial de subtítulos."""
     return jsonify(subtitle_history)
 
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Métricas de recuperación tras el último reinicio."""
+    return jsonify({'recovery': snapshot.recovery if snapshot is not None else None})
+
+
 @socketio.on('connect')
 def handle_connect():
     """Maneja nueva conexión de cliente."""
@@ -70,6 +256,24 @@ def handle_connect():
     emit('history', subtitle_history)
 
 
+@socketio.on('render_ack')
+def handle_render_ack(data):
+    """El navegador confirma que ha pintado un subtítulo: cerrar su traza."""
+    if tracer is None or not isinstance(data, dict):
+        return
+    # Con varios navegadores abiertos cuenta el primero en pintarlo
+    with pending_traces_lock:
+        pending = pending_traces.pop(data.get('trace_id'), None)
+    expire_traces()
+    if pending is None:
+        return
+    trace = pending[1]
+    trace.mark('render')
+    if isinstance(data.get('render_ms'), (int, float)):
+        trace.attributes['browser_render_ms'] = round(data['render_ms'], 3)
+    tracer.export(trace)
+
+
 @socketio.on('disconnect')
 def handle_disconnect():
     """Maneja desconexión de cliente."""
@@ -77,12 +281,46 @@ def handle_disconnect():
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Servidor de subtítulos en tiempo real')
+    parser.add_argument(
+        '--snapshot',
+        type=str,
+        default=None,
+        help='Fichero de snapshot para sobrevivir a reinicios (p. ej. subtitles.snapshot.json)'
+    )
+    parser.add_argument(
+        '--trace-file',
+        type=str,
+        default=None,
+        help='Exportar la traza de cada subtítulo (captura → render en el navegador) a este fichero'
+    )
+    parser.add_argument(
+        '--trace-format',
+        type=str,
+        default='jsonl',
+        choices=['jsonl', 'otlp'],
+        help='Formato de las trazas: jsonl = un span por línea, otlp = OpenTelemetry JSON (default: jsonl)'
+    )
+    args = parser.parse_args()
+    
+    global tracer
+    if args.trace_file:
+        tracer = TraceExporter(args.trace_file, args.trace_format, service_name='subtitle_server')
+        start_trace_expiry()
+    
+    recovery = restore_state(args.snapshot) if args.snapshot else None
+    
     print("=" * 60)
     print("🎬 SERVIDOR DE SUBTÍTULOS EN TIEMPO REAL")
     print("=" * 60)
     print(f"🌐 URL: http://localhost:5000")
     print(f"📡 WebSocket: Activado")
     print(f"📝 Historial: Últimos 3 subtítulos")
+    if recovery:
+        print(f"💾 Snapshot: {args.snapshot} ({len(subtitle_history)} subtítulos recuperados "
+              f"en {recovery['time_to_recover_ms']:.0f} ms)")
+    if tracer is not None:
+        print(f"🔎 Trazas: {args.trace_file} ({args.trace_format})")
     print("=" * 60)
     print("\n✨ Servidor iniciado. Abre http://localhost:5000 en tu navegador.")
     print("   Para pantalla completa, presiona F11\n")
@@ -0,0 +1,34 @@
+"""Configuración común de los tests (pytest, desde la raíz del repositorio)."""
+
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deepl_stub_server import DeepLStubHandler, StubConfig  # noqa: E402
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clientes que cortan por timeout a propósito (BrokenPipe en el stub)
+        pass
+
+
+@pytest.fixture
+def deepl_stub():
+    """Stub de DeepL en un puerto libre: devuelve (url, config) para ajustarlo."""
+    config = StubConfig()
+    config.jitter_ms = 0
+    handler = type('Handler', (DeepLStubHandler,), {'config': config})
+    server = QuietServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", config
+    server.shutdown()
+    server.server_close()
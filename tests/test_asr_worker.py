@@ -0,0 +1,62 @@
+"""ASRWorker con un módulo whisper falso (sin torch ni modelos descargados)."""
+
+import numpy as np
+import pytest
+
+from asr_worker import ASRWorker
+
+FAKE_WHISPER = '''
+import os, time
+
+class Model:
+    def __init__(self, name):
+        self.name = name
+
+    def transcribe(self, audio, **options):
+        if options.get('crash'):
+            os._exit(3)
+        return {'text': f' {self.name}:{len(audio)} '}
+
+def load_model(name, device=None):
+    if name == 'broken':
+        raise RuntimeError('modelo corrupto')
+    if name == 'stuck':
+        time.sleep(60)
+    return Model(name)
+'''
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    (tmp_path / 'whisper.py').write_text(FAKE_WHISPER)
+    # El proceso hijo (spawn) hereda sys.path
+    monkeypatch.syspath_prepend(str(tmp_path))
+    worker = ASRWorker('tiny', max_seconds=1.0, job_timeout=2.0).start(timeout=30)
+    yield worker
+    worker.stop()
+
+
+def test_transcribe_and_recover_from_crash(worker):
+    assert worker.transcribe(np.ones(100, np.float32)) == 'tiny:100'
+    assert worker.transcribe(np.ones(10, np.float32), crash=True) is None
+    assert worker.restarts == 1
+    assert worker.transcribe(np.ones(5, np.float32)) == 'tiny:5'
+
+
+def test_switch_model(worker):
+    assert worker.switch_model('base')
+    assert worker.model_name == 'base'
+    assert worker.transcribe(np.ones(3, np.float32)) == 'base:3'
+
+
+def test_switch_model_load_error_keeps_current_model(worker):
+    assert not worker.switch_model('broken')
+    assert worker.model_name == 'tiny'
+    assert worker.transcribe(np.ones(3, np.float32)) == 'tiny:3'
+
+
+def test_switch_model_timeout_restarts_worker(worker):
+    assert not worker.switch_model('stuck')
+    assert worker.restarts == 1
+    assert worker.model_name == 'tiny'
+    assert worker.transcribe(np.ones(3, np.float32)) == 'tiny:3'
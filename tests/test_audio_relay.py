@@ -0,0 +1,149 @@
+"""audio_relay: tramas int16/Opus con secuencia → float32 para whisper-live."""
+
+import json
+import threading
+
+import numpy as np
+import pytest
+
+import audio_relay
+from audio_relay import CODEC_FLOAT32, CODEC_INT16, CODEC_OPUS, FRAME_HEADER, FrameDecoder
+
+RATE = 16000
+
+
+def tone(n_samples, freq=440.0):
+    t = np.arange(n_samples) / RATE
+    return (0.5 * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def int16_frame(seq, audio):
+    pcm = (audio * 32767).astype('<i2').tobytes()
+    return FRAME_HEADER.pack(seq, len(audio), CODEC_INT16, 0) + pcm
+
+
+def test_int16_roundtrip():
+    audio = tone(1600)
+    decoded = FrameDecoder().decode(int16_frame(0, audio))
+    assert decoded.dtype == np.float32
+    assert np.abs(decoded - audio).max() < 1e-3
+
+
+def test_lost_frames_become_silence_and_late_frames_are_dropped():
+    decoder = FrameDecoder(max_gap_seconds=1.0)
+    audio = tone(1600)
+    decoder.decode(int16_frame(0, audio))
+    # Se pierden las tramas 1 y 2: 2 x 1600 muestras de silencio delante de la 3
+    decoded = decoder.decode(int16_frame(3, audio))
+    assert len(decoded) == 3 * 1600
+    assert not decoded[:3200].any()
+    assert decoder.decode(int16_frame(2, audio)) is None
+    assert decoder.stats['lost'] == 2 and decoder.stats['late'] == 1
+
+
+def test_short_or_unknown_frames_are_ignored():
+    decoder = FrameDecoder()
+    assert decoder.decode(b'abc') is None
+    assert decoder.decode(FRAME_HEADER.pack(0, 10, 99, 0) + b'\0' * 20) is None
+
+
+def test_malformed_frames_are_counted_and_become_silence():
+    decoder = FrameDecoder()
+    audio = tone(1600)
+    decoder.decode(int16_frame(0, audio))
+    # Payload int16 de longitud impar: se descarta sin lanzar ValueError
+    assert decoder.decode(int16_frame(1, audio)[:-1]) is None
+    assert decoder.decode(FRAME_HEADER.pack(1, 1, CODEC_FLOAT32, 0) + b'\0' * 3) is None
+    assert decoder.stats['malformed'] == 2
+    decoded = decoder.decode(int16_frame(2, audio))
+    assert len(decoded) == 2 * 1600 and not decoded[:1600].any()
+
+
+def encode_opus(audio, frame_samples=320):
+    """Paquetes Opus de 20 ms (como los de WebCodecs en la página web)."""
+    av = pytest.importorskip('av')
+    encoder = av.CodecContext.create('libopus', 'w')
+    encoder.sample_rate = RATE
+    encoder.layout = 'mono'
+    encoder.format = 's16'
+    encoder.bit_rate = 24000
+    packets = []
+    pcm = (audio * 32767).astype(np.int16)
+    for start in range(0, len(pcm) - frame_samples + 1, frame_samples):
+        frame = av.AudioFrame.from_ndarray(pcm[None, start:start + frame_samples],
+                                           format='s16', layout='mono')
+        frame.sample_rate = RATE
+        frame.pts = start
+        packets.extend(bytes(packet) for packet in encoder.encode(frame))
+    packets.extend(bytes(packet) for packet in encoder.encode(None))
+    return packets
+
+
+def test_opus_frames_decode_to_16k_float32():
+    pytest.importorskip('av')
+    audio = tone(RATE)
+    decoder = FrameDecoder()
+    decoded = [decoder.decode(FRAME_HEADER.pack(seq, 320, CODEC_OPUS, 0) + packet)
+               for seq, packet in enumerate(encode_opus(audio))]
+    out = np.concatenate(decoded)
+    assert out.dtype == np.float32
+    # Opus añade algo de retardo inicial, pero la duración se conserva a 16 kHz
+    assert abs(len(out) - len(audio)) <= 2 * 320
+    # La energía del tono sobrevive a la compresión
+    assert np.sqrt(np.mean(out[1600:] ** 2)) == pytest.approx(0.5 / np.sqrt(2), rel=0.2)
+    assert decoder.stats['bytes_in'] < decoder.stats['bytes_out'] / 10
+
+
+def test_relay_rejects_opus_without_pyav(monkeypatch):
+    class FakeClient:
+        def __init__(self):
+            self.sent = []
+
+        def recv(self):
+            return json.dumps({'uid': 'u1', 'audio_codec': 'opus'})
+
+        def send(self, message):
+            self.sent.append(json.loads(message))
+
+    monkeypatch.setattr(audio_relay, 'opus_available', lambda: False)
+    client = FakeClient()
+    audio_relay.relay_connection(client, 'ws://127.0.0.1:1')
+    assert client.sent[0]['status'] == 'ERROR'
+
+
+def test_relay_forwards_decoded_audio():
+    pytest.importorskip('websockets')
+    from websockets.sync.client import connect
+    from websockets.sync.server import serve
+
+    received = []
+
+    def upstream(ws):
+        received.append(json.loads(ws.recv()))
+        ws.send(json.dumps({'uid': 'u1', 'message': 'SERVER_READY'}))
+        for message in ws:
+            received.append(message)
+            if message == audio_relay.END_OF_AUDIO:
+                ws.send(json.dumps({'uid': 'u1', 'segments': []}))
+
+    up = serve(upstream, '127.0.0.1', 0)
+    up_url = f"ws://127.0.0.1:{up.socket.getsockname()[1]}"
+    relay = serve(lambda ws: audio_relay.relay_connection(ws, up_url), '127.0.0.1', 0,
+                  max_size=None, compression=None)
+    for server in (up, relay):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    audio = tone(1600)
+    with connect(f"ws://127.0.0.1:{relay.socket.getsockname()[1]}") as client:
+        client.send(json.dumps({'uid': 'u1', 'audio_codec': 'int16'}))
+        assert json.loads(client.recv())['message'] == 'SERVER_READY'
+        client.send(int16_frame(0, audio))
+        client.send(audio_relay.END_OF_AUDIO)
+        assert 'segments' in json.loads(client.recv())
+    up.shutdown()
+    relay.shutdown()
+
+    assert received[0] == {'uid': 'u1'}
+    forwarded = np.frombuffer(received[1], dtype=np.float32)
+    assert np.abs(forwarded - audio).max() < 1e-3
+    assert received[2] == audio_relay.END_OF_AUDIO
@@ -0,0 +1,91 @@
+"""AudioBacklog (políticas drop/merge) y AdaptiveChunkController."""
+
+import numpy as np
+import pytest
+
+from backpressure import POLICY_DROP, POLICY_MERGE, AdaptiveChunkController, AudioBacklog
+
+RATE = 100  # muestras por segundo: ventanas pequeñas y fáciles de seguir
+
+
+def ramp(start, n):
+    return np.arange(start, start + n, dtype=np.float32)
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        AudioBacklog(policy='lifo')
+
+
+def test_take_waits_for_enough_audio():
+    backlog = AudioBacklog(sample_rate=RATE)
+    backlog.put(ramp(0, 50))
+    assert backlog.take(100, timeout=0.01) is None
+    backlog.put(ramp(50, 70))
+    window = backlog.take(100)
+    np.testing.assert_array_equal(window, ramp(0, 100))
+    assert backlog.pending_seconds() == pytest.approx(0.2)
+
+
+def test_hard_limit_drops_oldest_blocks():
+    backlog = AudioBacklog(sample_rate=RATE, max_seconds=1.0)
+    for i in range(5):
+        backlog.put(ramp(i * 50, 50))
+    assert backlog.pending_seconds() <= 1.5
+    assert backlog.dropped_samples == 250 - int(backlog.pending_seconds() * RATE)
+    # Lo que queda es lo más reciente
+    assert backlog.drain()[-1] == 249
+
+
+def test_drop_policy_keeps_latest_window():
+    backlog = AudioBacklog(sample_rate=RATE, max_seconds=10.0, policy=POLICY_DROP)
+    backlog.put(ramp(0, 500))
+    window = backlog.take(100, max_lag_samples=200)
+    np.testing.assert_array_equal(window, ramp(400, 100))
+    assert backlog.dropped_samples == 400
+    assert backlog.pending_seconds() == 0
+
+
+def test_merge_policy_returns_everything_pending():
+    backlog = AudioBacklog(sample_rate=RATE, max_seconds=10.0, policy=POLICY_MERGE,
+                           merge_max_seconds=3.0)
+    backlog.put(ramp(0, 250))
+    window = backlog.take(100, max_lag_samples=200)
+    np.testing.assert_array_equal(window, ramp(0, 250))
+    assert backlog.dropped_samples == 0
+
+
+def test_merge_policy_caps_at_merge_max():
+    backlog = AudioBacklog(sample_rate=RATE, max_seconds=10.0, policy=POLICY_MERGE,
+                           merge_max_seconds=3.0)
+    backlog.put(ramp(0, 500))
+    window = backlog.take(100, max_lag_samples=200)
+    np.testing.assert_array_equal(window, ramp(200, 300))
+    assert backlog.dropped_samples == 200
+
+
+def test_set_max_seconds_trims_pending():
+    backlog = AudioBacklog(sample_rate=RATE, max_seconds=10.0)
+    for i in range(10):
+        backlog.put(ramp(i * 100, 100))
+    backlog.set_max_seconds(2.0)
+    assert backlog.pending_seconds() <= 3.0
+    assert backlog.drain()[-1] == 999
+
+
+def test_controller_grows_chunk_then_degrades():
+    controller = AdaptiveChunkController(initial_chunk=4.0, max_chunk=5.0, window=2, max_level=1)
+    changes = 0
+    for _ in range(20):
+        changes += controller.record(audio_seconds=1.0, decode_seconds=2.0)
+    assert controller.chunk_duration == 5.0
+    assert controller.level == 1
+    assert changes == 2
+
+
+def test_controller_recovers_when_fast():
+    controller = AdaptiveChunkController(initial_chunk=1.5, window=2)
+    controller.level = 1
+    for _ in range(10):
+        controller.record(audio_seconds=1.0, decode_seconds=0.1)
+    assert controller.level == 0
@@ -0,0 +1,59 @@
+"""Estructuras acotadas: orden de expulsión y límites de tamaño."""
+
+import threading
+
+from bounded_state import BoundedSet, LRUCache
+
+
+def test_bounded_set_evicts_oldest():
+    items = BoundedSet(maxlen=3, items=['a', 'b', 'c'])
+    items.add('d')
+    assert list(items) == ['b', 'c', 'd']
+    assert 'a' not in items and len(items) == 3
+
+
+def test_bounded_set_re_add_refreshes():
+    items = BoundedSet(maxlen=3, items=['a', 'b', 'c'])
+    items.add('a')
+    items.add('d')
+    assert list(items) == ['c', 'a', 'd']
+
+
+def test_lru_get_and_set_move_to_most_recent():
+    cache = LRUCache(maxsize=3)
+    for key in 'abc':
+        cache[key] = key.upper()
+    assert cache.get('a') == 'A'
+    cache['b'] = 'B2'
+    cache['d'] = 'D'
+    # 'c' es el menos usado: sale el primero
+    assert 'c' not in cache
+    assert [key for key, _ in cache.items()] == ['a', 'b', 'd']
+    assert cache['a'] == 'A'
+    cache['e'] = 'E'
+    assert [key for key, _ in cache.items()] == ['d', 'a', 'e']
+
+
+def test_lru_respects_maxsize_and_default():
+    cache = LRUCache(maxsize=2)
+    for i in range(10):
+        cache[i] = i
+    assert len(cache) == 2
+    assert cache.get(0, 'nada') == 'nada'
+    assert cache.get(9) == 9
+
+
+def test_lru_concurrent_writes_stay_bounded():
+    cache = LRUCache(maxsize=50)
+
+    def writer(offset):
+        for i in range(500):
+            cache[offset + i] = i
+            len(cache)
+
+    threads = [threading.Thread(target=writer, args=(n * 1000,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 50 and len(cache.items()) == 50
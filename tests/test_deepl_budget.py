@@ -0,0 +1,130 @@
+"""Presupuesto de caracteres: política de parciales, contador y cliente local."""
+
+import json
+
+import pytest
+
+import deepl_budget
+from deepl_budget import BudgetPolicy, UsageLedger
+
+
+def make_policy(tmp_path, used=0, limit=1000, **kwargs):
+    ledger = UsageLedger(str(tmp_path / 'usage.json'), monthly_limit=limit)
+    ledger.month_total = used
+    return BudgetPolicy(ledger, 'EN-ES', **kwargs)
+
+
+def test_normal_translates_stable_or_due(tmp_path, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(deepl_budget.time, 'monotonic', lambda: clock[0])
+    policy = make_policy(tmp_path, partial_interval=1.0)
+
+    assert policy.partial_decision('hello') == 'translate'    # ha pasado el intervalo
+    assert policy.partial_decision('hello there') == 'skip'
+    assert policy.partial_decision('hello there') == 'translate'    # estable
+
+
+def test_saving_needs_stable_and_due(tmp_path, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(deepl_budget.time, 'monotonic', lambda: clock[0])
+    policy = make_policy(tmp_path, used=850, partial_interval=1.0)
+    assert policy.current_level() == deepl_budget.LEVEL_SAVING
+
+    assert policy.partial_decision('hello') == 'skip'
+    assert policy.partial_decision('hello') == 'translate'
+    # Estable otra vez, pero antes de 3 intervalos
+    clock[0] += 2.0
+    policy.partial_decision('hello there')
+    assert policy.partial_decision('hello there') == 'skip'
+    clock[0] += 1.0
+    assert policy.partial_decision('hello there') == 'translate'
+
+
+def test_finals_only_and_exhausted(tmp_path):
+    assert make_policy(tmp_path, used=960).partial_decision('hello') == 'original'
+    policy = make_policy(tmp_path, used=1000)
+    assert policy.partial_decision('hello') == 'original'
+    assert not policy.allow_final()
+
+
+def test_metered_counts_only_successful_calls(tmp_path):
+    policy = make_policy(tmp_path)
+
+    def failing(text):
+        raise TimeoutError('sin respuesta')
+
+    with pytest.raises(TimeoutError):
+        policy.metered(failing)('hello')
+    assert policy.ledger.session_chars == 0
+
+    assert policy.metered(str.upper)('hello') == 'HELLO'
+    assert policy.ledger.session_chars == 5
+    assert policy.ledger.session_languages == {'EN-ES': 5}
+
+
+def test_shared_ledger_does_not_double_count_account_usage(tmp_path):
+    path = str(tmp_path / 'usage.json')
+    account = [0]
+    ledgers = [UsageLedger(path, monthly_limit=100_000, remote=lambda: (account[0], 100_000))
+               for _ in range(2)]
+
+    # Cada cliente gasta 15.000 caracteres; la cuenta ve los 30.000
+    for ledger in ledgers:
+        ledger.record(15_000, 'EN-ES')
+        account[0] += 15_000
+    for _ in range(3):
+        for ledger in ledgers:
+            ledger.sync_remote()
+            ledger.flush()
+
+    month = json.loads((tmp_path / 'usage.json').read_text())['months'][ledgers[0].month]
+    assert month['total'] == 30_000
+    assert month['account'] == 30_000
+    assert [ledger.month_total for ledger in ledgers] == [30_000, 30_000]
+
+    # Otro uso de la API key (fuera de estos clientes) sí cuenta
+    account[0] += 5_000
+    ledgers[0].sync_remote()
+    ledgers[0].flush()
+    ledgers[1].flush()
+    assert [ledger.month_total for ledger in ledgers] == [35_000, 35_000]
+
+
+def test_account_usage_uses_deepl_http_client(deepl_stub):
+    from deepl_http import DeepLHTTPTranslator
+    url, config = deepl_stub
+    config.character_count = 1234
+    assert deepl_budget.account_usage(DeepLHTTPTranslator('stub', 'en', 'es', server_url=url)) == (1234, 500_000)
+    assert deepl_budget.account_usage(DeepLHTTPTranslator('stub', 'en', 'es', server_url='http://127.0.0.1:1')) is None
+
+
+def local_client(url, tmp_path):
+    client_local_coreml = pytest.importorskip('client_local_coreml')
+    pytest.importorskip('deepl')
+    return client_local_coreml.LocalCoreMLClient(
+        'stub', deepl_server_url=url, deepl_deadline=2.0,
+        usage_path=str(tmp_path / 'usage.json')
+    )
+
+
+def test_local_client_meters_deepl(deepl_stub, tmp_path):
+    url, config = deepl_stub
+    config.latency_ms = 0
+    client = local_client(url, tmp_path)
+
+    assert client.translate_text('hello world') == ('[ES] hello world', True)
+    assert client.budget.ledger.session_chars == len('hello world')
+    client.stop()
+    assert '"EN-ES": 11' in (tmp_path / 'usage.json').read_text()
+
+
+def test_local_client_shows_original_when_exhausted(deepl_stub, tmp_path):
+    url, config = deepl_stub
+    config.latency_ms = 0
+    config.character_count = config.character_limit
+    client = local_client(url, tmp_path)
+
+    assert client.translate_text('hello world') == ('hello world', True)
+    assert client.budget.ledger.session_chars == 0
+    assert 'hello world' not in client.translation_cache
+    client.stop()
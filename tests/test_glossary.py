@@ -0,0 +1,79 @@
+"""Glosario local: marcadores, traducción tardía y convivencia con el glosario de DeepL."""
+
+from types import SimpleNamespace
+
+import pytest
+
+import glossary
+from glossary import Glossary
+
+
+def test_protect_and_restore_longest_match():
+    terms = Glossary({'machine learning': 'aprendizaje automático', 'machine': 'máquina'})
+    protected, targets = terms.protect('Machine learning beats a machine.')
+    assert protected == '{{G0}} beats a {{G1}}.'
+    assert terms.restore('{{ G0 }} gana a una {{G1}}.', targets) == 'aprendizaje automático gana a una máquina.'
+
+
+def test_wrap_restores_late_translations():
+    terms = Glossary({'Whisper': 'Whisper'})
+    calls = []
+
+    def guarded(text, on_late=None):
+        calls.append(text)
+        on_late(text, '{{G0}} es rápido')
+        return text, False
+
+    late = []
+    translated, final = terms.wrap(guarded)('Whisper is fast', on_late=lambda s, t: late.append((s, t)))
+    assert calls == ['{{G0}} is fast']
+    assert (translated, final) == ('Whisper is fast', False)
+    assert late == [('Whisper is fast', 'Whisper es rápido')]
+
+
+def test_wrap_skips_translator_for_terms_only():
+    terms = Glossary({'thank you': 'gracias'})
+
+    def guarded(text, on_late=None):
+        raise AssertionError('no debería traducirse')
+
+    assert terms.wrap(guarded)('Thank you!') == ('gracias!', True)
+
+
+def test_local_client_sends_one_glossary_per_request(tmp_path, monkeypatch):
+    client_local_coreml = pytest.importorskip('client_local_coreml')
+    pytest.importorskip('deepl')
+    monkeypatch.setattr(glossary, 'fetch_deepl_glossary',
+                        lambda *args, **kwargs: {'keynote': 'ponencia'})
+    client = client_local_coreml.LocalCoreMLClient(
+        'test', glossary_id='abc123', deepl_server_url='http://127.0.0.1:1',
+        usage_path=str(tmp_path / 'usage.json'), deepl_deadline=2.0
+    )
+    sent = []
+
+    def translate_text(text, **options):
+        sent.append((text, options['glossary']))
+        return SimpleNamespace(text=f'[ES] {text}')
+
+    monkeypatch.setattr(client.translator, 'translate_text', translate_text)
+
+    assert client.translate_text('the keynote starts') == ('[ES] the ponencia starts', True)
+    assert client.translate_text('see you later') == ('[ES] see you later', True)
+    # Con marcadores locales no se envía el glosario de DeepL; sin ellos, sí
+    assert sent == [('the {{G0}} starts', None), ('see you later', 'abc123')]
+    client.stop()
+
+
+def test_fetch_deepl_glossary_uses_deepl_http_client(deepl_stub, tmp_path):
+    from deepl_http import DeepLHTTPTranslator
+    url, config = deepl_stub
+    config.glossaries = {'abc123': {'keynote': 'ponencia', 'machine learning': 'aprendizaje automático'}}
+    client = DeepLHTTPTranslator('stub', 'en', 'es', server_url=url)
+
+    entries = glossary.fetch_deepl_glossary(client, 'abc123', cache_dir=str(tmp_path))
+    assert entries == config.glossaries['abc123']
+    # La segunda vez se lee de la caché aunque el servidor ya no lo tenga
+    config.glossaries = {}
+    assert glossary.fetch_deepl_glossary(client, 'abc123', cache_dir=str(tmp_path)) == entries
+    with pytest.raises(Exception):
+        glossary.fetch_deepl_glossary(client, 'abc123', refresh=True, cache_dir=str(tmp_path))
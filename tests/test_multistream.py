@@ -0,0 +1,69 @@
+"""Varias entradas: especificación de --stream y estado por entrada del cliente local."""
+
+import numpy as np
+import pytest
+
+import multistream
+from multistream import parse_stream_spec
+
+client_local_coreml = pytest.importorskip('client_local_coreml')
+pytest.importorskip('deepl')
+
+
+def test_parse_stream_spec():
+    assert parse_stream_spec('2', 0) == ('Canal 1', None, 1)
+    assert parse_stream_spec('Ana=USB Mic:2', 1) == ('Ana', 'USB Mic', 1)
+    assert parse_stream_spec('Luis=3:1', 2) == ('Luis', 3, 0)
+    with pytest.raises(ValueError):
+        parse_stream_spec('0', 0)
+    with pytest.raises(ValueError):
+        parse_stream_spec('Ana=izquierda', 0)
+
+
+def make_client(tmp_path, **kwargs):
+    return client_local_coreml.MultiStreamLocalClient(
+        'test', ['Ana=1', 'Luis=2'], deepl_server_url='http://127.0.0.1:1',
+        max_backlog=5.0, startup_buffer=20.0, usage_path=str(tmp_path / 'usage.json'), **kwargs
+    )
+
+
+def test_streams_own_their_backlogs(tmp_path):
+    client = make_client(tmp_path)
+    assert client.audio_backlog is None
+    assert [stream.label for stream in client.streams] == ['Ana', 'Luis']
+    assert all(stream.backlog.max_samples == 20 * 16000 for stream in client.streams)
+    client.stop()
+
+
+def test_batch_uses_decode_level(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(multistream, 'batch_transcribe',
+                        lambda model, windows, **options: calls.append(options) or [''] * len(windows))
+    client = make_client(tmp_path, no_speech_thresh=0.4)
+    windows = [np.zeros(16000, dtype=np.float32)] * 2
+
+    client.transcribe_batch(windows)
+    client.decode_level = 1
+    client.transcribe_batch(windows)
+    assert calls[0]['without_timestamps'] is False
+    assert calls[1]['without_timestamps'] is True
+    assert all(options['no_speech_threshold'] == 0.4 for options in calls)
+    assert all('condition_on_previous_text' not in options for options in calls)
+    client.stop()
+
+
+def test_snapshot_keeps_context_per_stream(tmp_path):
+    path = str(tmp_path / 'multi.snapshot')
+    client = make_client(tmp_path, snapshot_path=path)
+    ana, luis = client.streams
+    ana.differ.diff('hola a todos')
+    client.save_context('hola a todos', ana.differ, ana.label)
+    luis.differ.diff('buenos días')
+    client.save_context('buenos días', luis.differ, luis.label)
+    client.stop()
+
+    restored = make_client(tmp_path, snapshot_path=path)
+    assert list(restored.streams[0].differ.history) == ['hola', 'a', 'todos']
+    assert list(restored.streams[1].differ.history) == ['buenos', 'días']
+    assert not restored.differ.history
+    restored.stop()
@@ -0,0 +1,60 @@
+"""Perfiles de autotune: separados por backend y sin mezclar umbrales."""
+
+import pytest
+
+from autotune import pick_profiles
+from profiles import load_profile, load_profiles, save_profiles, whisper_live_options
+
+
+def front(no_speech_thresh):
+    setting = {'model': 'tiny', 'chunk_duration': 1.5, 'send_last_n_segments': 2,
+               'no_speech_thresh': no_speech_thresh, 'same_output_threshold': 7,
+               'omp_num_threads': 2}
+    return [{'setting': setting,
+             'metrics': {'latency_p50': 0.5, 'latency_p95': 0.8, 'wer': 0.1, 'cpu': 50.0, 'rtf': 0.2}}]
+
+
+def test_pick_profiles_keeps_backend_knobs_only():
+    profiles = pick_profiles(front(0.6), 'local')
+    balanced = profiles['balanced']
+    assert balanced['backend'] == 'local'
+    assert balanced['chunk_duration'] == 1.5
+    assert 'send_last_n_segments' not in balanced
+    assert 'same_output_threshold' not in balanced
+
+
+def test_backends_do_not_overwrite_each_other(tmp_path):
+    path = str(tmp_path / 'profiles.json')
+    save_profiles(pick_profiles(front(0.6), 'local'), 'local', path)
+    save_profiles(pick_profiles(front(0.3), 'whisper-live'), 'whisper-live', path)
+
+    assert load_profile('balanced', 'local', path)['no_speech_thresh'] == 0.6
+    assert load_profile('balanced', 'whisper-live', path)['no_speech_thresh'] == 0.3
+    assert set(load_profiles('local', path)) == {'low-latency', 'accurate', 'efficient', 'balanced'}
+
+
+def test_profile_of_other_backend_is_rejected(tmp_path):
+    path = str(tmp_path / 'profiles.json')
+    save_profiles(pick_profiles(front(0.6), 'local', prefix='sala-'), 'local', path)
+
+    with pytest.raises(ValueError, match='backend local'):
+        load_profile('sala-balanced', 'whisper-live', path)
+    with pytest.raises(ValueError, match='Perfil desconocido'):
+        load_profile('otro', 'local', path)
+
+
+def test_save_rejects_mismatched_backend(tmp_path):
+    profiles = pick_profiles(front(0.6), 'local')
+    with pytest.raises(ValueError):
+        save_profiles(profiles, 'whisper-live', str(tmp_path / 'profiles.json'))
+
+
+def test_whisper_live_options_use_whisper_live_profiles(tmp_path, monkeypatch):
+    path = str(tmp_path / 'profiles.json')
+    save_profiles(pick_profiles(front(0.3), 'whisper-live'), 'whisper-live', path)
+    monkeypatch.setattr('profiles.PROFILES_PATH', path)
+
+    options = whisper_live_options({'model': 'small', 'no_speech_thresh': 0.45},
+                                   'balanced', model='base')
+    assert options == {'model': 'base', 'no_speech_thresh': 0.3,
+                       'send_last_n_segments': 2, 'same_output_threshold': 7}
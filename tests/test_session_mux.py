@@ -0,0 +1,224 @@
+"""session_mux: una sesión upstream compartida, relevo del emisor y audio sin upstream."""
+
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('websockets')
+from websockets.sync.client import connect  # noqa: E402
+from websockets.sync.server import serve  # noqa: E402
+
+import session_mux  # noqa: E402
+from session_mux import SessionMux, SharedSession  # noqa: E402
+
+FRAME = 16000
+CONFIG = {'language': 'en', 'task': 'transcribe', 'model': 'small'}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+class FakeUpstream:
+    """whisper-live de pega: SERVER_READY y un segmento con los bytes recibidos."""
+
+    def __init__(self, port=0, handshake_delay=0.0):
+        self.configs = []
+        self.audio = []
+        self.closed = 0
+        self.handshake_delay = handshake_delay
+        self.server = serve(self.handle, '127.0.0.1', port, max_size=None,
+                            process_request=self.delay_handshake)
+        self.url = f"ws://127.0.0.1:{self.server.socket.getsockname()[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def delay_handshake(self, connection, request):
+        time.sleep(self.handshake_delay)
+
+    def handle(self, ws):
+        try:
+            config = json.loads(ws.recv())
+            self.configs.append(config)
+            ws.send(json.dumps({'uid': config['uid'], 'message': 'SERVER_READY', 'backend': 'fake'}))
+            for message in ws:
+                self.audio.append(message)
+                ws.send(json.dumps({'uid': config['uid'], 'segments': [
+                    {'start': '0', 'end': '1', 'text': f'bytes {self.received}', 'completed': False}]}))
+        finally:
+            self.closed += 1
+
+    @property
+    def received(self):
+        return sum(len(chunk) for chunk in self.audio)
+
+    def close(self):
+        self.server.shutdown()
+
+
+class Consumer:
+    """Cliente del multiplexor: la conexión vive en un hilo que lee los mensajes."""
+
+    def __init__(self, url, uid, **config):
+        self.uid = uid
+        self.messages = []
+        self.ws = None
+        connected = threading.Event()
+        threading.Thread(target=self._run, args=(url, dict(config, uid=uid), connected),
+                         daemon=True).start()
+        assert connected.wait(5.0)
+
+    def _run(self, url, config, connected):
+        with connect(url, max_size=None) as ws:
+            ws.send(json.dumps(config))
+            self.ws = ws
+            connected.set()
+            try:
+                for message in ws:
+                    self.messages.append(json.loads(message))
+            except Exception:
+                pass
+
+    def texts(self):
+        return [m.get('message') or m['segments'][0]['text'] for m in self.messages]
+
+
+@pytest.fixture
+def mux_server():
+    servers = []
+
+    def start(upstream_url):
+        mux = SessionMux(upstream_url)
+        server = serve(mux.handle, '127.0.0.1', 0, max_size=None)
+        servers.append(server)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return mux, f"ws://127.0.0.1:{server.socket.getsockname()[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def test_shared_session_late_subscriber_and_handover(mux_server):
+    upstream = FakeUpstream()
+    mux, url = mux_server(upstream.url)
+
+    a = Consumer(url, 'uid-A', **CONFIG)
+    b = Consumer(url, 'uid-B', **CONFIG)
+    assert wait_for(lambda: len(mux.sessions) == 1 and len(next(iter(mux.sessions.values())).subscribers) == 2)
+    for _ in range(3):
+        a.ws.send(b'\0' * FRAME)
+        b.ws.send(b'\1' * FRAME)
+    # Solo llega el audio del emisor (A), por una única sesión upstream
+    assert wait_for(lambda: upstream.received == 3 * FRAME)
+    assert len(upstream.configs) == 1
+    assert wait_for(lambda: b.texts()[-1:] == [f'bytes {3 * FRAME}'])
+
+    # Suscriptor tardío: SERVER_READY y los últimos segmentos al momento
+    late = Consumer(f"{url}/default", 'uid-T', role='subscriber')
+    assert wait_for(lambda: late.texts() == ['SERVER_READY', f'bytes {3 * FRAME}'])
+
+    # El emisor se va: B toma el relevo sin abrir otra sesión
+    session = next(iter(mux.sessions.values()))
+    a.ws.close()
+    assert wait_for(lambda: session.publisher is None)
+    b.ws.send(b'\1' * FRAME)
+    assert wait_for(lambda: upstream.received == 4 * FRAME)
+    assert set(upstream.audio[-1]) == {1}
+    assert len(upstream.configs) == 1
+    assert wait_for(lambda: late.texts()[-1] == f'bytes {4 * FRAME}')
+
+    # Cada consumidor recibe los mensajes con su propio uid
+    for consumer in (a, b, late):
+        assert all(m['uid'] == consumer.uid for m in consumer.messages)
+
+    b.ws.close()
+    late.ws.close()
+    assert wait_for(lambda: not mux.sessions)
+    upstream.close()
+
+
+def test_audio_is_buffered_until_upstream_connects(mux_server):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    mux, url = mux_server(f"ws://127.0.0.1:{port}")
+
+    publisher = Consumer(url, 'uid-A', **CONFIG)
+    assert wait_for(lambda: mux.sessions)
+    session = next(iter(mux.sessions.values()))
+    start = time.monotonic()
+    for _ in range(3):
+        publisher.ws.send(b'\0' * FRAME)
+    # El bucle de recepción no espera al servidor: el audio queda guardado
+    assert wait_for(lambda: session.pending_bytes == 3 * FRAME, timeout=1.0)
+    assert time.monotonic() - start < 1.0
+
+    upstream = FakeUpstream(port)
+    assert wait_for(lambda: upstream.received == 3 * FRAME, timeout=10.0)
+    assert session.pending_bytes == 0
+    assert session.stats['lost_audio_bytes'] == 0
+    publisher.ws.close()
+    upstream.close()
+
+
+def test_pending_audio_is_bounded(monkeypatch, capsys):
+    monkeypatch.setattr(session_mux, 'MAX_PENDING_AUDIO_BYTES', 2 * FRAME)
+    session = SharedSession(('default', 'en', 'transcribe', 'small'), 'ws://127.0.0.1:1', CONFIG,
+                            on_empty=lambda session: None)
+    for value in range(4):
+        session._buffer_audio(bytes([value]) * FRAME)
+
+    assert [chunk[0] for chunk in session.pending_audio] == [2, 3]
+    assert session.stats['lost_audio_bytes'] == 2 * FRAME
+    # Un solo aviso por corte del upstream
+    assert capsys.readouterr().err.count('se descarta el audio más antiguo') == 1
+
+
+def test_rejected_handshake_disconnects_clients(mux_server, deepl_stub, monkeypatch):
+    monkeypatch.setattr(session_mux, 'UPSTREAM_RETRIES', 1)
+    # Un servidor HTTP que no es whisper-live: el handshake falla con 404
+    http_url, _ = deepl_stub
+    mux, url = mux_server(http_url.replace('http://', 'ws://'))
+
+    publisher = Consumer(url, 'uid-A', **CONFIG)
+    assert wait_for(lambda: publisher.texts() == ['DISCONNECT'])
+    assert wait_for(lambda: not mux.sessions)
+
+
+def test_upstream_closed_if_last_client_leaves_while_connecting(mux_server):
+    upstream = FakeUpstream(handshake_delay=0.5)
+    mux, url = mux_server(upstream.url)
+
+    publisher = Consumer(url, 'uid-A', **CONFIG)
+    assert wait_for(lambda: mux.sessions)
+    publisher.ws.close()
+    assert wait_for(lambda: not mux.sessions)
+    # El upstream que terminaba de conectar se cierra en vez de quedarse abierto
+    assert wait_for(lambda: upstream.closed == 1, timeout=3.0)
+    assert upstream.configs == []
+    upstream.close()
+
+
+def test_later_clients_options_are_reported(mux_server, capsys):
+    upstream = FakeUpstream()
+    mux, url = mux_server(upstream.url)
+
+    first = Consumer(url, 'uid-A', send_last_n_segments=1, **CONFIG)
+    assert wait_for(lambda: upstream.configs)
+    second = Consumer(url, 'uid-B', send_last_n_segments=5, **CONFIG)
+    vad = Consumer(url, 'uid-C', use_vad=False, **CONFIG)
+    # Otro VAD es otra fuente; otro send_last_n_segments comparte sesión con aviso
+    assert wait_for(lambda: len(mux.sessions) == 2)
+    assert wait_for(lambda: 'send_last_n_segments' in capsys.readouterr().err)
+    for consumer in (first, second, vad):
+        consumer.ws.close()
+    assert wait_for(lambda: not mux.sessions)
+    upstream.close()
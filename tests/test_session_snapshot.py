@@ -0,0 +1,108 @@
+"""SessionSnapshot: journal incremental, compactación y recuperación tras una caída."""
+
+import json
+
+from session_snapshot import SessionSnapshot
+
+
+def test_roundtrip_through_journal(tmp_path):
+    path = str(tmp_path / 'session.json')
+    snapshot = SessionSnapshot(path, limits={'cache': 2, 'segments': 3})
+    snapshot.set('last', 'hola')
+    for i in range(4):
+        snapshot.put('cache', f'k{i}', f'v{i}')
+        snapshot.append('segments', f's{i}')
+    snapshot.flush()
+
+    restored = SessionSnapshot(path, limits={'cache': 2, 'segments': 3})
+    assert restored.load()
+    assert restored.get('last') == 'hola'
+    assert restored.get('cache') == {'k2': 'v2', 'k3': 'v3'}
+    assert restored.get('segments') == ['s1', 's2', 's3']
+    assert restored.recovery['journal_ops'] == 9
+
+
+def test_nothing_to_recover(tmp_path):
+    snapshot = SessionSnapshot(str(tmp_path / 'session.json'))
+    assert not snapshot.load()
+    assert snapshot.recovery['found'] is False
+
+
+def test_torn_last_line_is_ignored_and_repaired(tmp_path):
+    path = str(tmp_path / 'session.json')
+    snapshot = SessionSnapshot(path)
+    snapshot.put('cache', 'hello', 'hola')
+    snapshot.append('segments', 'uno')
+    snapshot.flush()
+    # Caída a mitad de escribir la siguiente operación
+    with open(path + '.journal', 'a', encoding='utf-8') as f:
+        f.write('["put", "cache", "bye", "ad')
+
+    restored = SessionSnapshot(path)
+    assert restored.load()
+    assert restored.get('cache') == {'hello': 'hola'}
+    assert restored.get('segments') == ['uno']
+    # Se compacta: lo que se escriba después no queda tras la línea rota
+    with open(path + '.journal', encoding='utf-8') as f:
+        assert f.read() == ''
+    restored.put('cache', 'bye', 'adiós')
+    restored.flush()
+
+    again = SessionSnapshot(path)
+    assert again.load()
+    assert again.get('cache') == {'hello': 'hola', 'bye': 'adiós'}
+
+
+def test_compaction_rewrites_state(tmp_path):
+    path = str(tmp_path / 'session.json')
+    snapshot = SessionSnapshot(path, compact_every=5)
+    for i in range(6):
+        snapshot.append('segments', i)
+    snapshot.flush()
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == {'seq': 6, 'state': {'segments': [0, 1, 2, 3, 4, 5]}}
+    with open(path + '.journal', encoding='utf-8') as f:
+        assert f.read() == ''
+
+
+def test_journal_already_in_compacted_state_is_skipped(tmp_path):
+    path = str(tmp_path / 'session.json')
+    snapshot = SessionSnapshot(path)
+    snapshot.append('segments', 'uno')
+    snapshot.put('cache', 'hello', 'hola')
+    snapshot.flush()
+    with open(path + '.journal', encoding='utf-8') as f:
+        journal = f.read()
+    # Caída entre reescribir el estado y vaciar el journal: quedan los dos
+    snapshot.append('segments', 'dos')
+    snapshot.compact()
+    with open(path + '.journal', 'w', encoding='utf-8') as f:
+        f.write(journal)
+
+    restored = SessionSnapshot(path)
+    assert restored.load()
+    assert restored.get('segments') == ['uno', 'dos']
+    assert restored.recovery['journal_ops'] == 0
+    # Las operaciones nuevas siguen la secuencia y sí se reproducen
+    restored.append('segments', 'tres')
+    restored.flush()
+    again = SessionSnapshot(path)
+    again.load()
+    assert again.get('segments') == ['uno', 'dos', 'tres']
+
+
+def test_unreadable_state_is_ignored(tmp_path):
+    path = tmp_path / 'session.json'
+    path.write_text('{roto')
+    snapshot = SessionSnapshot(str(path))
+    assert not snapshot.load()
+
+
+def test_record_metric_appends_jsonl(tmp_path):
+    path = str(tmp_path / 'session.json')
+    snapshot = SessionSnapshot(path)
+    snapshot.load()
+    snapshot.record_metric(process='test', restored=0)
+    with open(path + '.metrics', encoding='utf-8') as f:
+        metric = json.loads(f.readline())
+    assert metric['event'] == 'recover' and metric['process'] == 'test'
@@ -0,0 +1,59 @@
+"""WordDiffer: solo el sufijo nuevo de cada hipótesis de Whisper."""
+
+from text_diff import WordDiffer, normalize_text
+
+
+def test_normalize_text():
+    assert normalize_text("Hello, World!  It's") == "hello world it's"
+    assert WordDiffer.same('Thank you.', 'thank you')
+
+
+def test_first_segment_is_new():
+    differ = WordDiffer()
+    assert differ.diff('Hello there.') == 'Hello there.'
+
+
+def test_resent_segment_only_returns_extension():
+    differ = WordDiffer()
+    assert differ.diff('I want to say') == 'I want to say'
+    assert differ.diff('I want to say thank you') == 'thank you'
+
+
+def test_exact_resend_is_empty():
+    differ = WordDiffer()
+    differ.diff('I want to say thank you.')
+    assert differ.diff('I want to say, thank you') == ''
+
+
+def test_revision_of_last_words_is_not_reemitted():
+    differ = WordDiffer()
+    differ.diff('the cat sat on the mat')
+    assert differ.diff('the cat sat on a mat and slept') == 'and slept'
+
+
+def test_real_repeat_of_the_tail_is_emitted():
+    differ = WordDiffer()
+    differ.diff('That is all I wanted to say. Thank you.')
+    assert differ.diff('Thank you.') == 'Thank you.'
+    # Y el reenvío de esa repetición ya no se emite otra vez
+    assert differ.diff('thank you') == ''
+
+
+def test_partials_do_not_commit():
+    differ = WordDiffer()
+    differ.diff('Good morning everyone.')
+    assert differ.diff('Good morning everyone. Today', commit=False) == 'Today'
+    assert differ.diff('Good morning everyone. Today we', commit=False) == 'Today we'
+    assert list(differ.history) == ['good', 'morning', 'everyone']
+
+
+def test_common_words_are_not_an_overlap():
+    differ = WordDiffer()
+    differ.diff('we went to the park and')
+    assert differ.diff('and then the rain started') == 'and then the rain started'
+
+
+def test_restored_history_keeps_dedup():
+    differ = WordDiffer()
+    differ.history.extend(['so', 'thank', 'you'])
+    assert differ.diff('thank you') == ''
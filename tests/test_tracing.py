@@ -0,0 +1,103 @@
+"""Trazas: spans derivados de las marcas y cierre con render_ack en el servidor."""
+
+import json
+import time
+
+import pytest
+
+import subtitle_server
+from tracing import SubtitleTrace, TraceExporter
+
+
+def full_trace():
+    trace = SubtitleTrace(attributes={'model': 'small'})
+    for offset, stage in enumerate(('capture_start', 'capture_end', 'asr_start', 'asr_end',
+                                    'translate_start', 'translate_end')):
+        trace.mark(stage, 1_000_000 * offset)
+    return trace
+
+
+def test_spans_from_marks():
+    spans = full_trace().spans()
+    assert [span['name'] for span in spans] == ['subtitle', 'capture', 'asr', 'translate']
+    root = spans[0]
+    assert all(span['parent_span_id'] == root['span_id'] for span in spans[1:])
+    assert spans[2]['attributes']['duration_ms'] == 1.0
+
+
+def test_span_ids_are_stable_between_processes():
+    trace = full_trace()
+    # El servidor reconstruye la traza a partir de lo que envía el cliente
+    server_side = SubtitleTrace.from_dict(json.loads(json.dumps(trace.to_dict())))
+    server_side.mark('ingest').mark('emit').mark('render')
+    client_ids = {span['name']: span['span_id'] for span in trace.spans()}
+    server_ids = {span['name']: span['span_id'] for span in server_side.spans()}
+    assert all(server_ids[name] == span for name, span in client_ids.items())
+    assert len(set(server_ids.values())) == len(server_ids)
+
+
+def test_otlp_export(tmp_path):
+    path = tmp_path / 'traces.json'
+    TraceExporter(str(path), 'otlp').export(full_trace())
+    data = json.loads(path.read_text())
+    spans = data['resourceSpans'][0]['scopeSpans'][0]['spans']
+    assert len(spans) == 4 and spans[0]['parentSpanId'] == ''
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    path = tmp_path / 'server.jsonl'
+    monkeypatch.setattr(subtitle_server, 'tracer', TraceExporter(str(path)))
+    monkeypatch.setattr(subtitle_server, 'pending_traces', type(subtitle_server.pending_traces)())
+    monkeypatch.setattr(subtitle_server, 'MAX_PENDING_TRACES', 2)
+    monkeypatch.setattr(subtitle_server, 'save_state', lambda: None)
+    return path
+
+
+def test_render_ack_closes_trace(server):
+    http = subtitle_server.app.test_client()
+    browser = subtitle_server.socketio.test_client(subtitle_server.app, flask_test_client=http)
+    trace = full_trace()
+    assert http.post('/subtitle', json={'text': 'hola', 'trace': trace.to_dict()}).status_code == 200
+    event = [e for e in browser.get_received() if e['name'] == 'new_subtitle'][0]
+    assert event['args'][0]['trace_id'] == trace.trace_id
+
+    browser.emit('render_ack', {'trace_id': trace.trace_id, 'render_ms': 12.5})
+    spans = [json.loads(line) for line in server.read_text().splitlines()]
+    assert {span['name'] for span in spans} >= {'render', 'ingest', 'publish'}
+    assert spans[0]['attributes']['browser_render_ms'] == 12.5
+    # El segundo navegador que confirma no duplica la traza
+    browser.emit('render_ack', {'trace_id': trace.trace_id})
+    assert len(server.read_text().splitlines()) == len(spans)
+    browser.disconnect()
+
+
+def test_unacked_traces_are_exported_when_evicted(server):
+    http = subtitle_server.app.test_client()
+    for i in range(3):
+        http.post('/subtitle', json={'text': f'texto {i}', 'trace': full_trace().to_dict()})
+    assert len(subtitle_server.pending_traces) == 2
+    names = [json.loads(line)['name'] for line in server.read_text().splitlines()]
+    assert 'render' not in names and names.count('subtitle') == 1
+
+
+def test_unacked_trace_is_exported_after_ttl(server):
+    http = subtitle_server.app.test_client()
+    trace = full_trace()
+    http.post('/subtitle', json={'text': 'sin navegador', 'trace': trace.to_dict()})
+    assert not server.exists() or not server.read_text()
+
+    # Ningún navegador confirma: al caducar se exporta sin etapa de render
+    assert subtitle_server.expire_traces(now=time.monotonic() + subtitle_server.PENDING_TRACE_TTL) == 1
+    spans = [json.loads(line) for line in server.read_text().splitlines()]
+    assert {span['trace_id'] for span in spans} == {trace.trace_id}
+    assert 'render' not in {span['name'] for span in spans}
+    assert not subtitle_server.pending_traces
+
+
+def test_pending_traces_are_flushed_on_exit(server):
+    http = subtitle_server.app.test_client()
+    http.post('/subtitle', json={'text': 'último', 'trace': full_trace().to_dict()})
+    assert subtitle_server.expire_traces() == 0
+    assert subtitle_server.expire_traces(flush=True) == 1
+    assert [json.loads(line)['name'] for line in server.read_text().splitlines()].count('subtitle') == 1
@@ -0,0 +1,174 @@
+"""Deadline, hedging y circuit breaker de translation_guard contra el stub de DeepL."""
+
+import threading
+import time
+
+from deepl_http import DeepLHTTPTranslator
+from translation_guard import CircuitBreaker, GuardedTranslator, LatencyTracker
+
+
+def test_breaker_opens_after_threshold_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Solo una petición de prueba mientras está semiabierto
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_half_open_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_fast_translation_is_final(deepl_stub):
+    url, config = deepl_stub
+    config.latency_ms = 10
+    guard = GuardedTranslator(DeepLHTTPTranslator('stub', 'en', 'es', server_url=url).translate,
+                              deadline=1.0)
+    assert guard.translate('hello') == ('[ES] hello', True)
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+    guard.shutdown()
+
+
+def test_deadline_returns_original_and_delivers_late(deepl_stub):
+    url, config = deepl_stub
+    config.latency_ms = 300
+    guard = GuardedTranslator(DeepLHTTPTranslator('stub', 'en', 'es', server_url=url).translate,
+                              deadline=0.1, max_hedges=0)
+    late = []
+    arrived = threading.Event()
+
+    def on_late(source, translated):
+        late.append((source, translated))
+        arrived.set()
+
+    assert guard.translate('hello', on_late=on_late) == ('hello', False)
+    assert guard.breaker.failures == 1
+    assert arrived.wait(2.0)
+    assert late == [('hello', '[ES] hello')]
+    # La respuesta tardía no compensa el fallo que contó el deadline
+    assert guard.breaker.failures == 1
+    guard.shutdown()
+
+
+def test_always_late_deepl_opens_breaker(deepl_stub):
+    url, config = deepl_stub
+    config.latency_ms = 150
+    guard = GuardedTranslator(DeepLHTTPTranslator('stub', 'en', 'es', server_url=url).translate,
+                              deadline=0.05, max_hedges=0,
+                              breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60))
+    late = []
+    for i in range(3):
+        assert guard.translate('hello', on_late=lambda s, t: late.append(t)) == ('hello', False)
+        # Esperar a que llegue la respuesta tardía antes de la siguiente
+        deadline = time.monotonic() + 2.0
+        while len(late) <= i and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert late == ['[ES] hello'] * 3
+    assert guard.breaker.state == CircuitBreaker.OPEN
+    # Abierto: se muestra el original sin pagar el deadline
+    start = time.monotonic()
+    assert guard.translate('hello') == ('hello', True)
+    assert time.monotonic() - start < 0.05
+    assert guard.stats['short_circuit'] == 1 and guard.stats['late'] == 3
+    guard.shutdown()
+
+
+def test_hedges_deliver_late_only_once():
+    calls = []
+    release = threading.Event()
+
+    def slow(text):
+        calls.append(text)
+        release.wait(2.0)
+        return text.upper()
+
+    guard = GuardedTranslator(slow, deadline=0.15, max_hedges=1,
+                              tracker=LatencyTracker(default=0.02))
+    late = []
+    assert guard.translate('hola', on_late=lambda s, t: late.append(t)) == ('hola', False)
+    assert len(calls) == 2 and guard.stats['hedges'] == 1
+    release.set()
+    deadline = time.monotonic() + 2.0
+    while guard.in_flight and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert late == ['HOLA']
+    guard.shutdown()
+
+
+def test_hedge_wins_over_slow_first_request():
+    first = threading.Event()
+
+    def tail(text):
+        if not first.is_set():
+            first.set()
+            time.sleep(1.0)
+            return 'lenta'
+        return 'rápida'
+
+    guard = GuardedTranslator(tail, deadline=0.8, tracker=LatencyTracker(default=0.05))
+    assert guard.translate('hola') == ('rápida', True)
+    assert guard.stats['hedges'] == 1
+    guard.shutdown()
+
+
+def test_errors_open_breaker(deepl_stub):
+    url, config = deepl_stub
+    config.latency_ms = 5
+    config.error_rate = 1.0
+    guard = GuardedTranslator(DeepLHTTPTranslator('stub', 'en', 'es', server_url=url).translate,
+                              deadline=1.0, max_hedges=0,
+                              breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    for _ in range(2):
+        assert guard.translate('hello') == ('hello', True)
+    assert guard.breaker.state == CircuitBreaker.OPEN
+    assert guard.translate('hello') == ('hello', True)
+    assert guard.stats['short_circuit'] == 1
+    guard.shutdown()
+
+
+def test_saturated_pool_does_not_queue():
+    release = threading.Event()
+
+    def stalled(text):
+        release.wait(2.0)
+        return text
+
+    guard = GuardedTranslator(stalled, deadline=0.05, max_hedges=0, max_workers=2)
+    for _ in range(2):
+        assert guard.translate('hola') == ('hola', False)
+    assert guard.in_flight == 2
+    # Sin hilos libres se muestra el original sin encolar otra petición
+    assert guard.translate('adiós') == ('adiós', True)
+    assert guard.stats['saturated'] == 1 and guard.stats['calls'] == 2
+    release.set()
+    guard.shutdown()
+
+
+def test_http_translator_times_out(deepl_stub):
+    url, config = deepl_stub
+    config.latency_ms = 500
+    translator = DeepLHTTPTranslator('stub', 'en', 'es', server_url=url, timeout=(1.0, 0.1))
+    start = time.monotonic()
+    try:
+        translator.translate('hello')
+    except Exception:
+        pass
+    else:
+        raise AssertionError('se esperaba un timeout')
+    assert time.monotonic() - start < 0.45
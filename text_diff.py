@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Diff a nivel de palabra entre la salida de Whisper y el texto ya publicado.
+
+Whisper devuelve a menudo texto que se solapa con lo anterior (segmentos
+reenviados, re-decodificaciones con una palabra distinta, contexto previo).
+WordDiffer alinea cada hipótesis contra las últimas palabras publicadas y
+devuelve solo el sufijo realmente nuevo, para no retraducir ni reenviar
+frases enteras.
+"""
+
+import re
+from collections import deque
+from difflib import SequenceMatcher
+
+_PUNCT = re.compile(r"[^\w']+", re.UNICODE)
+
+
+def normalize_word(word):
+    """Forma canónica de una palabra para comparar (sin mayúsculas ni puntuación)."""
+    return _PUNCT.sub('', word.lower())
+
+
+def normalize_text(text):
+    return ' '.join(w for w in (normalize_word(w) for w in text.split()) if w)
+
+
+class WordDiffer:
+    """Extrae el texto nuevo de cada hipótesis respecto a lo ya publicado.
+
+    - `history_words`: cuántas palabras publicadas se recuerdan para alinear.
+    - `revision_slack`: cuántas palabras finales de lo publicado pueden haber
+      sido revisadas por Whisper sin que se vuelva a emitir todo.
+    - `min_overlap`: palabras coincidentes mínimas para considerar que la
+      hipótesis continúa lo publicado (menos si la hipótesis es más corta).
+    - `prefix_ratio`: fracción mínima del solape que debe coincidir palabra a
+      palabra con lo publicado.
+
+    Una hipótesis que no añade nada solo es un reenvío si se alinea con el
+    principio del último fragmento publicado (hasta `revision_slack` palabras
+    de margen). Si solo coincide con su final ("…Thank you." y luego "Thank
+    you.") es una repetición real y se emite entera.
+    """
+
+    def __init__(self, history_words=60, revision_slack=2, min_overlap=2, prefix_ratio=0.6):
+        self.history = deque(maxlen=history_words)
+        self.prefix_ratio = prefix_ratio
+        self.revision_slack = revision_slack
+        self.min_overlap = min_overlap
+        # Palabras añadidas por el último commit (None: desconocido, p. ej. tras
+        # restaurar el historial de un snapshot)
+        self._last_chunk = None
+
+    def reset(self):
+        self.history.clear()
+        self._last_chunk = None
+
+    def _new_start(self, words):
+        """Índice de la primera palabra nueva de `words`."""
+        norm = [normalize_word(w) for w in words]
+        tail = list(self.history)
+        if not tail or not norm:
+            return 0
+
+        matcher = SequenceMatcher(None, tail, norm, autojunk=False)
+        blocks = [blk for blk in matcher.get_matching_blocks() if blk.size]
+        new_start = 0
+        for a, b, size in blocks:
+            # Solo cuenta si el bloque llega (casi) al final de lo publicado:
+            # las palabras de la hipótesis hasta ahí ya se emitieron
+            if a + size >= len(tail) - self.revision_slack:
+                new_start = max(new_start, b + size)
+
+        if new_start == 0:
+            return 0
+        # El solape debe ser un prefijo de la hipótesis (con pequeñas revisiones),
+        # no unas pocas palabras comunes sueltas ("the", "and"...)
+        matched = sum(size for a, b, size in blocks if b + size <= new_start)
+        if matched < min(self.min_overlap, len(norm)) or matched < self.prefix_ratio * new_start:
+            return 0
+        if new_start == len(norm) and self._last_chunk is not None:
+            # Nada nuevo: reenvío o revisión del último fragmento, o repetición real
+            chunk_start = len(tail) - min(self._last_chunk, len(tail))
+            first = min(a for a, b, size in blocks if b + size <= new_start)
+            if first > chunk_start + self.revision_slack:
+                return 0
+        return new_start
+
+    def diff(self, text, commit=True):
+        """Devolver solo el texto nuevo de `text` (cadena vacía si no hay nada).
+
+        Con commit=False no se memoriza (útil para parciales que aún cambian).
+        """
+        words = text.split()
+        new_words = words[self._new_start(words):]
+        if commit:
+            appended = 0
+            for word in new_words:
+                norm = normalize_word(word)
+                if norm:
+                    self.history.append(norm)
+                    appended += 1
+            if appended:
+                self._last_chunk = appended
+        return ' '.join(new_words)
+
+    @staticmethod
+    def same(a, b):
+        """¿Son iguales dos textos salvo mayúsculas y puntuación?"""
+        return normalize_text(a) == normalize_text(b)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Trazas de extremo a extremo: del audio capturado al subtítulo renderizado.
+
+Cada subtítulo lleva un `SubtitleTrace` con un trace ID y marcas de tiempo
+monotónicas (`time.monotonic_ns`) de cada etapa:
+
+    capture_start → capture_end → asr_start → asr_end → translate_start →
+    translate_end → ingest → emit → render
+
+El reloj monotónico es común a todos los procesos de la misma máquina, así que
+cliente y servidor pueden mezclar sus marcas. Cada proceso envía además su
+offset monotónico → época para exportar tiempos absolutos.
+
+`TraceExporter` escribe las etapas como spans en JSON lines o en el formato
+OTLP/JSON de OpenTelemetry (una línea `resourceSpans` por traza).
+
+Los span IDs se derivan del trace ID y del nombre del span: si cliente y
+servidor exportan la misma traza (p. ej. al mismo fichero), los spans comunes
+tienen el mismo ID y se pueden deduplicar por `span_id`; el del servidor es el
+más completo (llega hasta el render).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Offset de este proceso entre el reloj monotónico y la época Unix
+CLOCK_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+# (nombre del span, marca inicial, marca final)
+SPANS = (
+    ('capture', 'capture_start', 'capture_end'),
+    ('asr', 'asr_start', 'asr_end'),
+    ('translate', 'translate_start', 'translate_end'),
+    ('publish', 'translate_end', 'ingest'),
+    ('ingest', 'ingest', 'emit'),
+    ('render', 'emit', 'render'),
+)
+STAGES = ('capture_start', 'capture_end', 'asr_start', 'asr_end', 'translate_start',
+          'translate_end', 'ingest', 'emit', 'render')
+
+
+def new_id(n_bytes):
+    return os.urandom(n_bytes).hex()
+
+
+def span_id(trace_id, name):
+    """ID de span estable (8 bytes) para un span de una traza."""
+    return hashlib.sha1(f"{trace_id}/{name}".encode('utf-8')).hexdigest()[:16]
+
+
+class SubtitleTrace:
+    """Trace ID + marcas monotónicas (ns) de las etapas de un subtítulo."""
+
+    def __init__(self, trace_id=None, marks=None, clock_offset_ns=CLOCK_OFFSET_NS, attributes=None):
+        self.trace_id = trace_id or new_id(16)
+        self.marks = dict(marks or {})
+        self.clock_offset_ns = clock_offset_ns
+        self.attributes = dict(attributes or {})
+
+    def mark(self, stage, monotonic_ns=None):
+        self.marks[stage] = monotonic_ns if monotonic_ns is not None else time.monotonic_ns()
+        return self
+
+    def duration_ms(self, start, end):
+        if start in self.marks and end in self.marks:
+            return (self.marks[end] - self.marks[start]) / 1e6
+        return None
+
+    def to_dict(self):
+        """Forma serializable para enviarla junto al subtítulo."""
+        return {
+            'trace_id': self.trace_id,
+            'clock_offset_ns': self.clock_offset_ns,
+            'marks': self.marks,
+            'attributes': self.attributes,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict) or 'trace_id' not in data:
+            return cls()
+        marks = {k: int(v) for k, v in (data.get('marks') or {}).items() if k in STAGES}
+        return cls(
+            trace_id=str(data['trace_id']),
+            marks=marks,
+            clock_offset_ns=int(data.get('clock_offset_ns', CLOCK_OFFSET_NS)),
+            attributes=data.get('attributes') or {},
+        )
+
+    def spans(self):
+        """Spans (dicts) derivados de las marcas disponibles."""
+        if not self.marks:
+            return []
+        root_id = span_id(self.trace_id, 'subtitle')
+        to_unix = lambda ns: ns + self.clock_offset_ns
+        ordered = sorted(self.marks.values())
+        spans = [{
+            'trace_id': self.trace_id,
+            'span_id': root_id,
+            'parent_span_id': None,
+            'name': 'subtitle',
+            'start_unix_ns': to_unix(ordered[0]),
+            'end_unix_ns': to_unix(ordered[-1]),
+            'attributes': dict(self.attributes),
+        }]
+        for name, start, end in SPANS:
+            if start in self.marks and end in self.marks:
+                spans.append({
+                    'trace_id': self.trace_id,
+                    'span_id': span_id(self.trace_id, name),
+                    'parent_span_id': root_id,
+                    'name': name,
+                    'start_unix_ns': to_unix(self.marks[start]),
+                    'end_unix_ns': to_unix(self.marks[end]),
+                    'attributes': {'duration_ms': round((self.marks[end] - self.marks[start]) / 1e6, 3)},
+                })
+        return spans
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class TraceExporter:
+    """Exportador thread-safe a fichero: 'jsonl' (un span por línea) u 'otlp'."""
+
+    FORMATS = ('jsonl', 'otlp')
+
+    def __init__(self, path, fmt='jsonl', service_name='whisper-live-subtitles'):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Formato de traza desconocido: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        spans = trace.spans()
+        if not spans:
+            return
+        if self.fmt == 'jsonl':
+            lines = [json.dumps(span) for span in spans]
+        else:
+            lines = [json.dumps(self._to_otlp(spans))]
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+
+    def _to_otlp(self, spans):
+        return {'resourceSpans': [{
+            'resource': {'attributes': [
+                {'key': 'service.name', 'value': {'stringValue': self.service_name}},
+            ]},
+            'scopeSpans': [{
+                'scope': {'name': 'whisper-live-subtitles.tracing'},
+                'spans': [{
+                    'traceId': span['trace_id'],
+                    'spanId': span['span_id'],
+                    'parentSpanId': span['parent_span_id'] or '',
+                    'name': span['name'],
+                    'kind': 1,
+                    'startTimeUnixNano': str(span['start_unix_ns']),
+                    'endTimeUnixNano': str(span['end_unix_ns']),
+                    'attributes': [
+                        {'key': key, 'value': _otlp_value(value)}
+                        for key, value in span['attributes'].items()
+                    ],
+                } for span in spans],
+            }],
+        }]}
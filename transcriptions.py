@@ -7,7 +7,9 @@ para obtener subtítulos en tiempo real.
 """
 
 import argparse
+import sys
 from whisper_live.client import TranscriptionClient
+from profiles import whisper_live_options
 
 
 def main():
@@ -35,9 +37,9 @@ def main():
     parser.add_argument(
         '--model',
         type=str,
-        default='small',
+        default=None,
         choices=['tiny', 'base', 'small', 'medium', 'large', 'large-v2', 'large-v3'],
-        help='Modelo de Whisper a usar (default: small)'
+        help='Modelo de Whisper a usar (default: small, o el del perfil)'
     )
     parser.add_argument(
         '--task',
@@ -49,31 +51,50 @@ def main():
     parser.add_argument(
         '--send-last-n',
         type=int,
-        default=5,
+        default=None,
         help='Número de segmentos recientes a enviar (menos = más rápido, default: 5)'
     )
     parser.add_argument(
         '--no-speech-thresh',
         type=float,
-        default=0.3,
+        default=None,
         help='Umbral de no-voz (menor = detecta voz más fácilmente, default: 0.3)'
     )
     parser.add_argument(
         '--same-output-thresh',
         type=int,
-        default=3,
+        default=None,
         help='Repeticiones antes de considerarlo segmento válido (menor = más rápido, default: 3)'
     )
+    parser.add_argument(
+        '--profile',
+        type=str,
+        default=None,
+        help='Perfil de ajuste de profiles.json (generado con autotune.py); las opciones explícitas mandan'
+    )
     
     args = parser.parse_args()
     
+    try:
+        whisper_args = whisper_live_options(
+            {'model': 'small', 'send_last_n_segments': 5, 'no_speech_thresh': 0.3, 'same_output_threshold': 3},
+            args.profile,
+            model=args.model,
+            send_last_n_segments=args.send_last_n,
+            no_speech_thresh=args.no_speech_thresh,
+            same_output_threshold=args.same_output_thresh
+        )
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    
     print(f"🎙️  Iniciando cliente de transcripción...")
     print(f"📡 Conectando a {args.host}:{args.port}")
     print(f"🌍 Idioma: {args.lang}")
-    print(f"🤖 Modelo: {args.model}")
+    print(f"🤖 Modelo: {whisper_args['model']}" + (f" (perfil {args.profile})" if args.profile else ""))
     print(f"⚙️  Tarea: {args.task}")
-    print(f"⚡ Segmentos: {args.send_last_n} (menos = respuesta más rápida)")
-    print(f"🎚️  Umbral no-voz: {args.no_speech_thresh}")
+    print(f"⚡ Segmentos: {whisper_args['send_last_n_segments']} (menos = respuesta más rápida)")
+    print(f"🎚️  Umbral no-voz: {whisper_args['no_speech_thresh']}")
     print("\n" + "="*60)
     print("Habla al micrófono para ver los subtítulos en tiempo real")
     print("Presiona Ctrl+C para detener")
@@ -85,11 +106,8 @@ def main():
             host=args.host,
             port=args.port,
             lang=args.lang,
-            model=args.model,
             translate=(args.task == 'translate'),
-            send_last_n_segments=args.send_last_n,
-            no_speech_thresh=args.no_speech_thresh,
-            same_output_threshold=args.same_output_thresh
+            **whisper_args
         )
         
         # Iniciar transcripción desde el micrófono
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Protección de latencia de cola para las llamadas a DeepL.
+
+Envuelve cualquier función de traducción (texto -> texto) con:
+- Deadline por llamada: si DeepL no responde a tiempo se devuelve el texto
+  original y la traducción se entrega después mediante un callback.
+- Peticiones "hedged": si una llamada supera el p95 observado se lanza una
+  segunda petición en paralelo y se usa la primera que responda.
+- Circuit breaker: tras varios fallos seguidos se deja de llamar a DeepL
+  durante un tiempo y se muestra directamente el texto original. Un deadline
+  vencido cuenta como fallo aunque la respuesta llegue después: un DeepL que
+  siempre va tarde abre el breaker.
+- Pool acotado: si todos los hilos siguen esperando a DeepL no se encola más
+  trabajo (ni hedges); se muestra el original hasta que quede un hilo libre.
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class LatencyTracker:
+    """Ventana deslizante de latencias para estimar percentiles."""
+
+    def __init__(self, window=200, default=1.0, min_samples=10):
+        self.samples = deque(maxlen=window)
+        self.default = default
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, q):
+        """Percentil q (0-100) de las latencias recientes."""
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return self.default
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    """Circuit breaker clásico: cerrado -> abierto -> semiabierto."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = self.CLOSED
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self):
+        """¿Se puede llamar al servicio ahora mismo?"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                # Solo una petición de prueba mientras está semiabierto
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._state = self.CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._state = self.OPEN
+                    self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+class GuardedTranslator:
+    """Traductor con deadline, hedging y circuit breaker.
+
+    `translate(text, on_late)` devuelve `(texto, definitivo)`. Si `definitivo`
+    es False se ha devuelto el texto original porque venció el deadline, y
+    `on_late(text, traducido)` se llamará cuando llegue la traducción.
+    """
+
+    def __init__(self, translate_fn, deadline=0.8, hedge_percentile=95,
+                 max_hedges=1, breaker=None, tracker=None, max_workers=4):
+        self.translate_fn = translate_fn
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.max_hedges = max_hedges
+        self.breaker = breaker or CircuitBreaker()
+        self.tracker = tracker or LatencyTracker(default=deadline / 2)
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='deepl')
+        # Peticiones enviadas que aún no han terminado (incluidas las tardías)
+        self.in_flight = 0
+        # Protege in_flight y stats (se actualizan desde los hilos del pool)
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'hedges': 0, 'late': 0, 'errors': 0, 'short_circuit': 0,
+                      'saturated': 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _timed_call(self, text):
+        start = time.monotonic()
+        translated = self.translate_fn(text)
+        return translated, time.monotonic() - start
+
+    def _submit(self, text):
+        """Lanzar una petición si queda algún hilo libre (None si no)."""
+        with self._lock:
+            if self.in_flight >= self.max_workers:
+                return None
+            self.in_flight += 1
+        future = self.executor.submit(self._timed_call, text)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+
+    def translate(self, text, on_late=None):
+        """Traducir respetando el deadline. Nunca lanza excepciones."""
+        if not text:
+            return text, True
+
+        if not self.breaker.allow():
+            self._count('short_circuit')
+            return text, True
+
+        start = time.monotonic()
+        future = self._submit(text)
+        if future is None:
+            # Pool lleno de peticiones atascadas: encolar más solo añadiría espera
+            self._count('saturated')
+            if self.breaker.state == CircuitBreaker.HALF_OPEN:
+                # No se ha gastado la prueba del semiabierto: no dejarla bloqueada
+                self.breaker.record_failure()
+            return text, True
+
+        self._count('calls')
+        futures = [future]
+        hedges = 0
+
+        while True:
+            remaining = self.deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+
+            wait_for = remaining
+            if hedges < self.max_hedges:
+                hedge_at = self.tracker.percentile(self.hedge_percentile)
+                wait_for = min(remaining, max(0.0, hedge_at - (time.monotonic() - start)))
+
+            done, _ = wait(futures, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                futures.remove(future)
+                try:
+                    translated, latency = future.result()
+                except Exception as e:
+                    print(f"⚠️  Error en traducción: {e}", file=sys.stderr)
+                    self._count('errors')
+                    self.breaker.record_failure()
+                    continue
+                self.tracker.record(latency)
+                self.breaker.record_success()
+                return translated, True
+
+            if not futures:
+                # Todas las peticiones han fallado: mostrar el original
+                return text, True
+
+            if not done and hedges < self.max_hedges and time.monotonic() - start < self.deadline:
+                # La llamada va por encima del p95: lanzar una petición de respaldo
+                hedge = self._submit(text) if self.breaker.allow() else None
+                if hedge is not None:
+                    hedges += 1
+                    self._count('hedges')
+                    futures.append(hedge)
+                else:
+                    hedges = self.max_hedges
+
+        # Deadline vencido: llamada lenta = servicio degradado
+        self._count('late')
+        self.breaker.record_failure()
+        self._deliver_late(text, futures, start, on_late)
+        return text, False
+
+    def _deliver_late(self, text, futures, start, on_late):
+        """Entregar la primera traducción que llegue tras el deadline.
+
+        El deadline ya contó como fallo en el breaker y la respuesta tardía no
+        lo compensa: si DeepL siempre responde tarde, el breaker se abre y se
+        deja de pagar el deadline (y los hedges) en cada subtítulo.
+        """
+        delivered = []
+        lock = threading.Lock()
+
+        def _done(future):
+            try:
+                translated, latency = future.result()
+            except Exception:
+                return
+            self.tracker.record(latency)
+            # Los futures del hedge terminan en hilos distintos: solo entrega uno
+            with lock:
+                if delivered:
+                    return
+                delivered.append(True)
+            if on_late is not None:
+                try:
+                    on_late(text, translated)
+                except Exception:
+                    pass
+
+        for future in futures:
+            future.add_done_callback(_done)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
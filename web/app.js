@@ -8,6 +8,16 @@ let serverReady = false;
 let transcriptionHistory = [];
 let clientUid = null;
 let audioProcessor = null;
+let opusEncoder = null;
+let activeCodec = 'float32';
+let audioSeq = 0;
+let encodedSamples = 0;
+
+// Tramas para audio_relay.py: cabecera <IHBB (secuencia, muestras, códec, flags)
+const FRAME_HEADER_BYTES = 8;
+const CODEC_IDS = { int16: 1, opus: 2 };
+const RELAY_PORT = '9091';
+const DIRECT_PORT = '9090';
 
 // Elementos del DOM
 const startBtn = document.getElementById('startBtn');
@@ -18,6 +28,7 @@ const serverHost = document.getElementById('serverHost');
 const serverPort = document.getElementById('serverPort');
 const language = document.getElementById('language');
 const model = document.getElementById('model');
+const audioCodec = document.getElementById('audioCodec');
 const statusIndicator = document.getElementById('statusIndicator');
 const statusText = document.getElementById('statusText');
 const audioLevel = document.getElementById('audioLevel');
@@ -28,6 +39,14 @@ startBtn.addEventListener('click', startTranscription);
 stopBtn.addEventListener('click', stopTranscription);
 clearBtn.addEventListener('click', clearTranscription);
 downloadBtn.addEventListener('click', downloadTranscription);
+audioCodec.addEventListener('change', () => {
+    // int16/Opus van al relay; float32 directo a whisper-live
+    if (audioCodec.value === 'float32' && serverPort.value === RELAY_PORT) {
+        serverPort.value = DIRECT_PORT;
+    } else if (audioCodec.value !== 'float32' && serverPort.value === DIRECT_PORT) {
+        serverPort.value = RELAY_PORT;
+    }
+});
 
 // Generar UUID
 function generateUUID() {
@@ -44,6 +63,9 @@ async function startTranscription() {
         updateStatus('connecting', 'Conectando...');
         serverReady = false;
         clientUid = generateUUID();
+        activeCodec = resolveCodec(audioCodec.value);
+        audioSeq = 0;
+        encodedSamples = 0;
         
         // Solicitar acceso al micrófono con configuración específica
         mediaStream = await navigator.mediaDevices.getUserMedia({ 
@@ -85,6 +107,9 @@ async function startTranscription() {
                 clip_audio: false,
                 same_output_threshold: 5  // Reducido de 10 para respuestas más rápidas
             };
+            if (activeCodec !== 'float32') {
+                config.audio_codec = activeCodec;  // Lo interpreta audio_relay.py
+            }
             
             console.log('Enviando configuración:', config);
             websocket.send(JSON.stringify(config));
@@ -105,7 +130,10 @@ async function startTranscription() {
                 if (data.message === 'SERVER_READY') {
                     serverReady = true;
                     updateStatus('connected', 'Conectado - Escuchando...');
-                    console.log('Servidor listo, iniciando captura de audio');
+                    console.log(`Servidor listo, iniciando captura de audio (${activeCodec})`);
+                    if (activeCodec === 'opus') {
+                        opusEncoder = createOpusEncoder(audioContext.sampleRate);
+                    }
                     processAudio(source);
                 } else if (data.message === 'DISCONNECT') {
                     console.log('Servidor desconectó por tiempo excedido');
@@ -174,6 +202,68 @@ function processSegments(segments) {
     }
 }
 
+// Opus necesita WebCodecs; si el navegador no lo tiene se usa int16
+function resolveCodec(codec) {
+    if (codec === 'opus' && typeof AudioEncoder === 'undefined') {
+        console.warn('WebCodecs no disponible: se usa int16 en lugar de Opus');
+        return 'int16';
+    }
+    return codec;
+}
+
+// Escribir la cabecera de trama del relay al principio del buffer
+function writeFrameHeader(buffer, codec, samples) {
+    const view = new DataView(buffer);
+    view.setUint32(0, audioSeq++ >>> 0, true);
+    view.setUint16(4, Math.min(samples, 0xFFFF), true);
+    view.setUint8(6, CODEC_IDS[codec]);
+    view.setUint8(7, 0);
+}
+
+function createOpusEncoder(sampleRate) {
+    const encoder = new AudioEncoder({
+        output: (chunk) => {
+            if (!websocket || websocket.readyState !== WebSocket.OPEN) return;
+            const frame = new Uint8Array(FRAME_HEADER_BYTES + chunk.byteLength);
+            chunk.copyTo(frame.subarray(FRAME_HEADER_BYTES));
+            const samples = chunk.duration ? Math.round(chunk.duration * sampleRate / 1e6) : 0;
+            writeFrameHeader(frame.buffer, 'opus', samples);
+            websocket.send(frame.buffer);
+        },
+        error: (e) => console.error('Error en el codificador Opus:', e)
+    });
+    encoder.configure({ codec: 'opus', sampleRate, numberOfChannels: 1, bitrate: 24000 });
+    return encoder;
+}
+
+// Codificar y enviar un bloque de audio (Float32 mono ya saneado)
+function sendAudio(samples) {
+    if (activeCodec === 'float32') {
+        // Formato nativo de whisper-live
+        websocket.send(samples.buffer);
+    } else if (activeCodec === 'int16') {
+        const buffer = new ArrayBuffer(FRAME_HEADER_BYTES + samples.length * 2);
+        const int16Data = new Int16Array(buffer, FRAME_HEADER_BYTES, samples.length);
+        for (let i = 0; i < samples.length; i++) {
+            const s = samples[i];
+            int16Data[i] = s < 0 ? s * 0x8000 : s * 0x7FFF;
+        }
+        writeFrameHeader(buffer, 'int16', samples.length);
+        websocket.send(buffer);
+    } else if (opusEncoder && opusEncoder.state === 'configured') {
+        // La salida llega de forma asíncrona al callback del codificador
+        opusEncoder.encode(new AudioData({
+            format: 'f32',
+            sampleRate: audioContext.sampleRate,
+            numberOfFrames: samples.length,
+            numberOfChannels: 1,
+            timestamp: Math.round(encodedSamples * 1e6 / audioContext.sampleRate),
+            data: samples
+        }));
+        encodedSamples += samples.length;
+    }
+}
+
 // Procesar audio y enviarlo al servidor
 function processAudio(source) {
     audioProcessor = audioContext.createScriptProcessor(4096, 1, 1);
@@ -203,8 +293,8 @@ function processAudio(source) {
         const level = Math.min(100, average * 1000);
         audioLevel.style.width = `${level}%`;
         
-        // Convertir Float32 a Int16 correctamente, validando datos
-        const int16Data = new Int16Array(inputData.length);
+        // Copiar el bloque validando datos (el buffer de entrada se reutiliza)
+        const samples = new Float32Array(inputData.length);
         for (let i = 0; i < inputData.length; i++) {
             // Validar y clampar valores
             let s = inputData[i];
@@ -213,13 +303,12 @@ function processAudio(source) {
             } else {
                 s = Math.max(-1, Math.min(1, s));
             }
-            // Convertir a Int16 con rango completo
-            int16Data[i] = s < 0 ? s * 0x8000 : s * 0x7FFF;
+            samples[i] = s;
         }
         
         // Enviar audio como array buffer (binario)
         try {
-            websocket.send(int16Data.buffer);
+            sendAudio(samples);
         } catch (e) {
             console.error('Error enviando audio:', e);
         }
@@ -236,6 +325,11 @@ function stopTranscription() {
         audioProcessor = null;
     }
     
+    if (opusEncoder) {
+        if (opusEncoder.state !== 'closed') opusEncoder.close();
+        opusEncoder = null;
+    }
+    
     if (websocket) {
         websocket.close();
         websocket = null;